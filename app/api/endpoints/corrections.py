@@ -0,0 +1,50 @@
+"""
+Routes API pour la correction des tests de langue
+"""
+from fastapi import APIRouter, HTTPException, status
+from app.schemas.correction import CorrectionTestRequest, CorrectionTestResponse, CorrectionJobResponse
+from app.schemas.job import JobResponse
+from app.services.correction_service import corriger_test, TYPE_JOB_CORRECTION
+from app.services.job_service import file_jobs, FileJobsPleine
+
+router = APIRouter()
+
+@router.post("/", response_model=CorrectionTestResponse)
+async def correct_language_test(request: CorrectionTestRequest):
+    """
+    Corrige un test complet
+    
+    - **test**: test tel qu'il a été généré
+    - **reponses**: par section, une entrée par exercice associant l'id de chaque élément à la réponse
+    
+    Tous les exercices sont évalués en parallèle, puis un bilan des compétences est établi.
+    """
+    try:
+        return await corriger_test(request)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erreur lors de la correction du test: {str(e)}"
+        )
+
+@router.post("/jobs", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_correction_job(request: CorrectionTestRequest):
+    """
+    Met en file la correction d'un test et retourne immédiatement l'identifiant du job
+    
+    L'avancement (exercices corrigés) et la correction sont consultables via `GET /api/corrections/jobs/{job_id}`.
+    """
+    try:
+        return await file_jobs.soumettre(TYPE_JOB_CORRECTION, request.model_dump(mode="json"))
+    except FileJobsPleine as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+@router.get("/jobs/{job_id}", response_model=CorrectionJobResponse)
+async def get_correction_job(job_id: str):
+    """
+    Retourne le statut d'un job de correction, son avancement et la correction une fois terminée
+    """
+    job = await file_jobs.obtenir(job_id)
+    if job is None or job["type"] != TYPE_JOB_CORRECTION:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job introuvable")
+    return job
@@ -1,10 +1,14 @@
 """
 Routes API pour les tests de langue
 """
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from app.schemas.language_test import LanguageTestRequest, LanguageTestResponse
-from app.services.language_test_service import generate_language_test
+from app.services.language_test_service import generate_language_test, stream_language_test, TYPE_JOB_GENERATION
+from app.services.job_service import file_jobs, FileJobsPleine
+from app.schemas.job import JobResponse, TestJobResponse
 from app.schemas.message import MessageResponse
+import json
 import sys
 
 router = APIRouter()
@@ -37,6 +41,60 @@ async def create_language_test(request: LanguageTestRequest):
             detail=f"Erreur lors de la génération du test: {str(e)}"
         )
 
+@router.post("/stream")
+async def stream_language_test_sections(
+    request: LanguageTestRequest,
+    format: str = Query("sse", pattern="^(sse|ndjson)$", description="Format du flux: sse ou ndjson"),
+    granularite: str = Query("section", pattern="^(section|exercice)$", description="Un événement par section ou par exercice")
+):
+    """
+    Génère un test de langue et envoie chaque section dès qu'elle est prête
+    
+    - **format**: `sse` (server-sent events) ou `ndjson` (un objet JSON par ligne)
+    - **granularite**: `section` ou `exercice`
+    
+    Chaque section (comprehension_ecrite, grammaire, vocabulaire) est émise dans un événement
+    `section`, puis un événement `complete` clôt le flux avec l'identifiant du test.
+    Avec `granularite=exercice`, chaque exercice est émis (événement `exercice`) dès que le modèle
+    a fini de l'écrire, suivi d'un événement `section_complete` à la fin de chaque section.
+    """
+    async def evenements():
+        try:
+            async for evenement in stream_language_test(request, granularite):
+                donnees = json.dumps(evenement, ensure_ascii=False)
+                if format == "ndjson":
+                    yield donnees + "\n"
+                else:
+                    yield f"event: {evenement['event']}\ndata: {donnees}\n\n"
+        except Exception as e:
+            erreur = json.dumps({"event": "error", "detail": f"Erreur lors de la génération du test: {str(e)}"}, ensure_ascii=False)
+            yield erreur + "\n" if format == "ndjson" else f"event: error\ndata: {erreur}\n\n"
+    
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/event-stream"
+    return StreamingResponse(evenements(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+@router.post("/jobs", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_language_test_job(request: LanguageTestRequest):
+    """
+    Met en file la génération d'un test de langue et retourne immédiatement l'identifiant du job
+    
+    L'avancement et le test généré sont consultables via `GET /api/tests/jobs/{job_id}`.
+    """
+    try:
+        return await file_jobs.soumettre(TYPE_JOB_GENERATION, request.model_dump())
+    except FileJobsPleine as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+@router.get("/jobs/{job_id}", response_model=TestJobResponse)
+async def get_language_test_job(job_id: str):
+    """
+    Retourne le statut d'un job de génération, son avancement par section et le test une fois terminé
+    """
+    job = await file_jobs.obtenir(job_id)
+    if job is None or job["type"] != TYPE_JOB_GENERATION:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job introuvable")
+    return job
+
 @router.get("/import-check", response_model=MessageResponse)
 async def check_imports():
     """
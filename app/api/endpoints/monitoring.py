@@ -0,0 +1,178 @@
+"""
+Routes API de supervision (état des composants internes)
+"""
+from typing import Optional
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from app.schemas.message import MessageResponse
+from app.core.metrics import registre_metriques
+from app.core.journal import statistiques_journal
+from app.services.ai_modules.rate_limiter import limiteur
+from app.services.ai_modules.content_creator.cache import cache_sections, CacheSections
+from app.services.ai_modules.content_creator.translation_memo import memo_traductions
+from app.services.ai_modules.content_creator.theme_bank import banque_themes
+from app.services.ai_modules.verdict_cache import cache_verdicts
+from app.services.test_inventory_service import inventaire_tests
+from app.services.job_service import file_jobs
+
+router = APIRouter()
+
+# Route d'exposition des métriques, montée à la racine (/metrics) comme l'attend Prometheus
+router_metriques = APIRouter()
+
+def collecter_composants():
+    """Compteurs et jauges déjà tenus par les composants internes, lus à chaque scrape"""
+    sections = cache_sections.statistiques()
+    traductions = memo_traductions.statistiques()
+    themes = banque_themes.statistiques()
+    verdicts = cache_verdicts.statistiques()
+    inventaire = inventaire_tests.etat()
+    etat_limiteur = limiteur.etat()
+    etat_jobs = file_jobs.etat()
+    journal = statistiques_journal()
+    return [
+        ("cache_requetes_total", "counter", "Consultations des caches et réserves par résultat", [
+            ({"cache": "sections", "resultat": "hit"}, sections["hits"]),
+            ({"cache": "sections", "resultat": "hit_disque"}, sections["hits_disque"]),
+            ({"cache": "sections", "resultat": "miss"}, sections["misses"]),
+            ({"cache": "traductions", "resultat": "hit"}, traductions["hits"]),
+            ({"cache": "traductions", "resultat": "miss"}, traductions["misses"]),
+            ({"cache": "banque_themes", "resultat": "hit"}, themes["nb_tirages"]),
+            ({"cache": "banque_themes", "resultat": "miss"}, themes["nb_manques"]),
+            ({"cache": "inventaire_tests", "resultat": "hit"}, inventaire["nb_servis"]),
+            ({"cache": "inventaire_tests", "resultat": "miss"}, inventaire["nb_manques"]),
+            ({"cache": "verdicts_validation", "resultat": "hit"}, verdicts["validation"]["hits"]),
+            ({"cache": "verdicts_validation", "resultat": "miss"}, verdicts["validation"]["misses"]),
+            ({"cache": "verdicts_analyse", "resultat": "hit"}, verdicts["analyse"]["hits"]),
+            ({"cache": "verdicts_analyse", "resultat": "miss"}, verdicts["analyse"]["misses"]),
+        ]),
+        ("cache_entrees", "gauge", "Entrées en mémoire par cache", [
+            ({"cache": "sections"}, sections["entrees_memoire"]),
+            ({"cache": "traductions"}, traductions["entrees_memoire"]),
+            ({"cache": "verdicts"}, verdicts["entrees_memoire"]),
+        ]),
+        ("limiteur_rate_limits_total", "counter", "Réponses 429 signalées au limiteur de débit", [
+            ({}, etat_limiteur["nb_rate_limits"]),
+        ]),
+        ("limiteur_requetes_disponibles", "gauge", "Jetons restants dans le seau de requêtes du limiteur", [
+            ({}, etat_limiteur["requetes_disponibles"]),
+        ]),
+        ("jobs", "gauge", "Jobs en file et en cours de traitement", [
+            ({"etat": "en_file"}, etat_jobs["en_file"]),
+            ({"etat": "en_cours"}, etat_jobs["en_cours"]),
+        ]),
+        ("jobs_finis_total", "counter", "Jobs terminés ou définitivement en échec", [
+            ({"statut": "termine"}, etat_jobs["nb_termines"]),
+            ({"statut": "echec"}, etat_jobs["nb_echecs"]),
+        ]),
+        ("journal_messages_en_attente", "gauge", "Messages du journal en attente d'écriture", [
+            ({}, journal["en_attente"]),
+        ]),
+        ("journal_messages_abandonnes_total", "counter", "Messages du journal abandonnés faute de place dans la file", [
+            ({}, journal["nb_abandonnes"]),
+        ]),
+    ]
+
+registre_metriques.ajouter_collecteur(collecter_composants)
+
+@router_metriques.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    """
+    Expose les métriques au format texte de Prometheus
+    """
+    return PlainTextResponse(registre_metriques.exposer(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@router.get("/rate-limiter")
+async def get_rate_limiter_state():
+    """
+    Retourne l'état courant du limiteur de débit global des appels LLM
+    """
+    return limiteur.etat()
+
+@router.get("/test-inventory")
+async def get_test_inventory_state():
+    """
+    Retourne le niveau de stock de l'inventaire de tests pré-générés
+    """
+    return inventaire_tests.etat()
+
+@router.get("/jobs")
+async def get_job_queue_state():
+    """
+    Retourne l'occupation de la file de jobs et les compteurs de jobs terminés ou en échec
+    """
+    return file_jobs.etat()
+
+@router.get("/logging")
+async def get_logging_state():
+    """
+    Retourne l'occupation de la file d'écriture du journal et le nombre de messages abandonnés
+    """
+    return statistiques_journal()
+
+@router.get("/section-cache")
+async def get_section_cache_stats():
+    """
+    Retourne les compteurs de hits/misses du cache des sections d'exercices
+    """
+    return cache_sections.statistiques()
+
+@router.get("/translation-memo")
+async def get_translation_memo_stats():
+    """
+    Retourne les compteurs de hits/misses de la mémoire des traductions
+    """
+    return memo_traductions.statistiques()
+
+@router.get("/verdict-cache")
+async def get_verdict_cache_stats():
+    """
+    Retourne les compteurs de hits/misses du cache des verdicts du correcteur (validation et analyse)
+    """
+    return cache_verdicts.statistiques()
+
+@router.delete("/verdict-cache", response_model=MessageResponse)
+async def clear_verdict_cache():
+    """
+    Vide le cache des verdicts du correcteur
+    """
+    cache_verdicts.vider()
+    return MessageResponse(message="Cache vidé")
+
+@router.get("/theme-bank")
+async def get_theme_bank_stats():
+    """
+    Retourne la taille des banques de thèmes et les compteurs de tirages
+    """
+    return banque_themes.statistiques()
+
+@router.delete("/section-cache", response_model=MessageResponse)
+async def invalidate_section_cache(
+    langue: Optional[str] = None,
+    niveau_cible: Optional[str] = None,
+    section: Optional[str] = None,
+    themes: Optional[str] = None,
+    variante: Optional[int] = None
+):
+    """
+    Invalide une section (langue + section) ou vide tout le cache si aucun paramètre n'est fourni
+    
+    - **niveau_cible**: niveau de la section (B1 par défaut)
+    - **themes**: thèmes ou domaines séparés par des virgules, pour une section générée sur thèmes imposés
+    - **variante**: numéro de la variante à invalider ; sans themes ni variante, toutes les variantes
+    """
+    if all(parametre is None for parametre in (langue, niveau_cible, section, themes, variante)):
+        cache_sections.vider()
+        return MessageResponse(message="Cache vidé")
+    if not langue or not section or (themes and variante is not None):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Clé incomplète : langue et section sont requis, avec au plus l'un de themes et variante"
+        )
+    if themes:
+        cache_sections.invalider(CacheSections.cle(langue, niveau_cible, section, themes.split(",")))
+    elif variante is not None:
+        cache_sections.invalider(CacheSections.cle(langue, niveau_cible, section, variante=variante))
+    else:
+        cache_sections.invalider_section(langue, niveau_cible, section)
+    return MessageResponse(message="Entrée invalidée")
@@ -0,0 +1,50 @@
+"""
+Chronométrage des étapes du pipeline de génération
+
+Les étapes (themes, generation_section, parse, validation) sont encadrées par
+mesurer() ; chaque durée est transmise aux observateurs enregistrés (benchmarks, métriques).
+Sans observateur, le coût se limite à deux lectures d'horloge.
+"""
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, List
+from app.core.journal import obtenir_journal
+
+journal = obtenir_journal(__name__)
+
+# Observateur : (nom de l'étape, durée en secondes) -> None, appelé depuis n'importe quel thread
+Observateur = Callable[[str, float], None]
+
+ETAPES_PIPELINE = ("themes", "generation_section", "parse", "validation")
+
+_observateurs: List[Observateur] = []
+_verrou = threading.Lock()
+
+
+def ajouter_observateur(observateur: Observateur) -> None:
+    """Enregistre une fonction appelée à la fin de chaque étape mesurée"""
+    with _verrou:
+        _observateurs.append(observateur)
+
+
+def retirer_observateur(observateur: Observateur) -> None:
+    """Retire un observateur précédemment enregistré"""
+    with _verrou:
+        if observateur in _observateurs:
+            _observateurs.remove(observateur)
+
+
+@contextmanager
+def mesurer(etape: str):
+    """Mesure la durée du bloc et la signale aux observateurs, même en cas d'exception"""
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        duree = time.perf_counter() - debut
+        for observateur in list(_observateurs):
+            try:
+                observateur(etape, duree)
+            except Exception as e:
+                journal.error("Observateur de chronométrage en erreur (%s): %s", etape, e)
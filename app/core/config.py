@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 
 class Settings(BaseSettings):
     """
@@ -9,6 +9,104 @@ class Settings(BaseSettings):
     BACKEND_CORS_ORIGINS: List[str] = ["http://localhost:5173"]
     DATABASE_URL: str = "sqlite:///./app.db"
 
+    # Mode de génération des tests : "async" (coroutines, ainvoke), "fanout" (coroutines, un appel LLM
+    # par exercice) ou "thread" (pipeline synchrone dans un pool)
+    GENERATION_MODE: str = "async"
+    # Nombre maximum de générations de tests exécutées simultanément en mode "thread"
+    GENERATION_MAX_WORKERS: int = 8
+
+    # Limiteur de débit global des appels LLM (partagé par tout le processus)
+    LLM_REQUETES_PAR_MINUTE: int = 60
+    LLM_TOKENS_PAR_MINUTE: int = 500000
+    LLM_RAFALE_REQUETES: int = 10  # Nombre d'appels pouvant partir immédiatement
+    LLM_TOKENS_ESTIMES_PAR_APPEL: int = 4000  # Estimation prompt + complétion utilisée pour réserver le budget
+    LLM_PAUSE_RATE_LIMIT: float = 5.0  # Suspension des appels après un 429, en secondes
+    LLM_MAX_TENTATIVES_RATE_LIMIT: int = 4
+
+    # Clients LLM partagés (un pool de connexions keep-alive par fournisseur)
+    LLM_FOURNISSEUR: str = "mistral"  # "mistral", "openai" (tout serveur compatible OpenAI) ou "simule"
+    # Routage par étape (themes, traduction, generation, validation, analyse, evaluation, bilan),
+    # ex: {"themes": "openai", "traduction": "openai"} pour confier les étapes simples à un modèle local
+    LLM_FOURNISSEURS_PAR_ETAPE: Dict[str, str] = {}
+    LLM_MODELES_PAR_ETAPE: Dict[str, str] = {}
+    LLM_MODELE: str = "mistral-large-latest"
+    MISTRAL_API_KEY: str = ""  # Requise par le fournisseur "mistral"
+    MISTRAL_BASE_URL: str = "https://api.mistral.ai/v1"
+    OPENAI_BASE_URL: str = "http://localhost:8080/v1"
+    OPENAI_API_KEY: str = "sans-cle"
+    OPENAI_MODELE: str = ""  # Vide pour reprendre LLM_MODELE
+    LLM_TIMEOUT: int = 120
+
+    # LLM simulé (fournisseur "simule" ou serveur python -m app.services.ai_modules.llm_simule)
+    LLM_SIMULE_LATENCE_MS: float = 300.0  # Latence moyenne avant le premier token
+    LLM_SIMULE_ECART_MS: float = 100.0
+    LLM_SIMULE_DISTRIBUTION: str = "lognormale"  # constante, normale, lognormale ou exponentielle
+    LLM_SIMULE_TOKENS_PAR_SECONDE: float = 80.0  # Débit de sortie, 0 pour une réponse instantanée
+    LLM_SIMULE_TAUX_429: float = 0.0  # Part des appels rejetés en 429
+    LLM_SIMULE_TAUX_MALFORME: float = 0.0  # Part des réponses tronquées
+    LLM_SIMULE_GRAINE: int = 42
+    LLM_MAX_CONNEXIONS: int = 100
+    LLM_MAX_CONNEXIONS_KEEPALIVE: int = 20
+    LLM_KEEPALIVE_EXPIRATION: float = 60.0
+    # Modèles instanciés au démarrage, au format "etape:temperature" (couples utilisés par le pipeline)
+    LLM_MODELES_PRECHAUFFES: List[str] = [
+        "generation:0.8", "themes:1.0", "traduction:0.1", "validation:0.1",
+        "analyse:0.2", "evaluation:0.3", "evaluation:0.1", "bilan:0.1",
+    ]
+    LLM_PRECHAUFFER_CONNEXION: bool = True
+
+    # Inventaire de tests pré-générés par (langue, niveau) ; profondeur 0 pour désactiver
+    TEST_INVENTORY_PROFONDEUR: int = 2
+    # Couples à maintenir dès le démarrage, ex: ["anglais:B1"] ; les autres sont suivis à la demande
+    # s'ils portent sur une langue de LANGUES_SUPPORTEES et un niveau CECRL
+    TEST_INVENTORY_CLES: List[str] = []
+    TEST_INVENTORY_MAX_CLES: int = 50
+    TEST_INVENTORY_INTERVALLE: float = 5.0  # Pause du worker quand il n'y a rien à recharger, en secondes
+    TEST_INVENTORY_MARGE_BUDGET: float = 0.5  # Part du budget LLM qui doit rester libre pour recharger
+
+    # Cache des sections d'exercices (LRU en mémoire + niveau SQLite optionnel). Désactivé par défaut :
+    # activé, il fait partager aux apprenants d'un même (langue, niveau) un jeu borné de sections
+    SECTION_CACHE_ACTIVE: bool = False
+    SECTION_CACHE_TAILLE_MAX: int = 256
+    SECTION_CACHE_TTL: int = 86400  # Durée de validité d'une section en secondes, 0 pour illimitée
+    SECTION_CACHE_SQLITE: str = ""  # Chemin du fichier SQLite, vide pour un cache uniquement en mémoire
+    SECTION_CACHE_VARIANTES: int = 32  # Variantes conservées par (langue, niveau, section), tirées au hasard
+
+    # Mémoire persistante des traductions (vide pour la garder uniquement en mémoire)
+    TRANSLATION_MEMO_SQLITE: str = "./translation_memo.db"
+    # Langues pré-remplies par translation_memo et les tâches hors ligne
+    LANGUES_SUPPORTEES: List[str] = ["anglais", "espagnol", "allemand", "italien", "portugais"]
+
+    # Banque de thèmes par langue, remplie par lots hors du chemin des requêtes (vide pour la garder en mémoire)
+    THEME_BANK_SQLITE: str = "./theme_bank.db"
+    THEME_BANK_TAILLE_LOT: int = 100  # Thèmes demandés par appel LLM lors d'un remplissage
+    THEME_BANK_MIN_THEMES: int = 40  # En dessous, un remplissage est lancé en arrière-plan
+    THEME_BANK_MAX_THEMES: int = 500
+    THEME_BANK_INTERVALLE_SAUVEGARDE: float = 30.0  # Délai minimal entre deux sauvegardes de la rotation, en secondes
+
+    # Jobs exécutés en arrière-plan (POST /api/tests/jobs)
+    JOB_WORKERS: int = 4  # Nombre de jobs traités simultanément
+    JOB_FILE_MAX: int = 200  # Jobs en attente au-delà desquels les soumissions sont refusées (503)
+    JOB_MAX_TENTATIVES: int = 3
+    JOB_DELAI_RETRY: float = 5.0  # Délai avant nouvelle tentative, doublé à chaque échec, en secondes
+
+    # Correcteur : "question" (un appel de validation par question, puis d'analyse par erreur)
+    # ou "groupe" (toutes les questions d'un exercice et leurs analyses en un seul appel)
+    CORRECTEUR_MODE: str = "question"
+    CORRECTEUR_EXPLIQUER_QCM: bool = False  # Analyse par le LLM des mauvais choix de QCM (sinon analyse locale)
+    CORRECTEUR_QUESTIONS_SIMULTANEES: int = 6  # Questions évaluées en parallèle (pool partagé en synchrone, par exercice en async), 1 pour une évaluation séquentielle
+    CORRECTEUR_EXERCICES_SIMULTANES: int = 16  # Exercices en cours d'évaluation pour tout le processus (POST /api/corrections)
+    # Cache des verdicts du modèle par (question, texte, réponse normalisée, langue)
+    CORRECTEUR_CACHE_ACTIF: bool = True
+    CORRECTEUR_CACHE_TAILLE_MAX: int = 20000
+
+    # Journalisation structurée (écriture sur stdout par un thread dédié)
+    LOG_NIVEAU: str = "INFO"
+    LOG_NIVEAUX_PAR_MODULE: Dict[str, str] = {}  # ex: {"app.services.ai_modules.content_creator": "WARNING"}
+    LOG_FORMAT: str = "json"  # "json" ou "texte"
+    LOG_ECHANTILLONNAGE: float = 1.0  # Part des messages DEBUG/INFO conservés ; WARNING et au-delà toujours conservés
+    LOG_TAILLE_FILE: int = 10000  # Messages en attente d'écriture au-delà desquels les nouveaux sont abandonnés
+
     model_config = {
         "env_file": ".env",
         "env_file_encoding": "utf-8",
@@ -0,0 +1,181 @@
+"""
+Journalisation structurée et non bloquante
+
+Les modules obtiennent leur logger par obtenir_journal(__name__). Dans l'appelant, un message
+n'est que filtré (niveau, échantillonnage), enrichi du contexte courant et déposé dans une file
+bornée : le formatage et l'écriture sur stdout sont faits par un thread dédié (QueueListener).
+Le contexte (request_id, test_id, etape...) est porté par une contextvar et ajouté à chaque message ;
+les champs passés par `extra` sont émis comme champs structurés.
+"""
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+from app.core.config import settings
+
+_contexte: contextvars.ContextVar = contextvars.ContextVar("contexte_journal", default={})
+
+# Attributs d'un LogRecord qui ne sont pas des champs structurés
+_ATTRIBUTS_STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "contexte"}
+
+
+def contexte_courant() -> Dict[str, Any]:
+    """Retourne les champs de contexte ajoutés aux messages émis depuis le code courant"""
+    return dict(_contexte.get())
+
+
+@contextmanager
+def contexte_journal(**champs: Any):
+    """Ajoute des champs à tous les messages émis dans le bloc, y compris par les tâches créées dedans"""
+    jeton = _contexte.set({**_contexte.get(), **champs})
+    try:
+        yield
+    finally:
+        _contexte.reset(jeton)
+
+
+def _champs(record: logging.LogRecord) -> Dict[str, Any]:
+    return {cle: valeur for cle, valeur in vars(record).items() if cle not in _ATTRIBUTS_STANDARD}
+
+
+class FormateurJSON(logging.Formatter):
+    """Un objet JSON par ligne : horodatage, niveau, module, message, contexte et champs"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        document = {
+            "horodatage": f"{self.formatTime(record, '%Y-%m-%dT%H:%M:%S')}.{int(record.msecs):03d}",
+            "niveau": record.levelname,
+            "module": record.name,
+            "message": record.getMessage(),
+        }
+        document.update(getattr(record, "contexte", {}))
+        document.update(_champs(record))
+        if record.exc_text:
+            document["exception"] = record.exc_text
+        return json.dumps(document, ensure_ascii=False, default=str)
+
+
+class FormateurTexte(logging.Formatter):
+    """Ligne lisible suivie des champs sous forme cle=valeur"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        champs = {**getattr(record, "contexte", {}), **_champs(record)}
+        ligne = f"{self.formatTime(record)} {record.levelname} {record.name} {record.getMessage()}"
+        if champs:
+            ligne += " " + " ".join(f"{cle}={valeur}" for cle, valeur in champs.items())
+        if record.exc_text:
+            ligne += "\n" + record.exc_text
+        return ligne
+
+
+class _FiltreEchantillonnage(logging.Filter):
+    """Ne conserve qu'une part des messages sous WARNING"""
+
+    def __init__(self, taux: float):
+        super().__init__()
+        self.taux = taux
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or self.taux >= 1.0 or random.random() < self.taux
+
+
+class _FiltreContexte(logging.Filter):
+    """Capture le contexte dans le thread appelant, avant le passage par la file"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.contexte = _contexte.get()
+        return True
+
+
+class _GestionnaireFile(QueueHandler):
+    """Dépose les messages dans la file sans jamais bloquer ; les messages en excès sont comptés puis abandonnés"""
+
+    def __init__(self, file: queue.Queue):
+        super().__init__(file)
+        self.nb_abandonnes = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Fusion des arguments dans l'appelant (ils peuvent changer ensuite), formatage laissé au thread d'écriture
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.nb_abandonnes += 1
+
+
+class _Ecouteur(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # File éventuellement pleine à l'arrêt : attendre que le thread d'écriture libère une place
+        self.queue.put(self._sentinel)
+
+
+_verrou = threading.Lock()
+_gestionnaire: Optional[_GestionnaireFile] = None
+_ecouteur: Optional[_Ecouteur] = None
+
+
+def configurer_journal() -> None:
+    """Installe la file et le thread d'écriture sur le logger "app" (sans effet si déjà fait)"""
+    global _gestionnaire, _ecouteur
+    with _verrou:
+        if _gestionnaire is not None:
+            return
+        file = queue.Queue(maxsize=settings.LOG_TAILLE_FILE)
+        sortie = logging.StreamHandler(sys.stdout)
+        sortie.setFormatter(FormateurTexte() if settings.LOG_FORMAT == "texte" else FormateurJSON())
+
+        gestionnaire = _GestionnaireFile(file)
+        gestionnaire.addFilter(_FiltreEchantillonnage(settings.LOG_ECHANTILLONNAGE))
+        gestionnaire.addFilter(_FiltreContexte())
+
+        racine = logging.getLogger("app")
+        racine.setLevel(settings.LOG_NIVEAU.upper())
+        racine.addHandler(gestionnaire)
+        racine.propagate = False
+        for module, niveau in settings.LOG_NIVEAUX_PAR_MODULE.items():
+            logging.getLogger(module).setLevel(niveau.upper())
+
+        ecouteur = _Ecouteur(file, sortie)
+        ecouteur.start()
+        atexit.register(arreter_journal)
+        _gestionnaire, _ecouteur = gestionnaire, ecouteur
+
+
+def arreter_journal() -> None:
+    """Écrit les messages en attente puis arrête le thread d'écriture"""
+    global _ecouteur
+    with _verrou:
+        ecouteur, _ecouteur = _ecouteur, None
+    if ecouteur is not None:
+        ecouteur.stop()
+
+
+def obtenir_journal(nom: str) -> logging.Logger:
+    """Retourne le logger d'un module, après configuration de la journalisation au premier appel"""
+    configurer_journal()
+    return logging.getLogger(nom)
+
+
+def statistiques_journal() -> Dict[str, Any]:
+    """Retourne l'occupation de la file d'écriture et le nombre de messages abandonnés"""
+    if _gestionnaire is None:
+        return {"en_attente": 0, "taille_max": settings.LOG_TAILLE_FILE, "nb_abandonnes": 0}
+    return {
+        "en_attente": _gestionnaire.queue.qsize(),
+        "taille_max": settings.LOG_TAILLE_FILE,
+        "nb_abandonnes": _gestionnaire.nb_abandonnes,
+    }
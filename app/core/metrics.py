@@ -0,0 +1,196 @@
+"""
+Métriques au format d'exposition texte de Prometheus
+
+Compteurs et histogrammes étiquetés, thread-safe et sans dépendance externe, exposés par
+GET /metrics. Les valeurs déjà tenues par les composants (caches, inventaire, limiteur, file
+de jobs) sont lues au moment du scrape par des collecteurs plutôt que dupliquées.
+"""
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+from app.core.chronometrage import ajouter_observateur
+from app.core.journal import obtenir_journal
+
+journal = obtenir_journal(__name__)
+
+# Bornes par défaut, en secondes : des étapes locales (ms) aux appels LLM longs (minutes)
+BORNES_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_LE_INF = 'le="+Inf"'
+
+# Échantillon produit par un collecteur : (nom, type, description, [(étiquettes, valeur), ...])
+Echantillons = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _echapper(valeur) -> str:
+    return str(valeur).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquettes(noms: Sequence[str], valeurs: Sequence[str], supplementaires: str = "") -> str:
+    paires = [f'{nom}="{_echapper(valeur)}"' for nom, valeur in zip(noms, valeurs)]
+    if supplementaires:
+        paires.append(supplementaires)
+    return "{" + ",".join(paires) + "}" if paires else ""
+
+
+def _nombre(valeur: float) -> str:
+    if valeur == float("inf"):
+        return "+Inf"
+    return repr(float(valeur)) if isinstance(valeur, float) else str(valeur)
+
+
+class _Metrique:
+    type = ""
+
+    def __init__(self, nom: str, description: str, etiquettes: Sequence[str] = ()):
+        self.nom = nom
+        self.description = description
+        self.noms_etiquettes = tuple(etiquettes)
+        self._verrou = threading.Lock()
+        self._series = {}
+
+    def _cle(self, etiquettes: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(etiquettes.get(nom, "")) for nom in self.noms_etiquettes)
+
+    def _entete(self) -> List[str]:
+        return [f"# HELP {self.nom} {self.description}", f"# TYPE {self.nom} {self.type}"]
+
+
+class Compteur(_Metrique):
+    """Valeur croissante par combinaison d'étiquettes"""
+
+    type = "counter"
+
+    def inc(self, valeur: float = 1, **etiquettes: str) -> None:
+        cle = self._cle(etiquettes)
+        with self._verrou:
+            self._series[cle] = self._series.get(cle, 0) + valeur
+
+    def exposer(self) -> List[str]:
+        with self._verrou:
+            series = sorted(self._series.items())
+        lignes = self._entete()
+        for cle, valeur in series:
+            lignes.append(f"{self.nom}{_etiquettes(self.noms_etiquettes, cle)} {_nombre(valeur)}")
+        return lignes
+
+
+class Histogramme(_Metrique):
+    """Distribution d'observations par seaux cumulés, avec somme et nombre"""
+
+    type = "histogram"
+
+    def __init__(self, nom: str, description: str, etiquettes: Sequence[str] = (), bornes: Sequence[float] = BORNES_DUREE):
+        super().__init__(nom, description, etiquettes)
+        self.bornes = tuple(sorted(bornes))
+
+    def observer(self, valeur: float, **etiquettes: str) -> None:
+        cle = self._cle(etiquettes)
+        with self._verrou:
+            serie = self._series.get(cle)
+            if serie is None:
+                serie = self._series[cle] = [[0] * len(self.bornes), 0.0, 0]
+            for index, borne in enumerate(self.bornes):
+                if valeur <= borne:
+                    serie[0][index] += 1
+                    break
+            serie[1] += valeur
+            serie[2] += 1
+
+    def exposer(self) -> List[str]:
+        with self._verrou:
+            series = sorted((cle, (list(seaux), somme, nb)) for cle, (seaux, somme, nb) in self._series.items())
+        lignes = self._entete()
+        for cle, (seaux, somme, nb) in series:
+            cumul = 0
+            for borne, nb_seau in zip(self.bornes, seaux):
+                cumul += nb_seau
+                le = f'le="{_nombre(borne)}"'
+                lignes.append(f"{self.nom}_bucket{_etiquettes(self.noms_etiquettes, cle, le)} {cumul}")
+            lignes.append(f"{self.nom}_bucket{_etiquettes(self.noms_etiquettes, cle, _LE_INF)} {nb}")
+            lignes.append(f"{self.nom}_sum{_etiquettes(self.noms_etiquettes, cle)} {_nombre(somme)}")
+            lignes.append(f"{self.nom}_count{_etiquettes(self.noms_etiquettes, cle)} {nb}")
+        return lignes
+
+
+class RegistreMetriques:
+    """Ensemble des métriques du processus et des collecteurs lus à chaque exposition"""
+
+    def __init__(self):
+        self._metriques: List[_Metrique] = []
+        self._collecteurs: List[Callable[[], Iterable[Echantillons]]] = []
+
+    def compteur(self, nom: str, description: str, etiquettes: Sequence[str] = ()) -> Compteur:
+        metrique = Compteur(nom, description, etiquettes)
+        self._metriques.append(metrique)
+        return metrique
+
+    def histogramme(self, nom: str, description: str, etiquettes: Sequence[str] = (), bornes: Sequence[float] = BORNES_DUREE) -> Histogramme:
+        metrique = Histogramme(nom, description, etiquettes, bornes)
+        self._metriques.append(metrique)
+        return metrique
+
+    def ajouter_collecteur(self, collecteur: Callable[[], Iterable[Echantillons]]) -> None:
+        """Enregistre une fonction appelée à chaque exposition pour produire des échantillons calculés"""
+        self._collecteurs.append(collecteur)
+
+    def exposer(self) -> str:
+        """Retourne toutes les métriques au format texte de Prometheus"""
+        lignes = []
+        for metrique in self._metriques:
+            lignes.extend(metrique.exposer())
+        for collecteur in self._collecteurs:
+            try:
+                echantillons = list(collecteur())
+            except Exception as e:
+                journal.error("Collecteur de métriques en erreur: %s", e)
+                continue
+            for nom, type_metrique, description, valeurs in echantillons:
+                lignes.append(f"# HELP {nom} {description}")
+                lignes.append(f"# TYPE {nom} {type_metrique}")
+                for etiquettes, valeur in valeurs:
+                    noms = tuple(etiquettes)
+                    lignes.append(f"{nom}{_etiquettes(noms, [etiquettes[n] for n in noms])} {_nombre(valeur)}")
+        return "\n".join(lignes) + "\n"
+
+
+# Registre unique du processus et métriques instrumentées dans le code
+registre_metriques = RegistreMetriques()
+
+requetes_http_duree = registre_metriques.histogramme(
+    "http_requete_duree_secondes", "Durée de traitement des requêtes HTTP par route", ("route", "methode", "statut")
+)
+llm_appel_duree = registre_metriques.histogramme(
+    "llm_appel_duree_secondes", "Durée des appels au modèle", ("etape", "modele", "statut")
+)
+llm_tokens = registre_metriques.compteur(
+    "llm_tokens_total", "Tokens consommés par les appels au modèle", ("etape", "modele", "type")
+)
+llm_erreurs = registre_metriques.compteur(
+    "llm_erreurs_total", "Appels au modèle en erreur (rate_limit pour les 429)", ("etape", "modele", "type")
+)
+llm_retries = registre_metriques.compteur(
+    "llm_retries_total", "Nouvelles tentatives après un rate limit (limiteur, backoff des générateurs ou correcteur)", ("niveau",)
+)
+limiteur_attente = registre_metriques.histogramme(
+    "limiteur_attente_secondes", "Attente imposée par le limiteur de débit avant un appel au modèle"
+)
+pipeline_etape_duree = registre_metriques.histogramme(
+    "pipeline_etape_duree_secondes", "Durée des étapes du pipeline de génération", ("etape",)
+)
+generation_replis = registre_metriques.compteur(
+    "generation_replis_total", "Basculements vers un mode de génération de repli", ("de", "vers")
+)
+json_echecs = registre_metriques.compteur(
+    "json_parse_echecs_total", "Réponses du modèle dont aucun JSON exploitable n'a pu être extrait"
+)
+json_reparations = registre_metriques.compteur(
+    "json_reparations_total", "Réparations appliquées au JSON produit par le modèle", ("reparation",)
+)
+exercices_rejetes = registre_metriques.compteur(
+    "exercices_rejetes_total", "Exercices écartés à la validation"
+)
+questions_corrigees = registre_metriques.compteur(
+    "correction_questions_total", "Questions corrigées localement (clé connue), par le modèle ou par un appel groupé", ("mode",)
+)
+
+ajouter_observateur(lambda etape, duree: pipeline_etape_duree.observer(duree, etape=etape))
@@ -1,8 +1,17 @@
-from fastapi import FastAPI
+import time
+import uuid
+import asyncio
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.api.endpoints import languages, language_tests
+from app.core.metrics import requetes_http_duree
+from app.core.journal import contexte_journal
+from app.api.endpoints import languages, language_tests, corrections, monitoring
 from app.db import create_tables
+from app.services.ai_modules.llm_client import registre_llm
+from app.services.test_inventory_service import inventaire_tests
+from app.services.job_service import file_jobs
+from app.services.ai_modules.content_creator.theme_bank import banque_themes
 
 # Créer les tables de la base de données
 create_tables()
@@ -18,9 +27,89 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def instrumenter_requetes(request: Request, call_next):
+    """
+    Associe un identifiant de requête aux messages du journal (repris de l'en-tête X-Request-ID s'il est fourni)
+    et alimente l'histogramme de durée des requêtes, étiqueté par modèle de route (et non par URL)
+    
+    Pour une réponse en flux, la durée mesurée s'arrête à l'envoi des en-têtes.
+    """
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    debut = time.perf_counter()
+    statut = 500
+    try:
+        with contexte_journal(request_id=request_id):
+            reponse = await call_next(request)
+        statut = reponse.status_code
+        reponse.headers["X-Request-ID"] = request_id
+        return reponse
+    finally:
+        route = request.scope.get("route")
+        requetes_http_duree.observer(
+            time.perf_counter() - debut,
+            route=getattr(route, "path", "inconnue"),
+            methode=request.method,
+            statut=str(statut),
+        )
+
 # Inclure les routes
 app.include_router(languages.router, prefix="/api", tags=["languages"])
 app.include_router(language_tests.router, prefix="/api/tests", tags=["tests"])
+app.include_router(corrections.router, prefix="/api/corrections", tags=["corrections"])
+app.include_router(monitoring.router, prefix="/api/monitoring", tags=["monitoring"])
+app.include_router(monitoring.router_metriques, tags=["monitoring"])
+
+@app.on_event("startup")
+async def prechauffer_clients_llm():
+    """
+    Instancie les clients LLM partagés et ouvre les pools de connexions (synchrone et asynchrone)
+    avant la première requête
+    """
+    await asyncio.to_thread(registre_llm.prechauffer)
+    await registre_llm.prechauffer_async()
+
+@app.on_event("startup")
+async def demarrer_inventaire_tests():
+    """
+    Lance le worker qui maintient le stock de tests pré-générés
+    """
+    inventaire_tests.demarrer()
+
+@app.on_event("startup")
+async def demarrer_file_jobs():
+    """
+    Lance les workers de la file de jobs et reprend les jobs interrompus
+    """
+    await file_jobs.demarrer()
+
+@app.on_event("shutdown")
+async def arreter_file_jobs():
+    """
+    Arrête les workers de la file de jobs
+    """
+    await file_jobs.arreter()
+
+@app.on_event("shutdown")
+async def arreter_inventaire_tests():
+    """
+    Arrête le worker de rechargement de l'inventaire
+    """
+    await inventaire_tests.arreter()
+
+@app.on_event("shutdown")
+async def sauvegarder_banque_themes():
+    """
+    Écrit sur disque l'ordre de rotation des thèmes modifié depuis la dernière sauvegarde
+    """
+    await asyncio.to_thread(banque_themes.persister)
+
+@app.on_event("shutdown")
+async def fermer_clients_llm():
+    """
+    Ferme proprement les connexions HTTP keep-alive vers le fournisseur LLM
+    """
+    await registre_llm.fermer_async()
 
 @app.get("/")
 async def root():
@@ -0,0 +1,17 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, String, Text
+from app.db.base_class import Base
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True, index=True)
+    type = Column(String, nullable=False, index=True)
+    statut = Column(String, nullable=False, index=True)
+    parametres = Column(Text, nullable=False)  # JSON
+    progression = Column(Text, nullable=False, default="{}")  # JSON
+    resultat = Column(Text, nullable=True)  # JSON
+    erreur = Column(Text, nullable=True)
+    tentatives = Column(Integer, nullable=False, default=0)
+    cree_le = Column(DateTime, nullable=False, default=datetime.utcnow)
+    mis_a_jour_le = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
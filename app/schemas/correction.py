@@ -0,0 +1,40 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from app.schemas.language_test import TestComplet
+from app.schemas.job import JobResponse
+from app.services.ai_modules.corrector_ai import Evaluation, BilanCompetences
+
+class CorrectionTestRequest(BaseModel):
+    """
+    Réponses d'un apprenant à un test complet, soumises pour correction
+    """
+    test_id: Optional[str] = Field(None, description="Identifiant du test corrigé, repris dans la réponse")
+    langue: str = Field(..., description="Langue du test")
+    test: TestComplet = Field(..., description="Test tel qu'il a été généré")
+    reponses: Dict[str, List[Dict[int, str]]] = Field(
+        ...,
+        description="Par section, une entrée par exercice (dans l'ordre du test) associant l'id de chaque élément à la réponse"
+    )
+
+class CorrectionExerciceResponse(BaseModel):
+    """
+    Évaluation d'un exercice du test
+    """
+    section: str = Field(..., description="Section de l'exercice (comprehension_ecrite, grammaire, vocabulaire)")
+    index: int = Field(..., description="Position de l'exercice dans sa section")
+    evaluation: Evaluation
+
+class CorrectionTestResponse(BaseModel):
+    """
+    Correction complète d'un test : évaluation de chaque exercice et bilan des compétences
+    """
+    test_id: Optional[str] = Field(None, description="Identifiant du test corrigé")
+    langue: str = Field(..., description="Langue du test")
+    exercices: List[CorrectionExerciceResponse] = Field(default_factory=list)
+    bilan: BilanCompetences
+
+class CorrectionJobResponse(JobResponse):
+    """
+    État d'un job de correction ; la correction est disponible une fois le job terminé
+    """
+    resultat: Optional[CorrectionTestResponse] = Field(None, description="Correction une fois le job terminé")
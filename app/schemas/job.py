@@ -0,0 +1,31 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Optional
+from datetime import datetime
+from enum import Enum
+from app.schemas.language_test import LanguageTestResponse
+
+class StatutJob(str, Enum):
+    EN_ATTENTE = "en_attente"
+    EN_COURS = "en_cours"
+    TERMINE = "termine"
+    ECHEC = "echec"
+
+class JobResponse(BaseModel):
+    """
+    État d'un job exécuté en arrière-plan
+    """
+    id: str = Field(..., description="Identifiant du job")
+    type: str = Field(..., description="Type de traitement (generation_test, ...)")
+    statut: StatutJob = Field(..., description="en_attente, en_cours, termine ou echec")
+    progression: Dict[str, Any] = Field(default_factory=dict, description="Avancement détaillé (par section pour une génération)")
+    tentatives: int = Field(0, description="Nombre de tentatives déjà lancées")
+    erreur: Optional[str] = Field(None, description="Dernière erreur rencontrée")
+    resultat: Optional[Any] = Field(None, description="Résultat une fois le job terminé")
+    cree_le: datetime
+    mis_a_jour_le: datetime
+
+class TestJobResponse(JobResponse):
+    """
+    État d'un job de génération de test ; le test est disponible une fois le job terminé
+    """
+    resultat: Optional[LanguageTestResponse] = Field(None, description="Test généré une fois le job terminé")
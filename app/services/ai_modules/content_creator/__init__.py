@@ -16,11 +16,22 @@ from app.schemas.language_test import (
 )
 
 # Import des fonctions principales
-from .test_generator import generer_test_initial, generer_test_simplifie, generer_test_optimise, generer_test_parallele
-from .exercise_generators import generer_comprehension_ecrite, generer_grammaire, generer_vocabulaire
-from .theme_generator import generer_themes_aleatoires
-from .translation import traduire_termes_techniques, traduire_prompt
-from .utils import retry_with_backoff, safe_api_call, get_llm, valider_et_corriger_exercices
+from .test_generator import (
+    generer_test_initial, generer_test_simplifie, generer_test_optimise, generer_test_parallele,
+    generer_test_parallele_async, generer_sections_async, generer_exercices_flux_async
+)
+from .exercise_generators import (
+    generer_comprehension_ecrite, generer_grammaire, generer_vocabulaire,
+    generer_comprehension_ecrite_async, generer_grammaire_async, generer_vocabulaire_async,
+    generer_comprehension_ecrite_eclatee, generer_grammaire_eclatee, generer_vocabulaire_eclatee
+)
+from .theme_generator import generer_themes_aleatoires, generer_themes_aleatoires_async
+from .theme_bank import banque_themes, choisir_themes, choisir_themes_async
+from .translation import traduire_termes_techniques, traduire_prompt, traduire_termes_techniques_async, traduire_prompt_async
+from .utils import (
+    retry_with_backoff, retry_with_backoff_async, safe_api_call, get_llm, valider_et_corriger_exercices,
+    valider_section, assembler_test
+)
 
 # Définir les exports publics
 __all__ = [
@@ -41,12 +52,32 @@ __all__ = [
     'generer_grammaire', 
     'generer_vocabulaire',
     'generer_themes_aleatoires',
+    'choisir_themes',
+    'banque_themes',
     'traduire_termes_techniques',
     'traduire_prompt',
     
+    # Pipeline asynchrone
+    'generer_test_parallele_async',
+    'generer_sections_async',
+    'generer_exercices_flux_async',
+    'generer_comprehension_ecrite_async',
+    'generer_grammaire_async',
+    'generer_vocabulaire_async',
+    'generer_comprehension_ecrite_eclatee',
+    'generer_grammaire_eclatee',
+    'generer_vocabulaire_eclatee',
+    'generer_themes_aleatoires_async',
+    'choisir_themes_async',
+    'traduire_termes_techniques_async',
+    'traduire_prompt_async',
+    
     # Utilitaires
     'retry_with_backoff',
+    'retry_with_backoff_async',
     'safe_api_call',
     'get_llm',
-    'valider_et_corriger_exercices'
+    'valider_et_corriger_exercices',
+    'valider_section',
+    'assembler_test'
 ] 
\ No newline at end of file
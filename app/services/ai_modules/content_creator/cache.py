@@ -0,0 +1,276 @@
+"""
+Cache des sections d'exercices générées
+
+Les listes d'Exercice validées sont conservées sous une clé normalisée
+(langue, niveau, section, variante) dans un LRU en mémoire borné, doublé d'un
+niveau SQLite optionnel sur disque pour survivre aux redémarrages. Chaque couple
+(langue, niveau) dispose de SECTION_CACHE_VARIANTES variantes par section, tirées au hasard
+à chaque demande (tirage uniforme, sans état à partager entre workers ni à perdre au redémarrage).
+
+Le cache est désactivé par défaut (SECTION_CACHE_ACTIVE) : une fois activé, les apprenants d'un
+même niveau se partagent ce jeu borné de sections pendant SECTION_CACHE_TTL, et un test peut
+donc en recouper un autre. Une section demandée sur des thèmes imposés est conservée sous ces thèmes.
+"""
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import inspect
+import threading
+from collections import OrderedDict
+from functools import wraps
+from app.core.config import settings
+from .utils import adaptateur_exercices
+
+
+class StockageSQLite:
+    """Table clé/valeur persistante (valeurs JSON horodatées)"""
+
+    def __init__(self, chemin, table):
+        self.table = table
+        self._verrou = threading.Lock()
+        self._connexion = sqlite3.connect(chemin, check_same_thread=False)
+        with self._verrou, self._connexion:
+            self._connexion.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (cle TEXT PRIMARY KEY, valeur TEXT NOT NULL, cree_le REAL NOT NULL)"
+            )
+
+    def lire(self, cle):
+        """Retourne (valeur, cree_le) ou None si la clé est absente"""
+        with self._verrou:
+            ligne = self._connexion.execute(
+                f"SELECT valeur, cree_le FROM {self.table} WHERE cle = ?", (cle,)
+            ).fetchone()
+        if ligne is None:
+            return None
+        return json.loads(ligne[0]), ligne[1]
+
+    def ecrire(self, cle, valeur):
+        with self._verrou, self._connexion:
+            self._connexion.execute(
+                f"INSERT OR REPLACE INTO {self.table} (cle, valeur, cree_le) VALUES (?, ?, ?)",
+                (cle, json.dumps(valeur, ensure_ascii=False), time.time())
+            )
+
+    def supprimer(self, cle):
+        with self._verrou, self._connexion:
+            self._connexion.execute(f"DELETE FROM {self.table} WHERE cle = ?", (cle,))
+
+    def vider(self):
+        with self._verrou, self._connexion:
+            self._connexion.execute(f"DELETE FROM {self.table}")
+
+
+def normaliser_themes(themes):
+    """Normalise un thème ou une liste de thèmes pour la construction des clés"""
+    if not themes:
+        return ""
+    if isinstance(themes, str):
+        themes = [themes]
+    return ",".join(sorted(theme.strip().lower() for theme in themes))
+
+
+class CacheSections:
+    """LRU en mémoire avec TTL et niveau SQLite optionnel pour les sections d'exercices"""
+
+    def __init__(self, taille_max, ttl, chemin_sqlite=None, variantes=1):
+        self.taille_max = taille_max
+        self.ttl = ttl
+        self.variantes = max(1, variantes)
+        self._verrou = threading.Lock()
+        self._memoire = OrderedDict()
+        self._disque = StockageSQLite(chemin_sqlite, "sections_exercices") if chemin_sqlite else None
+        self._hits = 0
+        self._hits_disque = 0
+        self._misses = 0
+
+    @staticmethod
+    def cle(langue, niveau_cible, section, themes=None, variante=0):
+        """Construit la clé normalisée d'une section : ses thèmes s'ils sont imposés, sinon sa variante"""
+        niveau = (niveau_cible or "").strip().upper() or "B1"
+        suffixe = normaliser_themes(themes) if themes else f"variante:{variante}"
+        return "|".join([langue.strip().lower(), niveau, section, suffixe])
+
+    def cle_aleatoire(self, langue, niveau_cible, section):
+        """Clé d'une variante d'une section tirée uniformément parmi les `variantes` emplacements"""
+        return self.cle(langue, niveau_cible, section, variante=random.randrange(self.variantes))
+
+    def _est_expire(self, cree_le):
+        return self.ttl > 0 and time.time() - cree_le > self.ttl
+
+    def _lire_memoire(self, cle):
+        with self._verrou:
+            entree = self._memoire.get(cle)
+            if entree is None:
+                return None
+            exercices, cree_le = entree
+            if self._est_expire(cree_le):
+                del self._memoire[cle]
+                return None
+            self._memoire.move_to_end(cle)
+            self._hits += 1
+            return list(exercices)
+
+    def _lire_disque(self, cle):
+        entree = self._disque.lire(cle)
+        if entree is None:
+            return None
+        donnees, cree_le = entree
+        if self._est_expire(cree_le):
+            self._disque.supprimer(cle)
+            return None
+        exercices = adaptateur_exercices.validate_python(donnees)
+        with self._verrou:
+            self._placer(cle, exercices, cree_le)
+            self._hits_disque += 1
+        return list(exercices)
+
+    def _compter_miss(self):
+        with self._verrou:
+            self._misses += 1
+
+    def obtenir(self, cle):
+        """Retourne la liste d'exercices en cache, ou None si absente ou expirée"""
+        exercices = self._lire_memoire(cle)
+        if exercices is None and self._disque is not None:
+            exercices = self._lire_disque(cle)
+        if exercices is None:
+            self._compter_miss()
+        return exercices
+
+    async def obtenir_async(self, cle):
+        """Version asynchrone de obtenir : la lecture SQLite est faite hors de la boucle d'événements"""
+        exercices = self._lire_memoire(cle)
+        if exercices is None and self._disque is not None:
+            exercices = await asyncio.to_thread(self._lire_disque, cle)
+        if exercices is None:
+            self._compter_miss()
+        return exercices
+
+    def _placer(self, cle, exercices, cree_le):
+        """Insère une entrée en mémoire et évince les plus anciennes (appelé sous verrou)"""
+        self._memoire[cle] = (exercices, cree_le)
+        self._memoire.move_to_end(cle)
+        while len(self._memoire) > self.taille_max:
+            self._memoire.popitem(last=False)
+
+    def _ecrire_disque(self, cle, exercices):
+        self._disque.ecrire(cle, [exercice.model_dump(mode="json") for exercice in exercices])
+
+    def enregistrer(self, cle, exercices):
+        """Met en cache une liste d'exercices validés (les listes vides ne sont pas conservées)"""
+        if not exercices:
+            return
+        with self._verrou:
+            self._placer(cle, list(exercices), time.time())
+        if self._disque is not None:
+            self._ecrire_disque(cle, exercices)
+
+    async def enregistrer_async(self, cle, exercices):
+        """Version asynchrone de enregistrer : l'écriture SQLite est faite hors de la boucle d'événements"""
+        if not exercices:
+            return
+        with self._verrou:
+            self._placer(cle, list(exercices), time.time())
+        if self._disque is not None:
+            await asyncio.to_thread(self._ecrire_disque, cle, exercices)
+
+    def invalider(self, cle):
+        """Supprime une clé des deux niveaux de cache"""
+        with self._verrou:
+            self._memoire.pop(cle, None)
+        if self._disque is not None:
+            self._disque.supprimer(cle)
+
+    def invalider_section(self, langue, niveau_cible, section):
+        """Supprime toutes les variantes d'une section pour un couple (langue, niveau)"""
+        for variante in range(self.variantes):
+            self.invalider(self.cle(langue, niveau_cible, section, variante=variante))
+
+    def vider(self):
+        """Vide entièrement le cache"""
+        with self._verrou:
+            self._memoire.clear()
+        if self._disque is not None:
+            self._disque.vider()
+
+    def statistiques(self):
+        """Retourne les compteurs de hits/misses et l'occupation du cache"""
+        with self._verrou:
+            total = self._hits + self._hits_disque + self._misses
+            return {
+                "entrees_memoire": len(self._memoire),
+                "taille_max": self.taille_max,
+                "variantes": self.variantes,
+                "ttl_s": self.ttl,
+                "disque": self._disque is not None,
+                "hits": self._hits,
+                "hits_disque": self._hits_disque,
+                "misses": self._misses,
+                "taux_hit": round((self._hits + self._hits_disque) / total, 4) if total else 0.0,
+            }
+
+
+# Cache unique du processus
+cache_sections = CacheSections(
+    taille_max=settings.SECTION_CACHE_TAILLE_MAX,
+    ttl=settings.SECTION_CACHE_TTL,
+    chemin_sqlite=settings.SECTION_CACHE_SQLITE or None,
+    variantes=settings.SECTION_CACHE_VARIANTES,
+)
+
+
+def cle_section(langue, niveau_cible, section, themes=None):
+    """Clé d'une demande de section : ses thèmes s'ils sont imposés, sinon une variante tirée au hasard"""
+    if themes:
+        return CacheSections.cle(langue, niveau_cible, section, themes)
+    return cache_sections.cle_aleatoire(langue, niveau_cible, section)
+
+
+def _cle_appel(signature, section, args, kwargs):
+    """Clé de cache d'un appel de générateur (les thèmes sont son troisième paramètre, s'il existe)"""
+    appel = signature.bind(*args, **kwargs)
+    appel.apply_defaults()
+    noms = list(signature.parameters)
+    themes = appel.arguments.get(noms[2]) if len(noms) > 2 else None
+    return cle_section(appel.arguments["langue"], appel.arguments["niveau_cible"], section, themes)
+
+
+def avec_cache_section(section):
+    """Décorateur de générateur de section : (langue, niveau_cible, thèmes) -> List[Exercice]
+
+    Sans thèmes imposés, l'appel est servi par une variante de la section tirée au hasard pour
+    son couple (langue, niveau) ; en cas d'absence, le générateur tire ses thèmes et la variante
+    est enregistrée. Fonctionne pour les générateurs synchrones comme pour les coroutines.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapper_async(*args, **kwargs):
+                if not settings.SECTION_CACHE_ACTIVE:
+                    return await func(*args, **kwargs)
+                cle = _cle_appel(signature, section, args, kwargs)
+                exercices = await cache_sections.obtenir_async(cle)
+                if exercices is not None:
+                    return exercices
+                exercices = await func(*args, **kwargs)
+                await cache_sections.enregistrer_async(cle, exercices)
+                return exercices
+            return wrapper_async
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not settings.SECTION_CACHE_ACTIVE:
+                return func(*args, **kwargs)
+            cle = _cle_appel(signature, section, args, kwargs)
+            exercices = cache_sections.obtenir(cle)
+            if exercices is not None:
+                return exercices
+            exercices = func(*args, **kwargs)
+            cache_sections.enregistrer(cle, exercices)
+            return exercices
+        return wrapper
+    return decorator
@@ -1,16 +1,23 @@
+import asyncio
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from .utils import retry_with_backoff, get_llm, valider_et_corriger_exercices, parse_json_from_text, fast_api_call, ultra_fast_api_call
-from .theme_generator import generer_themes_aleatoires
+from .utils import (
+    get_llm, valider_et_corriger_exercices, parse_json_from_text,
+    fast_api_call, ultra_fast_api_call, fast_api_call_async, ultra_fast_api_call_async
+)
+from .theme_bank import choisir_themes, choisir_themes_async
+from .cache import avec_cache_section, cache_sections, cle_section
+from .json_extraction import AnalyseurJSONIncremental
+from ..rate_limiter import limiteur, est_erreur_rate_limit
+from app.core.config import settings
+from app.core.metrics import llm_retries
+from app.core.chronometrage import mesurer
+from app.core.journal import obtenir_journal
 
-@retry_with_backoff(max_retries=3, base_delay=10)
-def generer_comprehension_ecrite(langue, niveau_cible="", themes=None):
-    """Génère uniquement la section compréhension écrite avec des QCM"""
-    if themes is None:
-        themes = generer_themes_aleatoires(langue, nombre=3, categorie="compréhension")
-    
-    llm = get_llm(temperature=0.8)  # Température élevée pour plus de créativité
-    
+journal = obtenir_journal(__name__)
+
+def _preparer_comprehension_ecrite(langue, niveau_cible, themes):
+    """Construit le prompt et les variables de la section compréhension écrite"""
     # Définir la complexité selon le niveau
     complexite_config = {
         "A1": {
@@ -197,9 +204,7 @@ CRÉATIVITÉ OBLIGATOIRE:
     
     config_niveau = complexite_config[niveau_cible_final]
     
-    # Faire l'appel à l'API
-    chain_text = prompt | llm | StrOutputParser()
-    resultat = ultra_fast_api_call(lambda: chain_text.invoke({
+    variables = {
         "langue": langue,
         "niveau_str": niveau_str,
         "niveau_cible": niveau_cible_final,
@@ -208,20 +213,11 @@ CRÉATIVITÉ OBLIGATOIRE:
         "longueur_texte": config_niveau["longueur_texte"],
         "types_questions": ", ".join(config_niveau["types_questions"]),
         "difficulte": config_niveau["difficulte"]
-    }))
-    
-    # Extraire et parser le JSON
-    exercices_data = parse_json_from_text(resultat)
-    if exercices_data:
-        return valider_et_corriger_exercices(exercices_data, "QCM")
-    else:
-        return []
+    }
+    return prompt, variables
 
-@retry_with_backoff(max_retries=3, base_delay=10)
-def generer_grammaire(langue, niveau_cible=""):
-    """Génère uniquement la section grammaire avec des QCM"""
-    llm = get_llm(temperature=0.8)
-    
+def _preparer_grammaire(langue, niveau_cible):
+    """Construit le prompt et les variables de la section grammaire"""
     # Configuration de complexité grammaticale par niveau
     complexite_grammaire = {
         "A1": {
@@ -449,9 +445,7 @@ CRÉATIVITÉ GRAMMATICALE OBLIGATOIRE:
     niveau_str = f" de niveau {niveau_cible}" if niveau_cible else ""
     niveau_cible_final = niveau_cible if niveau_cible else "B1"
     
-    # Faire l'appel à l'API
-    chain_text = prompt | llm | StrOutputParser()
-    resultat = fast_api_call(lambda: chain_text.invoke({
+    variables = {
         "langue": langue,
         "niveau_str": niveau_str,
         "niveau_cible": niveau_cible_final,
@@ -460,23 +454,11 @@ CRÉATIVITÉ GRAMMATICALE OBLIGATOIRE:
         "complexite_phrases": config_gram["complexite_phrases"],
         "difficulte": config_gram["difficulte"],
         "structures_principales": config_gram["structures"][0] + " et " + config_gram["structures"][1] if len(config_gram["structures"]) > 1 else config_gram["structures"][0]
-    }))
-    
-    # Extraire et parser le JSON
-    exercices_data = parse_json_from_text(resultat)
-    if exercices_data:
-        return valider_et_corriger_exercices(exercices_data, "QCM")
-    else:
-        return []
+    }
+    return prompt, variables
 
-@retry_with_backoff(max_retries=3, base_delay=10)
-def generer_vocabulaire(langue, niveau_cible="", domaines=None):
-    """Génère uniquement la section vocabulaire avec des QCM"""
-    if domaines is None:
-        domaines = generer_themes_aleatoires(langue, nombre=3, categorie="domaines")
-    
-    llm = get_llm(temperature=0.8)
-    
+def _preparer_vocabulaire(langue, niveau_cible, domaines):
+    """Construit le prompt et les variables de la section vocabulaire"""
     # Configuration de complexité lexicale par niveau
     complexite_vocabulaire = {
         "A1": {
@@ -666,9 +648,7 @@ CRÉATIVITÉ LEXICALE OBLIGATOIRE:
     domaine1 = domaines[0]
     domaine2 = domaines[1] if len(domaines) > 1 else domaines[0]
     
-    # Faire l'appel à l'API
-    chain_text = prompt | llm | StrOutputParser()
-    resultat = fast_api_call(lambda: chain_text.invoke({
+    variables = {
         "langue": langue,
         "niveau_str": niveau_str,
         "niveau_cible": niveau_cible_final,
@@ -678,11 +658,288 @@ CRÉATIVITÉ LEXICALE OBLIGATOIRE:
         "strategies": ", ".join(config_vocab["strategies"]),
         "complexite_context": config_vocab["complexite_context"],
         "difficulte": config_vocab["difficulte"]
-    }))
-    
-    # Extraire et parser le JSON
-    exercices_data = parse_json_from_text(resultat)
+    }
+    return prompt, variables
+
+def _extraire_exercices(resultat):
+    """Extrait, parse et valide les exercices renvoyés par le modèle"""
+    with mesurer("parse"):
+        exercices_data = parse_json_from_text(resultat)
     if exercices_data:
-        return valider_et_corriger_exercices(exercices_data, "QCM")
+        with mesurer("validation"):
+            return valider_et_corriger_exercices(exercices_data, "QCM")
     else:
-        return [] 
\ No newline at end of file
+        return []
+
+@avec_cache_section("comprehension_ecrite")
+def generer_comprehension_ecrite(langue, niveau_cible="", themes=None):
+    """Génère uniquement la section compréhension écrite avec des QCM"""
+    if themes is None:
+        themes = choisir_themes(langue, nombre=3, categorie="compréhension")
+    
+    llm = get_llm(temperature=0.8)  # Température élevée pour plus de créativité
+    prompt, variables = _preparer_comprehension_ecrite(langue, niveau_cible, themes)
+    
+    # Faire l'appel à l'API
+    chain_text = prompt | llm | StrOutputParser()
+    with mesurer("generation_section"):
+        resultat = ultra_fast_api_call(lambda: chain_text.invoke(variables))
+    
+    # Extraire et parser le JSON
+    return _extraire_exercices(resultat)
+
+@avec_cache_section("grammaire")
+def generer_grammaire(langue, niveau_cible=""):
+    """Génère uniquement la section grammaire avec des QCM"""
+    llm = get_llm(temperature=0.8)
+    prompt, variables = _preparer_grammaire(langue, niveau_cible)
+    
+    # Faire l'appel à l'API
+    chain_text = prompt | llm | StrOutputParser()
+    with mesurer("generation_section"):
+        resultat = fast_api_call(lambda: chain_text.invoke(variables))
+    
+    # Extraire et parser le JSON
+    return _extraire_exercices(resultat)
+
+@avec_cache_section("vocabulaire")
+def generer_vocabulaire(langue, niveau_cible="", domaines=None):
+    """Génère uniquement la section vocabulaire avec des QCM"""
+    if domaines is None:
+        domaines = choisir_themes(langue, nombre=3, categorie="domaines")
+    
+    llm = get_llm(temperature=0.8)
+    prompt, variables = _preparer_vocabulaire(langue, niveau_cible, domaines)
+    
+    # Faire l'appel à l'API
+    chain_text = prompt | llm | StrOutputParser()
+    with mesurer("generation_section"):
+        resultat = fast_api_call(lambda: chain_text.invoke(variables))
+    
+    # Extraire et parser le JSON
+    return _extraire_exercices(resultat)
+
+# Versions asynchrones : mêmes prompts, mais appels non bloquants via ainvoke
+# pour permettre de nombreuses générations concurrentes sur un seul worker
+
+@avec_cache_section("comprehension_ecrite")
+async def generer_comprehension_ecrite_async(langue, niveau_cible="", themes=None):
+    """Version asynchrone de generer_comprehension_ecrite"""
+    if themes is None:
+        themes = await choisir_themes_async(langue, nombre=3, categorie="compréhension")
+    
+    llm = get_llm(temperature=0.8)
+    prompt, variables = _preparer_comprehension_ecrite(langue, niveau_cible, themes)
+    
+    chain_text = prompt | llm | StrOutputParser()
+    with mesurer("generation_section"):
+        resultat = await ultra_fast_api_call_async(chain_text.ainvoke, variables)
+    
+    return _extraire_exercices(resultat)
+
+@avec_cache_section("grammaire")
+async def generer_grammaire_async(langue, niveau_cible=""):
+    """Version asynchrone de generer_grammaire"""
+    llm = get_llm(temperature=0.8)
+    prompt, variables = _preparer_grammaire(langue, niveau_cible)
+    
+    chain_text = prompt | llm | StrOutputParser()
+    with mesurer("generation_section"):
+        resultat = await fast_api_call_async(chain_text.ainvoke, variables)
+    
+    return _extraire_exercices(resultat)
+
+@avec_cache_section("vocabulaire")
+async def generer_vocabulaire_async(langue, niveau_cible="", domaines=None):
+    """Version asynchrone de generer_vocabulaire"""
+    if domaines is None:
+        domaines = await choisir_themes_async(langue, nombre=3, categorie="domaines")
+    
+    llm = get_llm(temperature=0.8)
+    prompt, variables = _preparer_vocabulaire(langue, niveau_cible, domaines)
+    
+    chain_text = prompt | llm | StrOutputParser()
+    with mesurer("generation_section"):
+        resultat = await fast_api_call_async(chain_text.ainvoke, variables)
+    
+    return _extraire_exercices(resultat)
+
+# Versions éclatées (GENERATION_MODE="fanout") : chaque exercice fait l'objet de son propre appel,
+# tous lancés simultanément ; la durée d'une section tend vers celle de son exercice le plus long
+
+# Nombre d'exercices demandés par chaque prompt de section
+NB_EXERCICES_PAR_SECTION = {"comprehension_ecrite": 2, "grammaire": 3, "vocabulaire": 2}
+
+PROMPT_EXERCICE_UNIQUE = ChatPromptTemplate.from_template(
+    """GÉNÉRATION PARTIELLE: ne génère QUE l'exercice numéro {numero_exercice} sur {nb_exercices} décrit ci-dessus,
+en respectant son thème ou son domaine s'il en a un. Réponds avec un tableau JSON contenant UN SEUL exercice,
+au format de la structure obligatoire."""
+)
+
+async def _generer_section_eclatee(section, prompt, variables):
+    """Génère les exercices d'une section par des appels concurrents, un par exercice, puis les réassemble dans l'ordre"""
+    nb_exercices = NB_EXERCICES_PAR_SECTION[section]
+    llm = get_llm(temperature=0.8)
+    chain_text = (prompt + PROMPT_EXERCICE_UNIQUE) | llm | StrOutputParser()
+    
+    async def _un_exercice(numero):
+        with mesurer("generation_section"):
+            resultat = await fast_api_call_async(
+                chain_text.ainvoke,
+                {**variables, "numero_exercice": numero, "nb_exercices": nb_exercices}
+            )
+        exercices = _extraire_exercices(resultat)
+        if len(exercices) > 1:
+            # Le modèle a ignoré la consigne d'exercice unique (souvent en renvoyant toute la section) :
+            # garder l'exercice de ce rang pour ne pas dupliquer le premier dans la section
+            journal.error(
+                "Exercice %d/%d: %d exercices renvoyés au lieu d'un seul", numero, nb_exercices, len(exercices),
+                extra={"section": section}
+            )
+            return [exercices[min(numero, len(exercices)) - 1]]
+        return exercices
+    
+    resultats = await asyncio.gather(
+        *(_un_exercice(numero) for numero in range(1, nb_exercices + 1)),
+        return_exceptions=True
+    )
+    
+    exercices = []
+    erreurs = []
+    deja_vus = set()
+    for numero, resultat in enumerate(resultats, 1):
+        if isinstance(resultat, Exception):
+            journal.warning(
+                "Erreur lors de la génération de l'exercice %d/%d: %s", numero, nb_exercices, resultat,
+                extra={"section": section}
+            )
+            erreurs.append(resultat)
+            continue
+        for exercice in resultat:
+            empreinte = exercice.model_dump_json()
+            if empreinte in deja_vus:
+                journal.error("Exercice %d/%d identique à un exercice déjà généré, ignoré", numero, nb_exercices,
+                              extra={"section": section})
+                continue
+            deja_vus.add(empreinte)
+            exercices.append(exercice)
+    
+    # Aucun exercice obtenu : remonter l'erreur pour laisser le repli de section décider
+    if not exercices and erreurs:
+        raise erreurs[0]
+    return exercices
+
+@avec_cache_section("comprehension_ecrite")
+async def generer_comprehension_ecrite_eclatee(langue, niveau_cible="", themes=None):
+    """Version éclatée de generer_comprehension_ecrite_async (un appel par texte)"""
+    if themes is None:
+        themes = await choisir_themes_async(langue, nombre=3, categorie="compréhension")
+    prompt, variables = _preparer_comprehension_ecrite(langue, niveau_cible, themes)
+    return await _generer_section_eclatee("comprehension_ecrite", prompt, variables)
+
+@avec_cache_section("grammaire")
+async def generer_grammaire_eclatee(langue, niveau_cible=""):
+    """Version éclatée de generer_grammaire_async (un appel par point de grammaire)"""
+    prompt, variables = _preparer_grammaire(langue, niveau_cible)
+    return await _generer_section_eclatee("grammaire", prompt, variables)
+
+@avec_cache_section("vocabulaire")
+async def generer_vocabulaire_eclatee(langue, niveau_cible="", domaines=None):
+    """Version éclatée de generer_vocabulaire_async (un appel par champ lexical)"""
+    if domaines is None:
+        domaines = await choisir_themes_async(langue, nombre=3, categorie="domaines")
+    prompt, variables = _preparer_vocabulaire(langue, niveau_cible, domaines)
+    return await _generer_section_eclatee("vocabulaire", prompt, variables)
+
+# Versions en flux : chaque exercice est validé et produit dès que son objet JSON est complet,
+# pendant que le modèle continue d'écrire les suivants
+
+async def _fragments_limites(chain_text, variables):
+    """Flux du modèle soumis au limiteur global, comme appel_api_limite_async
+    
+    Un 429 survenu avant le premier fragment suspend le limiteur et relance le flux ; au-delà,
+    des exercices ont déjà été produits et l'erreur est remontée (après signalement au limiteur).
+    """
+    for tentative in range(settings.LLM_MAX_TENTATIVES_RATE_LIMIT):
+        attente = await limiteur.acquerir_async()
+        if attente > 0:
+            journal.debug("Limiteur de débit: attente avant appel API", extra={"attente_ms": round(attente * 1000)})
+        premier_recu = False
+        try:
+            async for fragment in chain_text.astream(variables):
+                premier_recu = True
+                yield fragment
+            return
+        except Exception as e:
+            if not est_erreur_rate_limit(e):
+                raise
+            limiteur.signaler_rate_limit()
+            if premier_recu or tentative == settings.LLM_MAX_TENTATIVES_RATE_LIMIT - 1:
+                raise
+            journal.warning("Rate limit détecté: %s - nouvel essai %d/%d", e, tentative + 1, settings.LLM_MAX_TENTATIVES_RATE_LIMIT)
+            llm_retries.inc(niveau="limiteur")
+
+async def _flux_exercices(section, cle_cache, preparer):
+    """Produit les exercices d'une section au fil de la génération (ou depuis le cache)
+    
+    Le cache est consulté avant `preparer` (coroutine retournant prompt et variables) : comme
+    pour avec_cache_section, une section servie depuis le cache ne tire aucun thème de la banque.
+    """
+    if settings.SECTION_CACHE_ACTIVE:
+        exercices_caches = await cache_sections.obtenir_async(cle_cache)
+        if exercices_caches is not None:
+            for exercice in exercices_caches:
+                yield exercice
+            return
+    
+    prompt, variables = await preparer()
+    llm = get_llm(temperature=0.8)
+    chain_text = prompt | llm | StrOutputParser()
+    analyseur = AnalyseurJSONIncremental()
+    exercices = []
+    
+    async for fragment in _fragments_limites(chain_text, variables):
+        for exercice_data in analyseur.alimenter(fragment):
+            for exercice in valider_et_corriger_exercices([exercice_data], "QCM"):
+                exercices.append(exercice)
+                yield exercice
+    
+    if settings.SECTION_CACHE_ACTIVE:
+        await cache_sections.enregistrer_async(cle_cache, exercices)
+
+async def generer_comprehension_ecrite_flux(langue, niveau_cible="", themes=None):
+    """Version en flux de generer_comprehension_ecrite"""
+    # Clé calculée avant le tirage : sans thèmes imposés, la section est servie par variante
+    cle_cache = cle_section(langue, niveau_cible, "comprehension_ecrite", themes)
+    
+    async def preparer():
+        themes_section = themes
+        if themes_section is None:
+            themes_section = await choisir_themes_async(langue, nombre=3, categorie="compréhension")
+        return _preparer_comprehension_ecrite(langue, niveau_cible, themes_section)
+    
+    async for exercice in _flux_exercices("comprehension_ecrite", cle_cache, preparer):
+        yield exercice
+
+async def generer_grammaire_flux(langue, niveau_cible=""):
+    """Version en flux de generer_grammaire"""
+    cle_cache = cle_section(langue, niveau_cible, "grammaire")
+    
+    async def preparer():
+        return _preparer_grammaire(langue, niveau_cible)
+    
+    async for exercice in _flux_exercices("grammaire", cle_cache, preparer):
+        yield exercice
+
+async def generer_vocabulaire_flux(langue, niveau_cible="", domaines=None):
+    """Version en flux de generer_vocabulaire"""
+    cle_cache = cle_section(langue, niveau_cible, "vocabulaire", domaines)
+    
+    async def preparer():
+        domaines_section = domaines
+        if domaines_section is None:
+            domaines_section = await choisir_themes_async(langue, nombre=3, categorie="domaines")
+        return _preparer_vocabulaire(langue, niveau_cible, domaines_section)
+    
+    async for exercice in _flux_exercices("vocabulaire", cle_cache, preparer):
+        yield exercice
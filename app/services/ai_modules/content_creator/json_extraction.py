@@ -0,0 +1,267 @@
+"""
+Extraction du JSON produit par le LLM
+
+extraire_json isole en une seule passe le tableau JSON de la réponse complète (en équilibrant
+les crochets hors chaînes littérales) et applique au besoin des réparations légères pour les
+défauts fréquents des LLM. AnalyseurJSONIncremental consomme la sortie du modèle fragment par
+fragment (astream) et restitue chaque objet du tableau dès que son accolade fermante arrive.
+"""
+import re
+import json
+from app.core.journal import obtenir_journal
+
+journal = obtenir_journal(__name__)
+
+_ECHEC = object()
+
+_GUILLEMET_OUVRANT = re.compile(r'(?<=[\[{,:])(\s*)[“”„«]\s?')
+_GUILLEMET_FERMANT = re.compile(r'\s?[“”»](?=\s*[:,\]}])')
+_VIRGULE_FINALE = re.compile(r',(\s*[\]}])')
+_LITTERAUX_PYTHON = {"True": "true", "False": "false", "None": "null"}
+_LITTERAL_PYTHON = re.compile(r'\b(True|False|None)\b')
+
+
+def _hors_chaines(texte, transformation):
+    """Applique `transformation` aux seules portions du texte situées hors des chaînes littérales"""
+    morceaux = []
+    debut = 0
+    dans_chaine = False
+    echappement = False
+    for index, caractere in enumerate(texte):
+        if dans_chaine:
+            if echappement:
+                echappement = False
+            elif caractere == "\\":
+                echappement = True
+            elif caractere == '"':
+                dans_chaine = False
+                morceaux.append(texte[debut:index + 1])
+                debut = index + 1
+        elif caractere == '"':
+            morceaux.append(transformation(texte[debut:index]))
+            debut = index
+            dans_chaine = True
+    reste = texte[debut:]
+    morceaux.append(reste if dans_chaine else transformation(reste))
+    return "".join(morceaux)
+
+
+def _remplacer_guillemets(morceau):
+    morceau = _GUILLEMET_OUVRANT.sub(lambda m: m.group(1) + '"', morceau)
+    return _GUILLEMET_FERMANT.sub('"', morceau)
+
+
+def _reparer_guillemets(texte):
+    """Remplace les guillemets typographiques utilisés comme délimiteurs JSON
+
+    Les chaînes déjà ouvertes par un guillemet droit sont laissées intactes : les « » et “ ”
+    d'un texte français y sont du contenu, pas des délimiteurs.
+    """
+    return _hors_chaines(texte, _remplacer_guillemets)
+
+
+def _reparer_virgules(texte):
+    """Supprime les virgules finales avant ] ou }"""
+    return _hors_chaines(texte, lambda morceau: _VIRGULE_FINALE.sub(r'\1', morceau))
+
+
+def _reparer_litteraux(texte):
+    """Convertit True/False/None (syntaxe Python) en littéraux JSON"""
+    return _hors_chaines(texte, lambda morceau: _LITTERAL_PYTHON.sub(lambda m: _LITTERAUX_PYTHON[m.group(1)], morceau))
+
+
+# Réparations appliquées successivement tant que le texte ne se charge pas ; celle des
+# guillemets, la plus intrusive, vient en dernier
+_REPARATIONS = [
+    ("virgules_finales", _reparer_virgules),
+    ("litteraux_python", _reparer_litteraux),
+    ("guillemets_typographiques", _reparer_guillemets),
+]
+
+
+def _charger(texte, reparations):
+    """Charge le texte JSON, en tolérant les caractères de contrôle dans les chaînes"""
+    try:
+        return json.loads(texte)
+    except json.JSONDecodeError:
+        pass
+    try:
+        valeur = json.loads(texte, strict=False)
+        reparations.append("caracteres_de_controle")
+        return valeur
+    except json.JSONDecodeError:
+        return _ECHEC
+
+
+def charger_avec_reparations(texte):
+    """Charge un texte JSON en appliquant au besoin les réparations usuelles
+
+    Retourne (valeur, reparations) ; valeur vaut None si le texte reste invalide.
+    """
+    reparations = []
+    valeur = _charger(texte, reparations)
+    if valeur is not _ECHEC:
+        return valeur, reparations
+    for nom, reparer in _REPARATIONS:
+        corrige = reparer(texte)
+        if corrige == texte:
+            continue
+        texte = corrige
+        reparations.append(nom)
+        valeur = _charger(texte, reparations)
+        if valeur is not _ECHEC:
+            return valeur, reparations
+    return None, reparations
+
+
+def _trouver_debut(texte):
+    """Position du tableau JSON : premier '[' suivi d'un objet, à défaut premier '['"""
+    premier = None
+    for correspondance in re.finditer(r'\[', texte):
+        if premier is None:
+            premier = correspondance.start()
+        suite = texte[correspondance.end():correspondance.end() + 64].lstrip()
+        if suite.startswith("{") or suite.startswith("]"):
+            return correspondance.start()
+    return premier
+
+
+def _delimiter(texte, debut):
+    """Parcourt le texte depuis `debut` en équilibrant crochets et accolades hors chaînes
+
+    Retourne (fin, dernier_element) : fin est l'index du crochet fermant (None si le texte
+    est tronqué) et dernier_element l'index de la fin du dernier élément complet du tableau.
+    """
+    pile = []
+    dans_chaine = False
+    echappement = False
+    dernier_element = None
+    for index in range(debut, len(texte)):
+        caractere = texte[index]
+        if dans_chaine:
+            if echappement:
+                echappement = False
+            elif caractere == "\\":
+                echappement = True
+            elif caractere == '"':
+                dans_chaine = False
+        elif caractere == '"':
+            dans_chaine = True
+        elif caractere in "[{":
+            pile.append(caractere)
+        elif caractere in "]}":
+            if pile:
+                pile.pop()
+            if not pile:
+                return index, dernier_element
+            if len(pile) == 1:
+                dernier_element = index
+    return None, dernier_element
+
+
+def extraire_json(texte):
+    """Extrait le tableau JSON d'une réponse de LLM en une passe linéaire
+
+    Retourne (donnees, reparations) où reparations liste les corrections appliquées
+    (troncature, virgules_finales, guillemets_typographiques, litteraux_python,
+    caracteres_de_controle) ; donnees vaut None si aucun tableau exploitable n'a été trouvé.
+    """
+    if not texte:
+        return None, []
+    debut = _trouver_debut(texte)
+    if debut is None:
+        return None, []
+
+    fin, dernier_element = _delimiter(texte, debut)
+    if fin is not None:
+        fragment = texte[debut:fin + 1]
+        troncature = []
+    elif dernier_element is not None:
+        # Réponse coupée : conserver les éléments complets et refermer le tableau
+        fragment = texte[debut:dernier_element + 1] + "]"
+        troncature = ["troncature"]
+    else:
+        return None, []
+
+    donnees, reparations = charger_avec_reparations(fragment)
+    return donnees, troncature + reparations
+
+
+class AnalyseurJSONIncremental:
+    """Analyseur incrémental d'un tableau JSON d'objets
+
+    Le texte qui précède le tableau (préambule, balise ```json) est ignoré : comme pour
+    _trouver_debut, seul un '[' suivi d'un objet ou de ']' ouvre le tableau. Les chaînes
+    littérales sont suivies pour ne pas compter les accolades qu'elles contiennent.
+    """
+
+    def __init__(self):
+        self._profondeur = 0
+        self._dans_chaine = False
+        self._echappement = False
+        self._dans_tableau = False
+        self._crochet_en_attente = False
+        self._termine = False
+        self._tampon = []
+        self.nb_erreurs = 0
+
+    @property
+    def termine(self):
+        """Vrai une fois le crochet fermant du tableau de premier niveau rencontré"""
+        return self._termine
+
+    def alimenter(self, fragment):
+        """Ajoute un fragment de texte et retourne la liste des objets complétés par ce fragment"""
+        objets = []
+        for caractere in fragment:
+            if self._termine:
+                break
+
+            if self._profondeur == 0:
+                # Hors objet : repérer le début du tableau, puis d'un objet ou la fin du tableau.
+                # Dans le préambule, un '[' n'ouvre le tableau que si le caractère non blanc
+                # suivant est '{' ou ']' (les "[le JSON]" et accolades isolées sont ignorés)
+                if not self._dans_tableau:
+                    if caractere.isspace():
+                        continue
+                    if not (self._crochet_en_attente and caractere in "{]"):
+                        self._crochet_en_attente = caractere == "["
+                        continue
+                    self._dans_tableau = True
+                if caractere == "{":
+                    self._profondeur = 1
+                    self._tampon = [caractere]
+                elif caractere == "]":
+                    self._termine = True
+                continue
+
+            self._tampon.append(caractere)
+            if self._dans_chaine:
+                if self._echappement:
+                    self._echappement = False
+                elif caractere == "\\":
+                    self._echappement = True
+                elif caractere == '"':
+                    self._dans_chaine = False
+            elif caractere == '"':
+                self._dans_chaine = True
+            elif caractere in "{[":
+                self._profondeur += 1
+            elif caractere in "}]":
+                self._profondeur -= 1
+                if self._profondeur == 0:
+                    objet = self._decoder("".join(self._tampon))
+                    self._tampon = []
+                    if objet is not None:
+                        objets.append(objet)
+        return objets
+
+    def _decoder(self, texte):
+        objet, reparations = charger_avec_reparations(texte)
+        if objet is None:
+            journal.warning("Objet JSON invalide ignoré dans le flux")
+            self.nb_erreurs += 1
+            return None
+        if reparations:
+            journal.info("Objet JSON réparé dans le flux", extra={"reparations": reparations})
+        return objet if isinstance(objet, dict) else None
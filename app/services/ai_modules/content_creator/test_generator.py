@@ -1,59 +1,38 @@
-import time
-import random
 import asyncio
-import threading
+import contextvars
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from app.schemas.language_test import TestComplet
-from .utils import safe_api_call, fast_api_call
-from .exercise_generators import generer_comprehension_ecrite, generer_grammaire, generer_vocabulaire
-from .theme_generator import generer_themes_aleatoires
+from .exercise_generators import (
+    generer_comprehension_ecrite, generer_grammaire, generer_vocabulaire,
+    generer_comprehension_ecrite_async, generer_grammaire_async, generer_vocabulaire_async,
+    generer_comprehension_ecrite_eclatee, generer_grammaire_eclatee, generer_vocabulaire_eclatee,
+    generer_comprehension_ecrite_flux, generer_grammaire_flux, generer_vocabulaire_flux
+)
+from .theme_bank import choisir_themes
+from .utils import assembler_test
+from app.core.config import settings
+from app.core.metrics import generation_replis
+from app.core.journal import obtenir_journal
 
-def ultra_fast_api_call(func, *args, **kwargs):
-    """Fonction utilitaire pour faire des appels API ultra-rapides"""
-    try:
-        # Délai ultra-réduit entre 0.2 et 0.8 secondes avant chaque appel
-        delay = random.uniform(0.2, 0.8)
-        print(f"Appel API haute performance - délai: {delay:.1f}s")
-        time.sleep(delay)
-        
-        result = func(*args, **kwargs)
-        
-        # Délai ultra-réduit après l'appel réussi
-        post_delay = random.uniform(0.1, 0.5)
-        print(f"Appel API terminé - délai post-traitement: {post_delay:.1f}s")
-        time.sleep(post_delay)
-        
-        return result
-    except Exception as e:
-        if "429" in str(e) or "rate limit" in str(e).lower():
-            print(f"Rate limit détecté en mode haute performance: {e}")
-            print("Basculement vers le mode optimisé")
-            # En cas de rate limit, basculer vers fast_api_call
-            time.sleep(5)
-            return fast_api_call(func, *args, **kwargs)
-        raise e
+journal = obtenir_journal(__name__)
 
 def generer_test_parallele(langue="français", niveau_cible="", domaines=None):
     """Génère un test avec génération en parallèle pour une vitesse maximale"""
-    print(f"Génération parallèle d'un test - langue: {langue}, niveau: {niveau_cible}")
+    journal.info("Génération parallèle d'un test", extra={"langue": langue, "niveau": niveau_cible})
     
     try:
         # Étape 1: Générer compréhension écrite d'abord (car elle peut influencer les thèmes)
-        print("Génération section compréhension écrite...")
-        comprehension_ecrite = ultra_fast_api_call(generer_comprehension_ecrite, langue, niveau_cible)
-        
-        # Délai minimal avant de lancer les tâches parallèles
-        delay = random.uniform(1, 2)
-        print(f"Préparation génération parallèle - délai: {delay:.1f}s")
-        time.sleep(delay)
+        journal.debug("Génération section compréhension écrite")
+        comprehension_ecrite = generer_comprehension_ecrite(langue, niveau_cible)
         
         # Étape 2: Générer grammaire et vocabulaire EN PARALLÈLE
-        print("Lancement génération parallèle: grammaire + vocabulaire")
+        journal.debug("Lancement génération parallèle: grammaire + vocabulaire")
         
         with ThreadPoolExecutor(max_workers=2) as executor:
-            # Soumettre les deux tâches en parallèle
-            future_grammaire = executor.submit(ultra_fast_api_call, generer_grammaire, langue, niveau_cible)
-            future_vocabulaire = executor.submit(ultra_fast_api_call, generer_vocabulaire, langue, niveau_cible, domaines)
+            # Soumettre les deux tâches en parallèle (chacune avec une copie du contexte de journalisation)
+            future_grammaire = executor.submit(contextvars.copy_context().run, generer_grammaire, langue, niveau_cible)
+            future_vocabulaire = executor.submit(
+                contextvars.copy_context().run, generer_vocabulaire, langue, niveau_cible, domaines
+            )
             
             # Attendre que les deux tâches se terminent
             grammaire = None
@@ -62,65 +41,199 @@ def generer_test_parallele(langue="français", niveau_cible="", domaines=None):
             for future in as_completed([future_grammaire, future_vocabulaire]):
                 if future == future_grammaire:
                     grammaire = future.result()
-                    print("Section grammaire générée")
+                    journal.debug("Section grammaire générée")
                 elif future == future_vocabulaire:
                     vocabulaire = future.result()
-                    print("Section vocabulaire générée")
+                    journal.debug("Section vocabulaire générée")
         
         # Assembler le test complet
-        test_complet = TestComplet(
+        test_complet = assembler_test(
             comprehension_ecrite=comprehension_ecrite,
             grammaire=grammaire,
             vocabulaire=vocabulaire
         )
         
-        print("Test généré avec succès en mode parallèle")
+        journal.info("Test généré avec succès en mode parallèle")
         return test_complet
         
     except Exception as e:
-        print(f"Erreur lors de la génération parallèle: {e}")
-        print("Basculement vers génération optimisée")
+        journal.warning("Erreur lors de la génération parallèle, basculement vers génération optimisée: %s", e)
+        generation_replis.inc(de="parallele", vers="optimise")
         # En cas d'erreur, basculer vers la méthode optimisée
         return generer_test_optimise(langue, niveau_cible, domaines)
 
+def _generateurs_sections_async():
+    """Coroutines de génération des trois sections selon GENERATION_MODE (un appel par section ou par exercice)"""
+    if settings.GENERATION_MODE == "fanout":
+        return generer_comprehension_ecrite_eclatee, generer_grammaire_eclatee, generer_vocabulaire_eclatee
+    return generer_comprehension_ecrite_async, generer_grammaire_async, generer_vocabulaire_async
+
+async def _section_avec_repli(section, generer, regenerer, secours):
+    """Génère une section en cascade, comme generer_test_parallele pour un test complet
+    
+    En cas d'erreur, seule cette section est régénérée (un appel, sans éclatement) ; si elle
+    échoue encore, le générateur synchrone est exécuté dans un thread, puis la section est
+    rendue vide : le test est dégradé plutôt que la requête en erreur.
+    """
+    try:
+        return await generer()
+    except Exception as e:
+        journal.warning("Erreur lors de la génération asynchrone de la section, nouvelle génération: %s", e,
+                        extra={"section": section})
+        generation_replis.inc(de="asynchrone", vers="section")
+    try:
+        return await regenerer()
+    except Exception as e:
+        journal.warning("Nouvel échec de la section, basculement vers la génération synchrone: %s", e,
+                        extra={"section": section})
+        generation_replis.inc(de="section", vers="synchrone")
+    try:
+        return await asyncio.to_thread(secours)
+    except Exception as e:
+        journal.error("Échec de la génération synchrone de la section, section vide: %s", e,
+                      extra={"section": section})
+        generation_replis.inc(de="synchrone", vers="secours")
+        return []
+
+async def generer_test_parallele_async(langue="français", niveau_cible="", domaines=None):
+    """Génère un test en lançant les trois sections simultanément sous forme de coroutines
+    
+    Contrairement à generer_test_parallele, aucun thread n'est mobilisé : les appels LLM
+    passent par ainvoke et des centaines de générations peuvent coexister sur un seul worker.
+    Une section en erreur est régénérée seule, les autres sont conservées ; si elle échoue
+    encore, elle passe par le générateur synchrone, puis est laissée vide (_section_avec_repli).
+    """
+    journal.info("Génération asynchrone d'un test", extra={"langue": langue, "niveau": niveau_cible})
+    
+    generer_comprehension, generer_gram, generer_vocab = _generateurs_sections_async()
+    taches = [
+        asyncio.ensure_future(_section_avec_repli(
+            "comprehension_ecrite",
+            lambda: generer_comprehension(langue, niveau_cible),
+            lambda: generer_comprehension_ecrite_async(langue, niveau_cible),
+            lambda: generer_comprehension_ecrite(langue, niveau_cible)
+        )),
+        asyncio.ensure_future(_section_avec_repli(
+            "grammaire",
+            lambda: generer_gram(langue, niveau_cible),
+            lambda: generer_grammaire_async(langue, niveau_cible),
+            lambda: generer_grammaire(langue, niveau_cible)
+        )),
+        asyncio.ensure_future(_section_avec_repli(
+            "vocabulaire",
+            lambda: generer_vocab(langue, niveau_cible, domaines),
+            lambda: generer_vocabulaire_async(langue, niveau_cible, domaines),
+            lambda: generer_vocabulaire(langue, niveau_cible, domaines)
+        )),
+    ]
+    try:
+        comprehension_ecrite, grammaire, vocabulaire = await asyncio.gather(*taches)
+    finally:
+        # Annulation de l'appelant : ne plus consommer de quota
+        for tache in taches:
+            tache.cancel()
+    
+    test_complet = assembler_test(
+        comprehension_ecrite=comprehension_ecrite,
+        grammaire=grammaire,
+        vocabulaire=vocabulaire
+    )
+    
+    journal.info("Test généré avec succès en mode asynchrone")
+    return test_complet
+
+async def generer_sections_async(langue="français", niveau_cible="", domaines=None):
+    """Générateur asynchrone qui produit (section, exercices) dès qu'une section est terminée
+    
+    Les trois sections sont lancées simultanément ; l'ordre de sortie est celui de leur achèvement.
+    Une section en erreur est produite vide pour que le client puisse terminer le rendu du test.
+    """
+    generer_comprehension, generer_gram, generer_vocab = _generateurs_sections_async()
+    taches = {
+        asyncio.ensure_future(generer_comprehension(langue, niveau_cible)): "comprehension_ecrite",
+        asyncio.ensure_future(generer_gram(langue, niveau_cible)): "grammaire",
+        asyncio.ensure_future(generer_vocab(langue, niveau_cible, domaines)): "vocabulaire",
+    }
+    en_cours = set(taches)
+    try:
+        while en_cours:
+            terminees, en_cours = await asyncio.wait(en_cours, return_when=asyncio.FIRST_COMPLETED)
+            for tache in terminees:
+                section = taches[tache]
+                try:
+                    exercices = tache.result() or []
+                except Exception as e:
+                    journal.error("Erreur lors de la génération de la section: %s", e, extra={"section": section})
+                    exercices = []
+                yield section, exercices
+    finally:
+        # Le client a pu se déconnecter : ne pas laisser tourner les générations restantes
+        for tache in en_cours:
+            tache.cancel()
+
+async def generer_exercices_flux_async(langue="français", niveau_cible="", domaines=None):
+    """Générateur asynchrone qui produit (section, exercice) au fil de l'écriture du modèle
+    
+    Les trois sections sont générées en flux simultanément. Lorsqu'une section est terminée,
+    (section, None) est produit pour le signaler.
+    """
+    file = asyncio.Queue()
+    
+    async def _pomper(section, flux):
+        try:
+            async for exercice in flux:
+                await file.put((section, exercice))
+        except Exception as e:
+            journal.error("Erreur lors de la génération en flux de la section: %s", e, extra={"section": section})
+        finally:
+            await file.put((section, None))
+    
+    taches = [
+        asyncio.ensure_future(_pomper("comprehension_ecrite", generer_comprehension_ecrite_flux(langue, niveau_cible))),
+        asyncio.ensure_future(_pomper("grammaire", generer_grammaire_flux(langue, niveau_cible))),
+        asyncio.ensure_future(_pomper("vocabulaire", generer_vocabulaire_flux(langue, niveau_cible, domaines))),
+    ]
+    sections_restantes = len(taches)
+    try:
+        while sections_restantes:
+            section, exercice = await file.get()
+            if exercice is None:
+                sections_restantes -= 1
+            yield section, exercice
+    finally:
+        for tache in taches:
+            tache.cancel()
+
 def generer_test_initial(langue="français", niveau_cible="", domaines=None):
     """Génère un test initial pour évaluer le niveau de l'apprenant en utilisant une approche modulaire"""
-    print(f"Génération d'un test pour la langue: {langue}, niveau: {niveau_cible}")
+    journal.info("Génération d'un test", extra={"langue": langue, "niveau": niveau_cible})
     
     try:
-        # Générer les sections indépendamment avec un délai plus important entre chaque pour éviter les erreurs de rate limit
-        print("Génération de la section compréhension écrite...")
-        comprehension_ecrite = safe_api_call(generer_comprehension_ecrite, langue, niveau_cible)
-        
-        # Délai plus important avant de continuer pour éviter les erreurs de rate limit
-        print("Attente de 15 secondes avant de continuer...")
-        time.sleep(15)
-        
-        print("Génération de la section grammaire...")
-        grammaire = safe_api_call(generer_grammaire, langue, niveau_cible)
+        # Générer les sections l'une après l'autre ; le limiteur de débit global espace les appels si nécessaire
+        journal.debug("Génération de la section compréhension écrite")
+        comprehension_ecrite = generer_comprehension_ecrite(langue, niveau_cible)
         
-        # Délai plus important avant de continuer
-        print("Attente de 15 secondes avant de continuer...")
-        time.sleep(15)
+        journal.debug("Génération de la section grammaire")
+        grammaire = generer_grammaire(langue, niveau_cible)
         
-        print("Génération de la section vocabulaire...")
-        vocabulaire = safe_api_call(generer_vocabulaire, langue, niveau_cible, domaines)
+        journal.debug("Génération de la section vocabulaire")
+        vocabulaire = generer_vocabulaire(langue, niveau_cible, domaines)
         
-        # Assembler le test complet - maintenant directement compatible avec l'API
-        test_complet = TestComplet(
+        # Assembler le test complet à partir des sections déjà validées (pas de seconde validation)
+        test_complet = assembler_test(
             comprehension_ecrite=comprehension_ecrite,
             grammaire=grammaire,
             vocabulaire=vocabulaire
         )
         
-        print("Test complet généré avec succès!")
+        journal.info("Test complet généré avec succès")
         return test_complet
         
     except Exception as e:
-        print(f"Erreur lors de la génération du test: {e}")
         # En cas d'erreur, retourner un test minimal
-        print("Génération d'un test de secours minimal...")
-        return TestComplet(
+        journal.error("Erreur lors de la génération du test, génération d'un test de secours minimal: %s", e)
+        generation_replis.inc(de="initial", vers="secours")
+        return assembler_test(
             comprehension_ecrite=[],
             grammaire=[],
             vocabulaire=[]
@@ -128,41 +241,36 @@ def generer_test_initial(langue="français", niveau_cible="", domaines=None):
 
 def generer_test_simplifie(langue="français", niveau_cible=""):
     """Version simplifiée qui génère un test avec moins d'appels API pour éviter les rate limits"""
-    print(f"Génération d'un test simplifié pour la langue: {langue}, niveau: {niveau_cible}")
+    journal.info("Génération d'un test simplifié", extra={"langue": langue, "niveau": niveau_cible})
     
     # Utiliser des thèmes générés au lieu de thèmes prédéfinis
-    themes = generer_themes_aleatoires(langue, nombre=3, categorie="compréhension")
-    domaines = generer_themes_aleatoires(langue, nombre=3, categorie="domaines")
+    themes = choisir_themes(langue, nombre=3, categorie="compréhension")
+    domaines = choisir_themes(langue, nombre=3, categorie="domaines")
     
     try:
-        print("Génération simplifiée - compréhension écrite...")
-        comprehension_ecrite = safe_api_call(generer_comprehension_ecrite, langue, niveau_cible, themes)
+        journal.debug("Génération simplifiée - compréhension écrite")
+        comprehension_ecrite = generer_comprehension_ecrite(langue, niveau_cible, themes)
         
-        print("Attente de 20 secondes...")
-        time.sleep(20)
+        journal.debug("Génération simplifiée - grammaire")
+        grammaire = generer_grammaire(langue, niveau_cible)
         
-        print("Génération simplifiée - grammaire...")
-        grammaire = safe_api_call(generer_grammaire, langue, niveau_cible)
+        journal.debug("Génération simplifiée - vocabulaire")
+        vocabulaire = generer_vocabulaire(langue, niveau_cible, domaines)
         
-        print("Attente de 20 secondes...")
-        time.sleep(20)
-        
-        print("Génération simplifiée - vocabulaire...")
-        vocabulaire = safe_api_call(generer_vocabulaire, langue, niveau_cible, domaines)
-        
-        test_complet = TestComplet(
+        test_complet = assembler_test(
             comprehension_ecrite=comprehension_ecrite,
             grammaire=grammaire,
             vocabulaire=vocabulaire
         )
         
-        print("Test simplifié généré avec succès!")
+        journal.info("Test simplifié généré avec succès")
         return test_complet
         
     except Exception as e:
-        print(f"Erreur lors de la génération simplifiée: {e}")
+        journal.error("Erreur lors de la génération simplifiée: %s", e)
+        generation_replis.inc(de="simplifie", vers="secours")
         # Retourner un test minimal en cas d'erreur
-        return TestComplet(
+        return assembler_test(
             comprehension_ecrite=[],
             grammaire=[],
             vocabulaire=[]
@@ -170,41 +278,31 @@ def generer_test_simplifie(langue="français", niveau_cible=""):
 
 def generer_test_optimise(langue="français", niveau_cible="", domaines=None):
     """Génère un test avec des délais optimisés pour une génération plus rapide"""
-    print(f"Génération optimisée d'un test - langue: {langue}, niveau: {niveau_cible}")
+    journal.info("Génération optimisée d'un test", extra={"langue": langue, "niveau": niveau_cible})
     
     try:
-        # Générer les sections avec des délais réduits
-        print("Génération section compréhension écrite...")
-        comprehension_ecrite = fast_api_call(generer_comprehension_ecrite, langue, niveau_cible)
-        
-        # Délai réduit entre les sections : 3-5 secondes au lieu de 15
-        delay = random.uniform(3, 5)
-        print(f"Délai entre sections: {delay:.1f}s")
-        time.sleep(delay)
-        
-        print("Génération section grammaire...")
-        grammaire = fast_api_call(generer_grammaire, langue, niveau_cible)
+        # Générer les sections sans délai fixe : seul le limiteur de débit global fait attendre
+        journal.debug("Génération section compréhension écrite")
+        comprehension_ecrite = generer_comprehension_ecrite(langue, niveau_cible)
         
-        # Délai réduit entre les sections
-        delay = random.uniform(3, 5)
-        print(f"Délai entre sections: {delay:.1f}s")
-        time.sleep(delay)
+        journal.debug("Génération section grammaire")
+        grammaire = generer_grammaire(langue, niveau_cible)
         
-        print("Génération section vocabulaire...")
-        vocabulaire = fast_api_call(generer_vocabulaire, langue, niveau_cible, domaines)
+        journal.debug("Génération section vocabulaire")
+        vocabulaire = generer_vocabulaire(langue, niveau_cible, domaines)
         
         # Assembler le test complet
-        test_complet = TestComplet(
+        test_complet = assembler_test(
             comprehension_ecrite=comprehension_ecrite,
             grammaire=grammaire,
             vocabulaire=vocabulaire
         )
         
-        print("Test généré avec succès en mode optimisé")
+        journal.info("Test généré avec succès en mode optimisé")
         return test_complet
         
     except Exception as e:
-        print(f"Erreur lors de la génération optimisée: {e}")
-        print("Basculement vers génération standard")
+        journal.warning("Erreur lors de la génération optimisée, basculement vers génération standard: %s", e)
+        generation_replis.inc(de="optimise", vers="initial")
         # En cas d'erreur, basculer vers la méthode standard
         return generer_test_initial(langue, niveau_cible, domaines) 
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""
+Banque de thèmes par langue
+
+Les thèmes sont générés par lots (THEME_BANK_TAILLE_LOT par appel LLM), filtrés contre
+THEMES_A_EVITER et dédoublonnés, puis distribués en rotation : les thèmes les moins
+récemment utilisés sont tirés en priorité. Le chemin des requêtes n'appelle plus le LLM
+pour choisir des thèmes et n'écrit pas sur disque : l'ordre de rotation modifié par les tirages
+est persisté en arrière-plan (au plus toutes les THEME_BANK_INTERVALLE_SAUVEGARDE secondes),
+après chaque remplissage et à l'arrêt. La banque se recharge en arrière-plan et peut être
+remplie hors ligne :
+
+    python -m app.services.ai_modules.content_creator.theme_bank anglais espagnol
+"""
+import re
+import sys
+import time
+import random
+import threading
+from app.core.config import settings
+from app.core.chronometrage import mesurer
+from app.core.journal import obtenir_journal
+from .cache import StockageSQLite
+from .theme_generator import generer_themes_aleatoires, generer_themes_aleatoires_async, THEMES_A_EVITER
+
+journal = obtenir_journal(__name__)
+
+CATEGORIES = ("compréhension", "domaines")
+
+# Puces et numérotations que le modèle ajoute parfois malgré la consigne
+_PUCE = re.compile(r'^\s*(?:[-*•]|\d+[.)])\s*')
+
+
+def _nettoyer_theme(theme):
+    return _PUCE.sub("", theme).strip().strip('"«»').strip()
+
+
+class BanqueThemes:
+    """Thèmes par (langue, catégorie) ordonnés du moins au plus récemment utilisé"""
+
+    def __init__(self, chemin_sqlite, taille_lot, min_themes, max_themes, intervalle_sauvegarde=30.0):
+        self.taille_lot = taille_lot
+        self.min_themes = min_themes
+        self.max_themes = max_themes
+        self.intervalle_sauvegarde = intervalle_sauvegarde
+        self._verrou = threading.Lock()
+        self._banques = {}
+        self._disque = StockageSQLite(chemin_sqlite, "banque_themes") if chemin_sqlite else None
+        self._remplissages = set()
+        self._a_sauvegarder = set()
+        self._sauvegarde_en_cours = False
+        self._derniere_sauvegarde = time.monotonic()
+        self._nb_tirages = 0
+        self._nb_manques = 0
+        self._nb_lots = 0
+
+    @staticmethod
+    def cle(langue, categorie):
+        return f"{langue.strip().lower()}|{categorie}"
+
+    def _banque(self, cle):
+        """Retourne la liste de rotation d'une clé, chargée depuis le disque au premier accès (appelé sous verrou)"""
+        if cle not in self._banques:
+            entree = self._disque.lire(cle) if self._disque is not None else None
+            self._banques[cle] = list(entree[0]) if entree is not None else []
+        return self._banques[cle]
+
+    def persister(self):
+        """Écrit sur disque les banques modifiées depuis la dernière sauvegarde (hors verrou)"""
+        with self._verrou:
+            banques = {cle: list(self._banques[cle]) for cle in self._a_sauvegarder}
+            self._a_sauvegarder.clear()
+            self._derniere_sauvegarde = time.monotonic()
+        if self._disque is None:
+            return
+        for cle, banque in banques.items():
+            self._disque.ecrire(cle, banque)
+
+    def _persister_en_arriere_plan(self):
+        try:
+            self.persister()
+        except Exception as e:
+            journal.error("Banque de thèmes: erreur lors de la sauvegarde: %s", e)
+        finally:
+            with self._verrou:
+                self._sauvegarde_en_cours = False
+
+    def ajouter(self, langue, categorie, themes):
+        """Ajoute des thèmes filtrés et dédoublonnés ; retourne le nombre de nouveaux thèmes"""
+        cle = self.cle(langue, categorie)
+        with self._verrou:
+            banque = self._banque(cle)
+            connus = {theme.lower() for theme in banque}
+            nouveaux = []
+            for theme in themes:
+                theme = _nettoyer_theme(theme)
+                theme_lower = theme.lower()
+                if not theme or theme_lower in connus:
+                    continue
+                if any(mot_interdit in theme_lower for mot_interdit in THEMES_A_EVITER):
+                    continue
+                connus.add(theme_lower)
+                nouveaux.append(theme)
+
+            # Les nouveaux thèmes n'ont jamais servi : ils passent en tête de rotation
+            banque[:0] = nouveaux
+            del banque[self.max_themes:]
+            self._a_sauvegarder.add(cle)
+        self.persister()
+        return len(nouveaux)
+
+    def tirer(self, langue, categorie, nombre):
+        """Tire `nombre` thèmes parmi les moins récemment utilisés, ou None si la banque est insuffisante"""
+        cle = self.cle(langue, categorie)
+        with self._verrou:
+            banque = self._banque(cle)
+            if len(banque) < nombre:
+                self._nb_manques += 1
+                choisis = None
+            else:
+                # Tirage aléatoire dans la moitié la moins récemment utilisée pour garder de la variété
+                fenetre = max(nombre, len(banque) // 2)
+                choisis = random.sample(banque[:fenetre], nombre)
+                for theme in choisis:
+                    banque.remove(theme)
+                banque.extend(choisis)
+                self._a_sauvegarder.add(cle)
+                self._nb_tirages += 1
+            a_recharger = len(banque) < self.min_themes
+            # Sauvegarde périodique de la rotation dans un thread : le tirage ne fait aucune écriture
+            a_persister = (
+                self._disque is not None and bool(self._a_sauvegarder) and not self._sauvegarde_en_cours
+                and time.monotonic() - self._derniere_sauvegarde >= self.intervalle_sauvegarde
+            )
+            if a_persister:
+                self._sauvegarde_en_cours = True
+
+        if a_persister:
+            threading.Thread(target=self._persister_en_arriere_plan, name="banque-themes-sauvegarde", daemon=True).start()
+        if a_recharger:
+            self.recharger_en_arriere_plan(langue, categorie)
+        return choisis
+
+    def remplir(self, langue, categorie):
+        """Génère un lot de thèmes avec le LLM et l'ajoute à la banque"""
+        themes = generer_themes_aleatoires(langue, nombre=self.taille_lot, categorie=categorie, completer=False)
+        nouveaux = self.ajouter(langue, categorie, themes or [])
+        with self._verrou:
+            self._nb_lots += 1
+        journal.info("Banque de thèmes remplie", extra={"langue": langue, "categorie": categorie, "nouveaux": nouveaux})
+        return nouveaux
+
+    def recharger_en_arriere_plan(self, langue, categorie):
+        """Lance un remplissage dans un thread, sauf s'il y en a déjà un pour cette clé"""
+        cle = self.cle(langue, categorie)
+        with self._verrou:
+            if cle in self._remplissages:
+                return
+            self._remplissages.add(cle)
+
+        def _remplir():
+            try:
+                self.remplir(langue, categorie)
+            except Exception as e:
+                journal.error("Banque de thèmes: erreur lors du remplissage de %s: %s", cle, e)
+            finally:
+                with self._verrou:
+                    self._remplissages.discard(cle)
+
+        threading.Thread(target=_remplir, name=f"banque-themes-{cle}", daemon=True).start()
+
+    def statistiques(self):
+        """Retourne la taille des banques chargées et les compteurs de tirages"""
+        with self._verrou:
+            return {
+                "banques": {cle: len(banque) for cle, banque in self._banques.items()},
+                "disque": self._disque is not None,
+                "remplissages_en_cours": sorted(self._remplissages),
+                "a_sauvegarder": sorted(self._a_sauvegarder),
+                "nb_tirages": self._nb_tirages,
+                "nb_manques": self._nb_manques,
+                "nb_lots": self._nb_lots,
+            }
+
+
+# Banque unique du processus
+banque_themes = BanqueThemes(
+    chemin_sqlite=settings.THEME_BANK_SQLITE or None,
+    taille_lot=settings.THEME_BANK_TAILLE_LOT,
+    min_themes=settings.THEME_BANK_MIN_THEMES,
+    max_themes=settings.THEME_BANK_MAX_THEMES,
+    intervalle_sauvegarde=settings.THEME_BANK_INTERVALLE_SAUVEGARDE,
+)
+
+
+def choisir_themes(langue, nombre=3, categorie="compréhension"):
+    """Thèmes tirés de la banque ; génération directe par le LLM tant que la banque est vide"""
+    with mesurer("themes"):
+        themes = banque_themes.tirer(langue, categorie, nombre)
+        if themes is None:
+            themes = generer_themes_aleatoires(langue, nombre=nombre, categorie=categorie)
+    return themes
+
+
+async def choisir_themes_async(langue, nombre=3, categorie="compréhension"):
+    """Version asynchrone de choisir_themes"""
+    with mesurer("themes"):
+        themes = banque_themes.tirer(langue, categorie, nombre)
+        if themes is None:
+            themes = await generer_themes_aleatoires_async(langue, nombre=nombre, categorie=categorie)
+    return themes
+
+
+def remplir_banques(langues=None):
+    """Remplit la banque de thèmes des langues données pour toutes les catégories"""
+    langues = langues or settings.LANGUES_SUPPORTEES
+    for langue in langues:
+        for categorie in CATEGORIES:
+            banque_themes.remplir(langue, categorie)
+    return banque_themes.statistiques()
+
+
+if __name__ == "__main__":
+    print(remplir_banques(sys.argv[1:] or None))
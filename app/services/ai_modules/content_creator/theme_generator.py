@@ -1,61 +1,109 @@
 import random
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from .utils import retry_with_backoff, safe_api_call, get_llm
+from .utils import safe_api_call, safe_api_call_async, appel_api_limite, appel_api_limite_async, get_llm
+from .translation_memo import memo_traductions, nom_modele
 
-@retry_with_backoff(max_retries=3, base_delay=15)
-def generer_themes_aleatoires(langue="français", nombre=2, categorie="compréhension"):
-    """Génère des thèmes aléatoires à l'aide de l'IA plutôt que d'utiliser des listes prédéfinies"""
-    llm = get_llm(temperature=1.0)  # Température maximale pour maximiser la créativité et la diversité
-    
-    # Thèmes à éviter car surreprésentés
-    themes_a_eviter = ["gastronomie", "cuisine", "nourriture", "plats", "alimentation", 
-                       "traditions culinaires", "spécialités régionales", "marchés de Noël",
-                       "vacances", "famille", "école", "travail quotidien", "shopping",
-                       "météo", "sport basique", "animaux domestiques", "couleurs"]
-    
-    # Descriptions en français qui seront traduites si nécessaire
-    descriptions_fr = {
-        "compréhension": "thèmes intellectuellement stimulants et contemporains pour des textes de compréhension écrite avancée",
-        "domaines": "domaines lexicaux spécialisés et sophistiqués pour des exercices de vocabulaire expert"
-    }
+# Thèmes à éviter car surreprésentés
+THEMES_A_EVITER = ["gastronomie", "cuisine", "nourriture", "plats", "alimentation", 
+                   "traditions culinaires", "spécialités régionales", "marchés de Noël",
+                   "vacances", "famille", "école", "travail quotidien", "shopping",
+                   "météo", "sport basique", "animaux domestiques", "couleurs"]
+
+# Descriptions en français qui seront traduites si nécessaire
+DESCRIPTIONS_FR = {
+    "compréhension": "thèmes intellectuellement stimulants et contemporains pour des textes de compréhension écrite avancée",
+    "domaines": "domaines lexicaux spécialisés et sophistiqués pour des exercices de vocabulaire expert"
+}
+
+# Thèmes de secours variés et sophistiqués
+THEMES_SECOURS = [
+    "l'éthique de l'intelligence artificielle", "la bioéthique moderne", "l'économie circulaire", 
+    "la géopolitique énergétique", "l'urbanisme durable", "la neuroscience cognitive",
+    "la philosophie environnementale", "l'innovation sociale", "la cryptomonnaie et société", 
+    "l'architecture bioclimatique", "la sociologie numérique", "l'anthropologie culturelle",
+    "la médecine personnalisée", "la diplomatie culturelle", "l'ingénierie génétique",
+    "la psychologie comportementale", "l'astrophysique contemporaine", "l'économie collaborative",
+    "la critique d'art moderne", "la linguistique computationnelle", "la cybersécurité éthique",
+    "l'écologie industrielle", "la philosophie des sciences", "l'innovation pédagogique",
+    "la sociologie urbaine", "l'anthropologie digitale", "la physique quantique appliquée",
+    "l'éthique médicale", "la géographie humaine", "l'histoire des mentalités",
+    "la sémiologie des médias", "l'épistémologie moderne", "la théorie des systèmes complexes"
+]
+
+PROMPT_TRADUCTION_DESCRIPTION = ChatPromptTemplate.from_template(
+    """Traduis précisément cette phrase du français vers {langue}:
     
-    # Obtenir la description en français ou utiliser une description générique si la catégorie n'existe pas
-    description_fr = descriptions_fr.get(categorie, "thèmes contemporains et stimulants pour des exercices de langue avancés")
+    Phrase: "{texte}"
     
-    # Traduire la description si nécessaire (sauf pour le français)
+    Donne UNIQUEMENT la traduction sans aucune autre explication."""
+)
+
+def _description_fr(categorie):
+    """Retourne la description en français ou une description générique si la catégorie n'existe pas"""
+    return DESCRIPTIONS_FR.get(categorie, "thèmes contemporains et stimulants pour des exercices de langue avancés")
+
+def traduire_description(langue, categorie):
+    """Retourne la description de la catégorie dans la langue cible (mémorisée après la première traduction)"""
+    description_fr = _description_fr(categorie)
     if langue.lower() == "français":
-        description = description_fr
-    else:
+        return description_fr
+    
+    llm = get_llm(temperature=0.1, etape="traduction")
+    description = memo_traductions.obtenir("description_theme", description_fr, langue, nom_modele(llm))
+    if description is None:
         # Utiliser l'IA pour traduire la description
-        prompt_traduction = ChatPromptTemplate.from_template(
-            """Traduis précisément cette phrase du français vers {langue}:
-            
-            Phrase: "{texte}"
-            
-            Donne UNIQUEMENT la traduction sans aucune autre explication."""
-        )
-        
-        chaine_traduction = prompt_traduction | llm | StrOutputParser()
+        chaine_traduction = PROMPT_TRADUCTION_DESCRIPTION | llm | StrOutputParser()
         description = safe_api_call(
             chaine_traduction.invoke,
             {"langue": langue, "texte": description_fr}
         ).strip()
+        memo_traductions.enregistrer("description_theme", description_fr, langue, nom_modele(llm), description)
+    return description
+
+async def traduire_description_async(langue, categorie):
+    """Version asynchrone de traduire_description"""
+    description_fr = _description_fr(categorie)
+    if langue.lower() == "français":
+        return description_fr
     
-    # Thèmes de secours variés et sophistiqués
-    themes_secours = [
-        "l'éthique de l'intelligence artificielle", "la bioéthique moderne", "l'économie circulaire", 
-        "la géopolitique énergétique", "l'urbanisme durable", "la neuroscience cognitive",
-        "la philosophie environnementale", "l'innovation sociale", "la cryptomonnaie et société", 
-        "l'architecture bioclimatique", "la sociologie numérique", "l'anthropologie culturelle",
-        "la médecine personnalisée", "la diplomatie culturelle", "l'ingénierie génétique",
-        "la psychologie comportementale", "l'astrophysique contemporaine", "l'économie collaborative",
-        "la critique d'art moderne", "la linguistique computationnelle", "la cybersécurité éthique",
-        "l'écologie industrielle", "la philosophie des sciences", "l'innovation pédagogique",
-        "la sociologie urbaine", "l'anthropologie digitale", "la physique quantique appliquée",
-        "l'éthique médicale", "la géographie humaine", "l'histoire des mentalités",
-        "la sémiologie des médias", "l'épistémologie moderne", "la théorie des systèmes complexes"
-    ]
+    llm = get_llm(temperature=0.1, etape="traduction")
+    description = await memo_traductions.obtenir_async("description_theme", description_fr, langue, nom_modele(llm))
+    if description is None:
+        chaine_traduction = PROMPT_TRADUCTION_DESCRIPTION | llm | StrOutputParser()
+        description = (await safe_api_call_async(
+            chaine_traduction.ainvoke,
+            {"langue": langue, "texte": description_fr}
+        )).strip()
+        await memo_traductions.enregistrer_async("description_theme", description_fr, langue, nom_modele(llm), description)
+    return description
+
+def generer_themes_aleatoires(langue="français", nombre=2, categorie="compréhension", completer=True):
+    """Génère des thèmes aléatoires à l'aide de l'IA plutôt que d'utiliser des listes prédéfinies"""
+    llm = get_llm(temperature=1.0, etape="themes")  # Température maximale pour maximiser la créativité et la diversité
+    
+    # Traduire la description si nécessaire (sauf pour le français)
+    description = traduire_description(langue, categorie)
+    
+    chain = _construire_prompt_themes(langue, nombre, description) | llm | StrOutputParser()
+    result = appel_api_limite(chain.invoke, {})
+    
+    return _filtrer_themes(result, nombre, completer)
+
+async def generer_themes_aleatoires_async(langue="français", nombre=2, categorie="compréhension", completer=True):
+    """Version asynchrone de generer_themes_aleatoires"""
+    llm = get_llm(temperature=1.0, etape="themes")
+    
+    description = await traduire_description_async(langue, categorie)
+    
+    chain = _construire_prompt_themes(langue, nombre, description) | llm | StrOutputParser()
+    result = await appel_api_limite_async(chain.ainvoke, {})
+    
+    return _filtrer_themes(result, nombre, completer)
+
+def _construire_prompt_themes(langue, nombre, description):
+    """Construit le prompt de génération de thèmes"""
+    themes_a_eviter = THEMES_A_EVITER
     
     # Domaines thématiques sophistiqués pour inspiration
     domaines_inspiration = [
@@ -108,10 +156,10 @@ def generer_themes_aleatoires(langue="français", nombre=2, categorie="compréhe
         un par ligne, sans numérotation ni explications. Chaque thème doit être formulé 
         de manière précise et engageante.""")
     ])
-    
-    chain = prompt | llm | StrOutputParser()
-    result = chain.invoke({})
-    
+    return prompt
+
+def _filtrer_themes(result, nombre, completer=True):
+    """Nettoie la réponse du modèle, filtre les thèmes interdits et complète avec des thèmes de secours"""
     # Nettoyer le résultat et le transformer en liste
     themes = [theme.strip() for theme in result.strip().split('\n') if theme.strip()]
     
@@ -120,12 +168,13 @@ def generer_themes_aleatoires(langue="français", nombre=2, categorie="compréhe
     for theme in themes:
         theme_lower = theme.lower()
         # Vérifier qu'aucun mot interdit n'est présent
-        if not any(mot_interdit in theme_lower for mot_interdit in themes_a_eviter):
+        if not any(mot_interdit in theme_lower for mot_interdit in THEMES_A_EVITER):
             themes_filtres.append(theme)
     
     # Vérifier si nous avons assez de thèmes après filtrage
-    if len(themes_filtres) < nombre:
+    if completer and len(themes_filtres) < nombre:
         # Mélanger et utiliser des thèmes de secours sophistiqués si nécessaire
+        themes_secours = list(THEMES_SECOURS)
         random.shuffle(themes_secours)
         themes_filtres.extend(themes_secours[:nombre - len(themes_filtres)])
     
@@ -1,6 +1,7 @@
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from .utils import get_llm
+from .utils import get_llm, appel_api_limite, appel_api_limite_async
+from .translation_memo import memo_traductions, nom_modele
 from pydantic import BaseModel, Field
 
 # Modèle simple pour les traductions (localement défini)
@@ -18,30 +19,23 @@ class TermesTraduction(BaseModel):
     item: str = Field(..., description="Traduction de 'Item'")
     texte_principal: str = Field(..., description="Traduction de 'Texte principal'")
 
-def traduire_termes_techniques(langue_cible):
-    """Traduit les termes techniques du système dans la langue cible."""
-    llm = get_llm(temperature=0.1)
-    
-    # Si la langue cible est déjà le français, retourner les termes en français
-    if langue_cible.lower() == "français":
-        return TermesTraduction(
-            comprehension_ecrite="Compréhension écrite",
-            expression_ecrite="Expression écrite",
-            grammaire="Grammaire",
-            vocabulaire="Vocabulaire",
-            consigne="Consigne",
-            contenu="Contenu",
-            niveau_cible="Niveau cible",
-            competence="Compétence",
-            question="Question",
-            phrase="Phrase",
-            item="Item",
-            texte_principal="Texte principal"
-        )
-        
-    # Traduire les termes vers la langue cible
-    prompt = ChatPromptTemplate.from_template(
-        """Tu es un traducteur technique spécialisé dans la didactique des langues.
+# Termes de référence en français (aucune traduction nécessaire)
+TERMES_FRANCAIS = TermesTraduction(
+    comprehension_ecrite="Compréhension écrite",
+    expression_ecrite="Expression écrite",
+    grammaire="Grammaire",
+    vocabulaire="Vocabulaire",
+    consigne="Consigne",
+    contenu="Contenu",
+    niveau_cible="Niveau cible",
+    competence="Compétence",
+    question="Question",
+    phrase="Phrase",
+    item="Item",
+    texte_principal="Texte principal"
+)
+
+TEXTE_PROMPT_TERMES_TECHNIQUES = """Tu es un traducteur technique spécialisé dans la didactique des langues.
         Traduis précisément les termes suivants du français vers {langue_cible}.
         
         Termes à traduire:
@@ -60,17 +54,11 @@ def traduire_termes_techniques(langue_cible):
         
         Fournis tes traductions au format structuré uniquement, sans explications.
         """
-    )
-    
-    chain = prompt | llm.with_structured_output(TermesTraduction)
-    return chain.invoke({"langue_cible": langue_cible})
 
-def traduire_prompt(prompt_texte, termes, langue_cible):
-    """Traduit un prompt vers la langue cible."""
-    llm = get_llm(temperature=0.1)
-    
-    prompt = ChatPromptTemplate.from_template(
-        """Tu es un traducteur expert dans la didactique des langues.
+PROMPT_TERMES_TECHNIQUES = ChatPromptTemplate.from_template(TEXTE_PROMPT_TERMES_TECHNIQUES)
+
+PROMPT_TRADUCTION = ChatPromptTemplate.from_template(
+    """Tu es un traducteur expert dans la didactique des langues.
         Traduis précisément le texte suivant du français vers {langue_cible}.
         
         Voici les traductions des termes techniques à utiliser:
@@ -81,11 +69,72 @@ def traduire_prompt(prompt_texte, termes, langue_cible):
         
         La traduction doit être fidèle et naturelle dans la langue cible.
         """
-    )
-    
-    chain = prompt | llm | StrOutputParser()
-    return chain.invoke({
+)
+
+def _variables_traduction(prompt_texte, termes, langue_cible):
+    """Prépare les variables du prompt de traduction"""
+    return {
         "texte": prompt_texte, 
         "langue_cible": langue_cible,
         "termes": "\n".join([f"- {k}: {v}" for k, v in termes.__dict__.items() if not k.startswith("_")])
-    }) 
\ No newline at end of file
+    }
+
+def traduire_termes_techniques(langue_cible):
+    """Traduit les termes techniques du système dans la langue cible."""
+    # Si la langue cible est déjà le français, retourner les termes en français
+    if langue_cible.lower() == "français":
+        return TERMES_FRANCAIS.model_copy()
+    
+    llm = get_llm(temperature=0.1, etape="traduction")
+    memorises = memo_traductions.obtenir("termes", TEXTE_PROMPT_TERMES_TECHNIQUES, langue_cible, nom_modele(llm))
+    if memorises is not None:
+        return TermesTraduction(**memorises)
+    
+    # Traduire les termes vers la langue cible
+    chain = PROMPT_TERMES_TECHNIQUES | llm.with_structured_output(TermesTraduction)
+    termes = appel_api_limite(chain.invoke, {"langue_cible": langue_cible})
+    memo_traductions.enregistrer("termes", TEXTE_PROMPT_TERMES_TECHNIQUES, langue_cible, nom_modele(llm), termes.model_dump())
+    return termes
+
+async def traduire_termes_techniques_async(langue_cible):
+    """Version asynchrone de traduire_termes_techniques"""
+    if langue_cible.lower() == "français":
+        return TERMES_FRANCAIS.model_copy()
+    
+    llm = get_llm(temperature=0.1, etape="traduction")
+    memorises = await memo_traductions.obtenir_async("termes", TEXTE_PROMPT_TERMES_TECHNIQUES, langue_cible, nom_modele(llm))
+    if memorises is not None:
+        return TermesTraduction(**memorises)
+    
+    chain = PROMPT_TERMES_TECHNIQUES | llm.with_structured_output(TermesTraduction)
+    termes = await appel_api_limite_async(chain.ainvoke, {"langue_cible": langue_cible})
+    await memo_traductions.enregistrer_async("termes", TEXTE_PROMPT_TERMES_TECHNIQUES, langue_cible, nom_modele(llm), termes.model_dump())
+    return termes
+
+def traduire_prompt(prompt_texte, termes, langue_cible):
+    """Traduit un prompt vers la langue cible."""
+    llm = get_llm(temperature=0.1, etape="traduction")
+    variables = _variables_traduction(prompt_texte, termes, langue_cible)
+    source = f"{variables['termes']}\n{prompt_texte}"
+    traduction = memo_traductions.obtenir("prompt", source, langue_cible, nom_modele(llm))
+    if traduction is not None:
+        return traduction
+    
+    chain = PROMPT_TRADUCTION | llm | StrOutputParser()
+    traduction = appel_api_limite(chain.invoke, variables)
+    memo_traductions.enregistrer("prompt", source, langue_cible, nom_modele(llm), traduction)
+    return traduction
+
+async def traduire_prompt_async(prompt_texte, termes, langue_cible):
+    """Version asynchrone de traduire_prompt"""
+    llm = get_llm(temperature=0.1, etape="traduction")
+    variables = _variables_traduction(prompt_texte, termes, langue_cible)
+    source = f"{variables['termes']}\n{prompt_texte}"
+    traduction = await memo_traductions.obtenir_async("prompt", source, langue_cible, nom_modele(llm))
+    if traduction is not None:
+        return traduction
+    
+    chain = PROMPT_TRADUCTION | llm | StrOutputParser()
+    traduction = await appel_api_limite_async(chain.ainvoke, variables)
+    await memo_traductions.enregistrer_async("prompt", source, langue_cible, nom_modele(llm), traduction)
+    return traduction
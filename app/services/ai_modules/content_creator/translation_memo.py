@@ -0,0 +1,135 @@
+"""
+Mémoire persistante des traductions
+
+Les traductions effectuées par le LLM (termes techniques, prompts, descriptions de thèmes)
+sont quasi constantes pour une langue cible donnée : elles sont mémorisées sous la clé
+(hash du texte source, langue cible, modèle) et peuvent être pré-remplies hors ligne :
+
+    python -m app.services.ai_modules.content_creator.translation_memo anglais espagnol
+"""
+import sys
+import asyncio
+import hashlib
+import threading
+from app.core.config import settings
+from app.core.journal import obtenir_journal
+from .cache import StockageSQLite
+
+journal = obtenir_journal(__name__)
+
+
+def nom_modele(llm):
+    """Retourne le nom du modèle d'une instance LLM (utilisé dans la clé de mémorisation)"""
+    return getattr(llm, "model", None) or getattr(llm, "model_name", None) or settings.LLM_MODELE
+
+
+class MemoTraductions:
+    """Mémoire des traductions : dictionnaire en mémoire adossé à une table SQLite"""
+
+    def __init__(self, chemin_sqlite=None):
+        self._verrou = threading.Lock()
+        self._memoire = {}
+        self._disque = StockageSQLite(chemin_sqlite, "traductions") if chemin_sqlite else None
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def cle(espace, texte_source, langue_cible, modele):
+        """Construit la clé (hash du texte source, langue cible, modèle) d'une traduction"""
+        empreinte = hashlib.sha256(f"{espace}\n{texte_source}".encode("utf-8")).hexdigest()
+        return f"{empreinte}|{langue_cible.strip().lower()}|{modele}"
+
+    def _lire_memoire(self, cle):
+        """Retourne la traduction en mémoire ou None (compte un hit si trouvée)"""
+        with self._verrou:
+            if cle in self._memoire:
+                self._hits += 1
+                return self._memoire[cle]
+        return None
+
+    def _lire_disque(self, cle):
+        """Lit une traduction sur disque et la remonte en mémoire ; retourne None si absente"""
+        entree = self._disque.lire(cle)
+        if entree is None:
+            return None
+        valeur, _ = entree
+        with self._verrou:
+            self._memoire[cle] = valeur
+            self._hits += 1
+        return valeur
+
+    def _compter_miss(self):
+        with self._verrou:
+            self._misses += 1
+
+    def obtenir(self, espace, texte_source, langue_cible, modele):
+        """Retourne la traduction mémorisée ou None"""
+        cle = self.cle(espace, texte_source, langue_cible, modele)
+        valeur = self._lire_memoire(cle)
+        if valeur is None and self._disque is not None:
+            valeur = self._lire_disque(cle)
+        if valeur is None:
+            self._compter_miss()
+        return valeur
+
+    async def obtenir_async(self, espace, texte_source, langue_cible, modele):
+        """Version asynchrone de obtenir : la lecture SQLite est faite hors de la boucle d'événements"""
+        cle = self.cle(espace, texte_source, langue_cible, modele)
+        valeur = self._lire_memoire(cle)
+        if valeur is None and self._disque is not None:
+            valeur = await asyncio.to_thread(self._lire_disque, cle)
+        if valeur is None:
+            self._compter_miss()
+        return valeur
+
+    def enregistrer(self, espace, texte_source, langue_cible, modele, valeur):
+        """Mémorise une traduction (chaîne ou dictionnaire sérialisable en JSON)"""
+        cle = self.cle(espace, texte_source, langue_cible, modele)
+        with self._verrou:
+            self._memoire[cle] = valeur
+        if self._disque is not None:
+            self._disque.ecrire(cle, valeur)
+
+    async def enregistrer_async(self, espace, texte_source, langue_cible, modele, valeur):
+        """Version asynchrone de enregistrer : l'écriture SQLite est faite hors de la boucle d'événements"""
+        cle = self.cle(espace, texte_source, langue_cible, modele)
+        with self._verrou:
+            self._memoire[cle] = valeur
+        if self._disque is not None:
+            await asyncio.to_thread(self._disque.ecrire, cle, valeur)
+
+    def statistiques(self):
+        """Retourne les compteurs de hits/misses de la mémoire"""
+        with self._verrou:
+            total = self._hits + self._misses
+            return {
+                "entrees_memoire": len(self._memoire),
+                "disque": self._disque is not None,
+                "hits": self._hits,
+                "misses": self._misses,
+                "taux_hit": round(self._hits / total, 4) if total else 0.0,
+            }
+
+
+# Mémoire unique du processus
+memo_traductions = MemoTraductions(settings.TRANSLATION_MEMO_SQLITE or None)
+
+
+def prechauffer_traductions(langues=None):
+    """Pré-remplit la mémoire pour les langues supportées (termes techniques et descriptions de thèmes)"""
+    from .theme_generator import DESCRIPTIONS_FR, traduire_description
+    from .translation import traduire_termes_techniques
+
+    langues = langues or settings.LANGUES_SUPPORTEES
+    for langue in langues:
+        if langue.lower() == "français":
+            continue
+        journal.info("Pré-remplissage des traductions", extra={"langue": langue})
+        traduire_termes_techniques(langue)
+        for categorie in DESCRIPTIONS_FR:
+            traduire_description(langue, categorie)
+    return memo_traductions.statistiques()
+
+
+if __name__ == "__main__":
+    print(prechauffer_traductions(sys.argv[1:] or None))
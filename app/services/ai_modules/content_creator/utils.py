@@ -1,22 +1,25 @@
-import os
 import time
+import asyncio
 import random
-import re
-import json
 from functools import wraps
-from dotenv import load_dotenv
-from langchain_mistralai import ChatMistralAI
+from typing import List
+from pydantic import TypeAdapter, ValidationError
 from langchain_core.output_parsers import StrOutputParser
-from app.schemas.language_test import Exercice, Element, TypeElement, OptionQCM
+from app.core.config import settings
+from app.core.metrics import llm_retries, json_echecs, json_reparations, exercices_rejetes
+from app.core.journal import obtenir_journal
+from app.schemas.language_test import Exercice, TestComplet
+from ..rate_limiter import limiteur, est_erreur_rate_limit
+from ..llm_client import obtenir_llm
+from .json_extraction import extraire_json
 
-# Charger les variables d'environnement mais également définir une clé par défaut si absente
-load_dotenv()
-
-# Obtenir la clé API depuis les variables d'environnement ou utiliser la clé par défaut
-MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "HWeyYbCcjhpjneQZmq5iszsQLil08omZ")
+journal = obtenir_journal(__name__)
 
 def retry_with_backoff(max_retries=3, base_delay=10):
-    """Décorateur pour retry avec backoff exponentiel en cas d'erreur de rate limit"""
+    """Décorateur pour retry avec backoff exponentiel en cas d'erreur de rate limit
+
+    À ne pas empiler sur une fonction qui passe par appel_api_limite : le limiteur retente déjà les 429.
+    """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
@@ -24,10 +27,14 @@ def retry_with_backoff(max_retries=3, base_delay=10):
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
-                    if "429" in str(e) or "rate limit" in str(e).lower():
+                    if est_erreur_rate_limit(e):
                         if attempt < max_retries - 1:
                             delay = base_delay * (2 ** attempt) + random.uniform(1, 5)
-                            print(f"Rate limit atteint, attente de {delay:.1f} secondes avant retry {attempt + 1}/{max_retries}")
+                            journal.warning(
+                                "Rate limit atteint, nouvel essai %d/%d", attempt + 1, max_retries,
+                                extra={"attente_ms": round(delay * 1000), "fonction": func.__name__}
+                            )
+                            llm_retries.inc(niveau="backoff")
                             time.sleep(delay)
                             continue
                     raise e
@@ -35,175 +42,215 @@ def retry_with_backoff(max_retries=3, base_delay=10):
         return wrapper
     return decorator
 
-def safe_api_call(func, *args, **kwargs):
-    """Fonction utilitaire pour faire des appels API sécurisés avec délai"""
-    try:
-        # Délai aléatoire entre 2 et 5 secondes avant chaque appel
-        delay = random.uniform(2, 5)
-        print(f"Attente de {delay:.1f} secondes avant appel API...")
-        time.sleep(delay)
-        
-        result = func(*args, **kwargs)
-        
-        # Délai après l'appel réussi
-        post_delay = random.uniform(1, 3)
-        print(f"Appel réussi, attente de {post_delay:.1f} secondes...")
-        time.sleep(post_delay)
-        
-        return result
-    except Exception as e:
-        if "429" in str(e) or "rate limit" in str(e).lower():
-            print(f"Rate limit détecté: {e}")
-            # Attendre plus longtemps en cas de rate limit
-            time.sleep(30)
-        raise e
-
-def fast_api_call(func, *args, **kwargs):
-    """Fonction utilitaire pour faire des appels API rapides avec délais optimisés"""
-    try:
-        # Délai réduit entre 0.5 et 1.5 secondes avant chaque appel
-        delay = random.uniform(0.5, 1.5)
-        print(f"Appel API optimisé - délai: {delay:.1f}s")
-        time.sleep(delay)
-        
-        result = func(*args, **kwargs)
-        
-        # Délai réduit après l'appel réussi
-        post_delay = random.uniform(0.3, 0.8)
-        print(f"Appel API terminé - délai post-traitement: {post_delay:.1f}s")
-        time.sleep(post_delay)
-        
-        return result
-    except Exception as e:
-        if "429" in str(e) or "rate limit" in str(e).lower():
-            print(f"Rate limit détecté en mode optimisé: {e}")
-            print("Basculement vers le mode sécurisé")
-            # En cas de rate limit, basculer vers la méthode sécurisée
-            time.sleep(10)  # Attendre 10s puis utiliser safe_api_call
-            return safe_api_call(func, *args, **kwargs)
-        raise e
-
-def ultra_fast_api_call(func, *args, **kwargs):
-    """Fonction utilitaire pour faire des appels API ultra-rapides avec délais minimaux"""
-    try:
-        # Délai minimal entre 0.2 et 0.8 secondes avant chaque appel
-        delay = random.uniform(0.2, 0.8)
-        print(f"Appel API haute performance - délai: {delay:.1f}s")
-        time.sleep(delay)
-        
-        result = func(*args, **kwargs)
-        
-        # Délai minimal après l'appel réussi
-        post_delay = random.uniform(0.2, 0.5)
-        print(f"Appel API terminé - délai post-traitement: {post_delay:.1f}s")
-        time.sleep(post_delay)
-        
-        return result
-    except Exception as e:
-        if "429" in str(e) or "rate limit" in str(e).lower():
-            print(f"Rate limit détecté en mode haute performance: {e}")
-            print("Basculement vers le mode optimisé")
-            # En cas de rate limit, basculer vers fast_api_call
-            time.sleep(5)  # Attendre 5s puis utiliser fast_api_call
-            return fast_api_call(func, *args, **kwargs)
-        raise e
-
-def get_llm(temperature=0.7):
-    """Retourne une instance configurée du modèle LLM"""
-    return ChatMistralAI(
-        model="mistral-large-latest", 
-        temperature=temperature,
-        api_key=MISTRAL_API_KEY
-    )
+def retry_with_backoff_async(max_retries=3, base_delay=10):
+    """Version asynchrone de retry_with_backoff : l'attente ne bloque pas la boucle d'événements"""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            for attempt in range(max_retries):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    if est_erreur_rate_limit(e):
+                        if attempt < max_retries - 1:
+                            delay = base_delay * (2 ** attempt) + random.uniform(1, 5)
+                            journal.warning(
+                                "Rate limit atteint, nouvel essai %d/%d", attempt + 1, max_retries,
+                                extra={"attente_ms": round(delay * 1000), "fonction": func.__name__}
+                            )
+                            llm_retries.inc(niveau="backoff")
+                            await asyncio.sleep(delay)
+                            continue
+                    raise e
+            return None
+        return wrapper
+    return decorator
 
-def valider_et_corriger_exercices(exercices_data, type_defaut="QCM"):
-    """Valide et corrige les exercices en ajoutant les champs manquants"""
-    if not isinstance(exercices_data, list):
-        return []
+def appel_api_limite(func, *args, **kwargs):
+    """Fonction utilitaire pour faire des appels API soumis au limiteur de débit global
     
-    exercices_corriges = []
-    for exercice_data in exercices_data:
+    L'appel n'attend que si le budget requêtes/tokens est épuisé. En cas de 429, le limiteur
+    est suspendu pendant LLM_PAUSE_RATE_LIMIT secondes puis l'appel est retenté.
+    """
+    for tentative in range(settings.LLM_MAX_TENTATIVES_RATE_LIMIT):
+        attente = limiteur.acquerir()
+        if attente > 0:
+            journal.debug("Limiteur de débit: attente avant appel API", extra={"attente_ms": round(attente * 1000)})
         try:
-            # Vérifier et corriger la structure de l'exercice
-            if not isinstance(exercice_data, dict):
+            return func(*args, **kwargs)
+        except Exception as e:
+            if est_erreur_rate_limit(e) and tentative < settings.LLM_MAX_TENTATIVES_RATE_LIMIT - 1:
+                journal.warning("Rate limit détecté: %s - nouvel essai %d/%d", e, tentative + 1, settings.LLM_MAX_TENTATIVES_RATE_LIMIT)
+                limiteur.signaler_rate_limit()
+                llm_retries.inc(niveau="limiteur")
                 continue
-                
-            # S'assurer que tous les champs requis sont présents
-            exercice_corrige = {
-                "consigne": exercice_data.get("consigne", "Exercice"),
-                "niveau_cible": exercice_data.get("niveau_cible", "B1"),
-                "competence": exercice_data.get("competence", "Compétence générale"),
-                "contenu": exercice_data.get("contenu", {})
-            }
-            
-            # Corriger le contenu
-            contenu = exercice_corrige["contenu"]
-            if not isinstance(contenu, dict):
-                contenu = {}
-                
-            contenu_corrige = {
-                "texte_principal": contenu.get("texte_principal", ""),
-                "elements": contenu.get("elements", [])
-            }
-            
-            # Corriger les éléments
-            elements_corriges = []
-            for i, element in enumerate(contenu_corrige["elements"]):
-                if not isinstance(element, dict):
-                    continue
-                    
-                element_corrige = {
-                    "id": element.get("id", i + 1),
-                    "texte": element.get("texte", f"Élément {i + 1}"),
-                    "type": element.get("type", type_defaut)
-                }
-                
-                # Pour les QCM, convertir les options en objets OptionQCM
-                if element_corrige["type"] == "QCM":
-                    if "options" in element and isinstance(element["options"], list):
-                        options_converties = []
-                        for option_data in element["options"]:
-                            if isinstance(option_data, dict):
-                                option_qcm = OptionQCM(
-                                    id=option_data.get("id", "A"),
-                                    texte=option_data.get("texte", "Option"),
-                                    est_correcte=option_data.get("est_correcte", False)
-                                )
-                                options_converties.append(option_qcm)
-                        element_corrige["options"] = options_converties
-                        
-                    if "reponse_correcte" in element:
-                        element_corrige["reponse_correcte"] = element["reponse_correcte"]
-                
-                elements_corriges.append(element_corrige)
-            
-            contenu_corrige["elements"] = elements_corriges
-            exercice_corrige["contenu"] = contenu_corrige
-            
-            # Créer l'objet Exercice validé
-            exercice_valide = Exercice(**exercice_corrige)
-            
-            # Validation finale des éléments QCM (logs supprimés pour nettoyer la sortie)
-            
-            exercices_corriges.append(exercice_valide)
-            
+            if est_erreur_rate_limit(e):
+                limiteur.signaler_rate_limit()
+            raise e
+
+async def appel_api_limite_async(func, *args, **kwargs):
+    """Version asynchrone de appel_api_limite pour les coroutines (ex: chain.ainvoke)"""
+    for tentative in range(settings.LLM_MAX_TENTATIVES_RATE_LIMIT):
+        attente = await limiteur.acquerir_async()
+        if attente > 0:
+            journal.debug("Limiteur de débit: attente avant appel API", extra={"attente_ms": round(attente * 1000)})
+        try:
+            return await func(*args, **kwargs)
         except Exception as e:
-            print(f"Erreur lors de la correction d'un exercice: {e}")
+            if est_erreur_rate_limit(e) and tentative < settings.LLM_MAX_TENTATIVES_RATE_LIMIT - 1:
+                journal.warning("Rate limit détecté: %s - nouvel essai %d/%d", e, tentative + 1, settings.LLM_MAX_TENTATIVES_RATE_LIMIT)
+                limiteur.signaler_rate_limit()
+                llm_retries.inc(niveau="limiteur")
+                continue
+            if est_erreur_rate_limit(e):
+                limiteur.signaler_rate_limit()
+            raise e
+
+# Les anciens wrappers à délais aléatoires passent désormais tous par le même limiteur
+safe_api_call = appel_api_limite
+fast_api_call = appel_api_limite
+ultra_fast_api_call = appel_api_limite
+safe_api_call_async = appel_api_limite_async
+fast_api_call_async = appel_api_limite_async
+ultra_fast_api_call_async = appel_api_limite_async
+
+def get_llm(temperature=0.7, etape="generation"):
+    """Retourne l'instance partagée du modèle LLM pour cette température et cette étape (pool de connexions commun)"""
+    return obtenir_llm(temperature=temperature, etape=etape)
+
+# Adaptateur construit une seule fois : valide une section complète en un seul appel au cœur pydantic
+adaptateur_exercices = TypeAdapter(List[Exercice])
+
+def _normaliser_element(element, index, type_defaut):
+    """Complète un élément brut avec les valeurs par défaut (sans instancier de modèle)"""
+    element_normalise = {
+        "id": element.get("id", index + 1),
+        "texte": element.get("texte", f"Élément {index + 1}"),
+        "type": element.get("type", type_defaut),
+    }
+    if element_normalise["type"] == "QCM":
+        options = element.get("options")
+        if isinstance(options, list):
+            element_normalise["options"] = [
+                {
+                    "id": option.get("id", "A"),
+                    "texte": option.get("texte", "Option"),
+                    "est_correcte": option.get("est_correcte", False),
+                }
+                for option in options if isinstance(option, dict)
+            ]
+        if "reponse_correcte" in element:
+            element_normalise["reponse_correcte"] = element["reponse_correcte"]
+    return element_normalise
+
+def _normaliser_exercice(exercice_data, type_defaut):
+    """Complète un exercice brut ; retourne (exercice, [(emplacement, message)]) ou lève ValueError"""
+    if not isinstance(exercice_data, dict):
+        raise ValueError(f"exercice de type {type(exercice_data).__name__} au lieu d'un objet")
+
+    contenu = exercice_data.get("contenu", {})
+    if not isinstance(contenu, dict):
+        contenu = {}
+    elements = contenu.get("elements", [])
+    if not isinstance(elements, list):
+        elements = []
+
+    avertissements = []
+    elements_normalises = []
+    for i, element in enumerate(elements):
+        if not isinstance(element, dict):
+            avertissements.append((f"contenu.elements.{i}", "élément ignoré (pas un objet)"))
             continue
-    
-    return exercices_corriges
+        elements_normalises.append(_normaliser_element(element, i, type_defaut))
+
+    exercice = {
+        "consigne": exercice_data.get("consigne", "Exercice"),
+        "niveau_cible": exercice_data.get("niveau_cible", "B1"),
+        "competence": exercice_data.get("competence", "Compétence générale"),
+        "contenu": {
+            "texte_principal": contenu.get("texte_principal", ""),
+            "elements": elements_normalises,
+        },
+    }
+    return exercice, avertissements
+
+def valider_section(exercices_data, type_defaut="QCM"):
+    """Normalise puis valide une section d'exercices en une passe
+
+    Retourne (exercices, erreurs) : erreurs est une liste de rapports
+    {"index", "emplacement", "message", "bloquant"} ; les exercices en erreur bloquante sont écartés.
+    """
+    if not isinstance(exercices_data, list):
+        return [], [{"index": None, "emplacement": "", "message": "la section n'est pas une liste", "bloquant": True}]
+
+    erreurs = []
+    normalises = []
+    indices = []
+    for index, exercice_data in enumerate(exercices_data):
+        try:
+            exercice, avertissements = _normaliser_exercice(exercice_data, type_defaut)
+        except ValueError as e:
+            erreurs.append({"index": index, "emplacement": "", "message": str(e), "bloquant": True})
+            continue
+        erreurs.extend(
+            {"index": index, "emplacement": emplacement, "message": message, "bloquant": False}
+            for emplacement, message in avertissements
+        )
+        normalises.append(exercice)
+        indices.append(index)
+
+    try:
+        return adaptateur_exercices.validate_python(normalises), erreurs
+    except ValidationError as e:
+        # Écarter uniquement les exercices fautifs puis valider le reste
+        rejetes = set()
+        for detail in e.errors():
+            position = detail["loc"][0]
+            rejetes.add(position)
+            erreurs.append({
+                "index": indices[position],
+                "emplacement": ".".join(str(partie) for partie in detail["loc"][1:]),
+                "message": detail["msg"],
+                "bloquant": True,
+            })
+        restants = [exercice for position, exercice in enumerate(normalises) if position not in rejetes]
+        return adaptateur_exercices.validate_python(restants), erreurs
+
+def valider_et_corriger_exercices(exercices_data, type_defaut="QCM"):
+    """Valide et corrige les exercices en ajoutant les champs manquants"""
+    exercices, erreurs = valider_section(exercices_data, type_defaut)
+    bloquantes = [erreur for erreur in erreurs if erreur["bloquant"]]
+    if isinstance(exercices_data, list) and len(exercices) < len(exercices_data):
+        exercices_rejetes.inc(len(exercices_data) - len(exercices))
+    if bloquantes:
+        journal.warning(
+            "%d erreur(s) de validation, %d exercice(s) conservé(s)", len(bloquantes), len(exercices),
+            extra={"erreurs": bloquantes}
+        )
+    return exercices
+
+def assembler_test(comprehension_ecrite=None, grammaire=None, vocabulaire=None):
+    """Assemble un TestComplet à partir de sections déjà validées, sans nouvelle validation"""
+    return TestComplet.model_construct(
+        comprehension_ecrite=list(comprehension_ecrite or []),
+        grammaire=list(grammaire or []),
+        vocabulaire=list(vocabulaire or []),
+    )
 
 def parse_json_from_text(text):
-    """Extrait et parse le JSON d'un texte"""
+    """Extrait et parse le JSON d'un texte (réparations légères journalisées)"""
     try:
-        # Extraire le JSON du texte
-        json_match = re.search(r'\[.*\]', text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-            return json.loads(json_str)
-        else:
-            print("Impossible d'extraire le JSON du résultat")
+        donnees, reparations = extraire_json(text)
+        for reparation in reparations:
+            json_reparations.inc(reparation=reparation)
+        if donnees is None:
+            journal.warning("Impossible d'extraire le JSON du résultat")
+            json_echecs.inc()
             return None
+        if reparations:
+            journal.info("JSON réparé avant parsing", extra={"reparations": reparations})
+        return donnees
     except Exception as e:
-        print(f"Erreur lors du parsing JSON: {e}")
+        journal.error("Erreur lors du parsing JSON: %s", e)
+        json_echecs.inc()
         return None 
\ No newline at end of file
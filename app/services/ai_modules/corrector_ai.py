@@ -1,15 +1,26 @@
+import re
+import asyncio
+import contextvars
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_mistralai import ChatMistralAI
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional, Any, Union, Literal
-import os
-from dotenv import load_dotenv
+from typing import List, Dict, Optional, Any, Tuple, Union, Literal
+from app.services.ai_modules.llm_client import obtenir_llm
+from app.services.ai_modules.content_creator.utils import appel_api_limite, appel_api_limite_async
+from app.services.ai_modules.verdict_cache import cache_verdicts
+from app.core.config import settings
+from app.core.metrics import llm_retries, questions_corrigees
+from app.core.journal import obtenir_journal
 
-# Charger les variables d'environnement mais également définir une clé par défaut si absente
-load_dotenv()
+journal = obtenir_journal(__name__)
 
-# Obtenir la clé API depuis les variables d'environnement ou utiliser la clé par défaut
-MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "HWeyYbCcjhpjneQZmq5iszsQLil08omZ")
+# Pool partagé par toutes les évaluations synchrones : le nombre de threads reste borné quelle que soit la charge
+# (evaluer_reponse ne doit pas être appelée depuis ce pool)
+_executeur_questions = ThreadPoolExecutor(
+    max_workers=max(1, settings.CORRECTEUR_QUESTIONS_SIMULTANEES),
+    thread_name_prefix="correction-question"
+)
 
 # Définition des modèles d'évaluation
 class Erreur(BaseModel):
@@ -56,15 +67,148 @@ class BilanCompetences(BaseModel):
     lacunes_identifiees: List[str] = Field(..., description="Principales lacunes identifiées")
     recommandations: List[str] = Field(..., description="Recommandations d'apprentissage")
 
-def valider_reponse(question: Dict, reponse_utilisateur: str, langue: str, texte_original: str = None) -> ValidationReponse:
-    """Première IA: vérifie simplement si la réponse est correcte (true/false)"""
-    # Configuration du modèle - on utilise un modèle plus léger
-    llm = ChatMistralAI(
-        model="mistral-large-latest", 
-        temperature=0.1,
-        api_key=MISTRAL_API_KEY
+class VerdictQuestion(BaseModel):
+    numero: int = Field(..., description="Numéro de la question dans la liste fournie")
+    est_correct: bool = Field(..., description="Si la réponse est correcte ou non")
+    confiance: float = Field(..., description="Niveau de confiance de l'évaluation (0-1)")
+    analyse: Optional[AnalyseErreur] = Field(None, description="Analyse détaillée si la réponse est incorrecte")
+
+class CorrectionGroupee(BaseModel):
+    verdicts: List[VerdictQuestion] = Field(..., description="Un verdict par question, dans l'ordre de la liste")
+
+# Correction locale des éléments dont la réponse est connue (QCM, clé de réponse)
+
+# Lettre d'option suivie d'un séparateur et éventuellement du texte de l'option : "b)", "(C)", "D. texte"
+_LETTRE_OPTION = re.compile(r"^\(?([a-z0-9])\s*[).:\-]\s*(.*)$")
+
+def normaliser_reponse(texte) -> str:
+    """Forme canonique d'une réponse : casse et espaces ignorés, accents et ponctuation conservés"""
+    texte = unicodedata.normalize("NFC", str(texte or "")).casefold()
+    return " ".join(texte.split())
+
+def _normaliser_cle_reponse(texte) -> str:
+    """Forme d'une réponse dans la clé du cache des verdicts : casse, accents, ponctuation et espaces ignorés
+
+    Plus permissive que normaliser_reponse (correction locale) : le verdict d'un modèle qui ne
+    pénalise pas les fautes mineures est réutilisable pour ces variantes d'une même réponse.
+    """
+    texte = unicodedata.normalize("NFKD", str(texte or "")).casefold()
+    texte = "".join(caractere for caractere in texte if not unicodedata.combining(caractere))
+    texte = re.sub(r"[^\w\s]", " ", texte)
+    return " ".join(texte.split())
+
+def _type_element(element: Dict) -> str:
+    type_element = element.get("type") or ""
+    return str(getattr(type_element, "value", type_element)).upper()
+
+def _cle_verdict(espace: str, question: Dict, reponse_utilisateur: str, langue: str, texte_original: str = None) -> str:
+    """Clé du cache des verdicts : la question (type et texte), le texte de l'exercice, la réponse normalisée et la langue"""
+    return cache_verdicts.cle(
+        espace,
+        _type_element(question),
+        " ".join(str(question.get("texte", "")).split()),
+        " ".join((texte_original or "").split()),
+        _normaliser_cle_reponse(reponse_utilisateur),
+        (langue or "").strip().lower(),
+    )
+
+def _verdict_en_cache(cle: str):
+    return cache_verdicts.obtenir(cle) if settings.CORRECTEUR_CACHE_ACTIF else None
+
+def _mettre_en_cache(cle: str, verdict) -> None:
+    if settings.CORRECTEUR_CACHE_ACTIF:
+        cache_verdicts.enregistrer(cle, verdict)
+
+def _options(element: Dict) -> Dict[str, str]:
+    """Options d'un QCM indexées par identifiant normalisé (A, B, C...)"""
+    return {
+        str(option.get("id", "")).strip().upper(): option.get("texte", "")
+        for option in element.get("options") or []
+    }
+
+def _options_correctes(element: Dict) -> set:
+    """Identifiants des bonnes options, d'après est_correcte et reponse_correcte (identifiant ou texte)"""
+    options = _options(element)
+    correctes = {
+        str(option.get("id", "")).strip().upper()
+        for option in element.get("options") or []
+        if option.get("est_correcte")
+    }
+    cle = str(element.get("reponse_correcte") or "").strip()
+    if cle.upper() in options:
+        correctes.add(cle.upper())
+    elif cle:
+        cle_normalisee = normaliser_reponse(cle)
+        correctes.update(id_option for id_option, texte in options.items() if normaliser_reponse(texte) == cle_normalisee)
+    return correctes
+
+def _option_choisie(element: Dict, reponse_utilisateur: str) -> Optional[str]:
+    """Identifiant de l'option désignée sans ambiguïté par la réponse, None sinon
+
+    Une lettre seule désigne toujours l'option de cet identifiant ; sinon la réponse doit
+    reprendre exactement le texte d'une option, précédé ou non de sa lettre.
+    """
+    options = _options(element)
+    reponse_normalisee = normaliser_reponse(reponse_utilisateur)
+    if reponse_normalisee.upper() in options:
+        return reponse_normalisee.upper()
+    for id_option, texte in options.items():
+        if reponse_normalisee == normaliser_reponse(texte):
+            return id_option
+    lettre = _LETTRE_OPTION.match(reponse_normalisee)
+    if lettre and lettre.group(1).upper() in options:
+        id_option = lettre.group(1).upper()
+        if not lettre.group(2) or lettre.group(2) == normaliser_reponse(options[id_option]):
+            return id_option
+    return None
+
+def corriger_localement(element: Dict, reponse_utilisateur: str) -> Optional[ValidationReponse]:
+    """Verdict sans appel au modèle pour les éléments dont la réponse est connue, None sinon
+
+    Un QCM est corrigé par comparaison de l'option choisie avec les options correctes. Pour les
+    autres éléments, une réponse identique à reponse_correcte (casse et espaces mis à part) est
+    validée. Une réponse qui ne désigne aucune option, ou toute autre formulation, reste à juger
+    par le modèle.
+    """
+    if _type_element(element) == "QCM" or element.get("options"):
+        correctes = _options_correctes(element)
+        if not correctes:
+            return None
+        choisie = _option_choisie(element, reponse_utilisateur)
+        if choisie is None:
+            return None
+        if choisie in correctes:
+            return ValidationReponse(est_correct=True, confiance=1.0)
+        return ValidationReponse(
+            est_correct=False,
+            confiance=1.0,
+            explication=f"Option choisie: {choisie} ; réponse attendue: {', '.join(sorted(correctes))}."
+        )
+
+    cle = element.get("reponse_correcte")
+    if cle and normaliser_reponse(cle) == normaliser_reponse(reponse_utilisateur):
+        return ValidationReponse(est_correct=True, confiance=1.0)
+    return None
+
+def analyser_choix_incorrect(element: Dict, reponse_utilisateur: str) -> AnalyseErreur:
+    """Analyse locale d'un mauvais choix de QCM : rappel de la bonne option, sans appel au modèle"""
+    options = _options(element)
+    correctes = sorted(_options_correctes(element))
+    correction = "; ".join(f"{id_option}) {options.get(id_option, '')}".strip() for id_option in correctes)
+    return AnalyseErreur(
+        type_erreur="Choix incorrect",
+        description=f"La réponse « {reponse_utilisateur} » ne correspond pas à la bonne option.",
+        correction=correction or str(element.get("reponse_correcte") or "N/A"),
+        explication="La bonne option est celle indiquée dans la correction.",
+        suggestion="Relisez la question et comparez chaque option avec le texte ou la règle concernée."
     )
+
+def _preparer_validation(question: Dict, reponse_utilisateur: str, langue: str, texte_original: str = None):
+    """Construit le prompt et les variables de la première IA pour une réponse non vide
     
+    Les textes fournis par l'apprenant ou l'exercice sont passés en variables : leurs accolades
+    ne sont pas interprétées par le gabarit.
+    """
     # Extraire les informations de la question
     id_question = question.get("id", 0)
     texte_question = question.get("texte", "")
@@ -73,14 +217,6 @@ def valider_reponse(question: Dict, reponse_utilisateur: str, langue: str, texte
     # Détecter si c'est un exercice de compréhension écrite
     est_comprehension_ecrite = type_question.upper() == "QUESTION"
     
-    # Traiter le cas où l'utilisateur n'a pas répondu
-    if not reponse_utilisateur or reponse_utilisateur.strip() == "":
-        return ValidationReponse(
-            est_correct=False,
-            confiance=1.0,
-            explication="Aucune réponse fournie."
-        )
-    
     # Vérifie si l'utilisateur indique que l'information n'est pas dans le texte
     reponse_absence_info = any(phrase in reponse_utilisateur.lower() for phrase in [
         "pas indiqué", "pas mentionné", "n'est pas indiqué", "n'est pas mentionné", 
@@ -89,7 +225,7 @@ def valider_reponse(question: Dict, reponse_utilisateur: str, langue: str, texte
     ])
     
     # Construire le prompt pour la validation
-    system_prompt = f"""Tu es un évaluateur objectif pour les exercices de langue {langue}.
+    system_prompt = """Tu es un évaluateur objectif pour les exercices de langue {langue}.
     Ta SEULE tâche est de déterminer si la réponse de l'utilisateur est CORRECTE ou INCORRECTE.
     Réponds seulement par TRUE (correct) ou FALSE (incorrect), avec un niveau de confiance.
     Sois très strict sur la précision du contenu, mais ne pénalise pas les fautes d'orthographe mineures.
@@ -97,7 +233,7 @@ def valider_reponse(question: Dict, reponse_utilisateur: str, langue: str, texte
     
     # Ajouter des instructions spécifiques pour la compréhension écrite
     if est_comprehension_ecrite:
-        system_prompt += f"""
+        system_prompt += """
         RÈGLES CRUCIALES POUR LA COMPRÉHENSION ÉCRITE:
         - IGNORE TOTALEMENT les erreurs d'orthographe, de grammaire et de style
         - Évalue UNIQUEMENT si l'utilisateur a compris le contenu et l'information demandée
@@ -114,23 +250,23 @@ def valider_reponse(question: Dict, reponse_utilisateur: str, langue: str, texte
         - IMPORTANT: Ne confonds pas une mention générale avec des détails spécifiques
         """
     
-    human_prompt = f"""Question ({type_question}): {texte_question}
+    human_prompt = """Question ({type_question}): {texte_question}
     
-    Réponse de l'utilisateur: {reponse_utilisateur}
+    Réponse de l'utilisateur: {reponse}
     """
     
     # Ajouter le texte original pour les exercices de compréhension
     if est_comprehension_ecrite and texte_original:
-        human_prompt += f"""
+        human_prompt += """
         TEXTE ORIGINAL SUR LEQUEL PORTE LA QUESTION:
-        {texte_original}
+        {texte}
         
         CRUCIAL: Vérifie TOUJOURS si les informations demandées sont bien présentes dans ce texte.
         """
         
         # Ajouter des instructions spécifiques pour le cas où l'utilisateur dit que l'info n'est pas présente
         if reponse_absence_info:
-            human_prompt += f"""
+            human_prompt += """
             ATTENTION: L'utilisateur a répondu que l'information n'est pas présente dans le texte.
             Vérifie MÉTICULEUSEMENT si:
             1. La question demande une information générale qui EST présente dans le texte -> Réponse INCORRECTE
@@ -146,34 +282,77 @@ def valider_reponse(question: Dict, reponse_utilisateur: str, langue: str, texte
     Donne ton verdict avec un niveau de confiance entre 0 et 1.
     """
     
-    # Création et exécution de la chaîne
     prompt = ChatPromptTemplate.from_messages([
         ("system", system_prompt),
         ("human", human_prompt)
     ])
+    variables = {
+        "langue": langue,
+        "type_question": type_question,
+        "texte_question": texte_question,
+        "reponse": reponse_utilisateur,
+        "texte": texte_original or "",
+    }
+    return prompt, variables
+
+def _validation_absente() -> ValidationReponse:
+    return ValidationReponse(est_correct=False, confiance=1.0, explication="Aucune réponse fournie.")
+
+def _validation_en_erreur(e: Exception) -> ValidationReponse:
+    journal.error("Erreur lors de la validation de la réponse: %s", e)
+    return ValidationReponse(
+        est_correct=False,
+        confiance=0.5,
+        explication="Impossible de valider la réponse en raison d'une erreur technique."
+    )
+
+def valider_reponse(question: Dict, reponse_utilisateur: str, langue: str, texte_original: str = None) -> ValidationReponse:
+    """Première IA: vérifie simplement si la réponse est correcte (true/false)"""
+    # Traiter le cas où l'utilisateur n'a pas répondu
+    if not reponse_utilisateur or reponse_utilisateur.strip() == "":
+        return _validation_absente()
+    
+    # Réponse déjà jugée pour cette question
+    cle = _cle_verdict("validation", question, reponse_utilisateur, langue, texte_original)
+    validation = _verdict_en_cache(cle)
+    if validation is not None:
+        return validation
     
+    # Configuration du modèle - on utilise un modèle plus léger
+    llm = obtenir_llm(temperature=0.1, etape="validation")
+    prompt, variables = _preparer_validation(question, reponse_utilisateur, langue, texte_original)
     chain = prompt | llm.with_structured_output(ValidationReponse)
     
     try:
-        return chain.invoke({})
+        validation = appel_api_limite(chain.invoke, variables)
     except Exception as e:
-        print(f"Erreur lors de la validation de la réponse: {e}")
-        # Valeur par défaut en cas d'erreur
-        return ValidationReponse(
-            est_correct=False,
-            confiance=0.5,
-            explication="Impossible de valider la réponse en raison d'une erreur technique."
-        )
+        return _validation_en_erreur(e)
+    _mettre_en_cache(cle, validation)
+    return validation
 
-def analyser_erreur(question: Dict, reponse_utilisateur: str, langue: str, texte_original: str = None) -> AnalyseErreur:
-    """Deuxième IA: analyse détaillée uniquement pour les réponses incorrectes"""
-    # Configuration du modèle - on utilise un modèle plus puissant pour l'analyse
-    llm = ChatMistralAI(
-        model="mistral-large-latest", 
-        temperature=0.2,
-        api_key=MISTRAL_API_KEY
-    )
+async def valider_reponse_async(question: Dict, reponse_utilisateur: str, langue: str, texte_original: str = None) -> ValidationReponse:
+    """Version asynchrone de valider_reponse"""
+    if not reponse_utilisateur or reponse_utilisateur.strip() == "":
+        return _validation_absente()
+    
+    cle = _cle_verdict("validation", question, reponse_utilisateur, langue, texte_original)
+    validation = _verdict_en_cache(cle)
+    if validation is not None:
+        return validation
     
+    llm = obtenir_llm(temperature=0.1, etape="validation")
+    prompt, variables = _preparer_validation(question, reponse_utilisateur, langue, texte_original)
+    chain = prompt | llm.with_structured_output(ValidationReponse)
+    
+    try:
+        validation = await appel_api_limite_async(chain.ainvoke, variables)
+    except Exception as e:
+        return _validation_en_erreur(e)
+    _mettre_en_cache(cle, validation)
+    return validation
+
+def _preparer_analyse(question: Dict, reponse_utilisateur: str, langue: str, texte_original: str = None):
+    """Construit le prompt et les variables de la deuxième IA pour une réponse non vide"""
     # Extraire les informations de la question
     id_question = question.get("id", 0)
     texte_question = question.get("texte", "")
@@ -182,16 +361,6 @@ def analyser_erreur(question: Dict, reponse_utilisateur: str, langue: str, texte
     # Détecter si c'est un exercice de compréhension écrite
     est_comprehension_ecrite = type_question.upper() == "QUESTION"
     
-    # Traiter le cas où l'utilisateur n'a pas répondu
-    if not reponse_utilisateur or reponse_utilisateur.strip() == "":
-        return AnalyseErreur(
-            type_erreur="Absence de réponse",
-            description="Aucune réponse fournie pour cette question.",
-            correction="N/A",
-            explication="Il est important de répondre à toutes les questions.",
-            suggestion="Essayez de répondre à chaque question, même si vous n'êtes pas sûr."
-        )
-    
     # Vérifie si l'utilisateur indique que l'information n'est pas dans le texte
     reponse_absence_info = any(phrase in reponse_utilisateur.lower() for phrase in [
         "pas indiqué", "pas mentionné", "n'est pas indiqué", "n'est pas mentionné", 
@@ -200,7 +369,7 @@ def analyser_erreur(question: Dict, reponse_utilisateur: str, langue: str, texte
     ])
     
     # Construire le prompt pour l'analyse détaillée
-    system_prompt = f"""Tu es un professeur de {langue} expérimenté spécialisé dans l'analyse précise des erreurs.
+    system_prompt = """Tu es un professeur de {langue} expérimenté spécialisé dans l'analyse précise des erreurs.
     Ta mission est d'analyser en profondeur la réponse incorrecte d'un apprenant pour identifier:
     1. Le type exact d'erreur (compréhension, vocabulaire, grammaire, etc.)
     2. Une description précise de ce qui est incorrect
@@ -211,7 +380,7 @@ def analyser_erreur(question: Dict, reponse_utilisateur: str, langue: str, texte
     
     # Ajouter des instructions spécifiques pour la compréhension écrite
     if est_comprehension_ecrite:
-        system_prompt += f"""
+        system_prompt += """
         RÈGLES STRICTES POUR LA COMPRÉHENSION ÉCRITE:
         - Tu DOIS IGNORER COMPLÈTEMENT les erreurs d'orthographe, de grammaire et de style
         - Ton évaluation doit porter UNIQUEMENT sur la compréhension du contenu
@@ -229,16 +398,16 @@ def analyser_erreur(question: Dict, reponse_utilisateur: str, langue: str, texte
         - Vérifie MÉTICULEUSEMENT le texte avant de juger une réponse incorrecte
         """
     
-    human_prompt = f"""Question ({type_question}): {texte_question}
+    human_prompt = """Question ({type_question}): {texte_question}
     
-    Réponse incorrecte de l'utilisateur: {reponse_utilisateur}
+    Réponse incorrecte de l'utilisateur: {reponse}
     """
     
     # Ajouter le texte original pour les exercices de compréhension
     if est_comprehension_ecrite and texte_original:
-        human_prompt += f"""
+        human_prompt += """
         TEXTE ORIGINAL SUR LEQUEL PORTE LA QUESTION:
-        {texte_original}
+        {texte}
         
         CRUCIAL: Vérifie TOUJOURS si les informations demandées sont bien présentes dans ce texte.
         Ne corrige la réponse que si elle contredit réellement le texte original.
@@ -247,7 +416,7 @@ def analyser_erreur(question: Dict, reponse_utilisateur: str, langue: str, texte
         
         # Ajouter des instructions spécifiques pour le cas où l'utilisateur dit que l'info n'est pas présente
         if reponse_absence_info:
-            human_prompt += f"""
+            human_prompt += """
             ATTENTION PARTICULIÈRE: L'utilisateur a répondu que l'information demandée n'est pas dans le texte.
             
             Vérifie SCRUPULEUSEMENT si cette affirmation est vraie:
@@ -265,36 +434,169 @@ def analyser_erreur(question: Dict, reponse_utilisateur: str, langue: str, texte
     Analyse l'erreur en détail pour aider l'apprenant à progresser.
     """
     
-    # Création et exécution de la chaîne
     prompt = ChatPromptTemplate.from_messages([
         ("system", system_prompt),
         ("human", human_prompt)
     ])
+    variables = {
+        "langue": langue,
+        "type_question": type_question,
+        "texte_question": texte_question,
+        "reponse": reponse_utilisateur,
+        "texte": texte_original or "",
+    }
+    return prompt, variables
+
+def _analyse_absence_reponse() -> AnalyseErreur:
+    return AnalyseErreur(
+        type_erreur="Absence de réponse",
+        description="Aucune réponse fournie pour cette question.",
+        correction="N/A",
+        explication="Il est important de répondre à toutes les questions.",
+        suggestion="Essayez de répondre à chaque question, même si vous n'êtes pas sûr."
+    )
+
+def _analyse_en_erreur(e: Exception) -> AnalyseErreur:
+    journal.error("Erreur lors de l'analyse de l'erreur: %s", e)
+    return AnalyseErreur(
+        type_erreur="Indéterminé",
+        description="Impossible d'analyser l'erreur en détail en raison d'une erreur technique.",
+        correction="N/A",
+        explication="Veuillez consulter un enseignant pour une analyse précise.",
+        suggestion="Continuez à pratiquer et demandez de l'aide à un enseignant."
+    )
+
+def analyser_erreur(question: Dict, reponse_utilisateur: str, langue: str, texte_original: str = None) -> AnalyseErreur:
+    """Deuxième IA: analyse détaillée uniquement pour les réponses incorrectes"""
+    # Traiter le cas où l'utilisateur n'a pas répondu
+    if not reponse_utilisateur or reponse_utilisateur.strip() == "":
+        return _analyse_absence_reponse()
     
+    # Erreur déjà analysée pour cette question
+    cle = _cle_verdict("analyse", question, reponse_utilisateur, langue, texte_original)
+    analyse = _verdict_en_cache(cle)
+    if analyse is not None:
+        return analyse
+    
+    # Configuration du modèle - on utilise un modèle plus puissant pour l'analyse
+    llm = obtenir_llm(temperature=0.2, etape="analyse")
+    prompt, variables = _preparer_analyse(question, reponse_utilisateur, langue, texte_original)
     chain = prompt | llm.with_structured_output(AnalyseErreur)
     
     try:
-        return chain.invoke({})
+        analyse = appel_api_limite(chain.invoke, variables)
     except Exception as e:
-        print(f"Erreur lors de l'analyse de l'erreur: {e}")
-        # Valeur par défaut en cas d'erreur
-        return AnalyseErreur(
-            type_erreur="Indéterminé",
-            description="Impossible d'analyser l'erreur en détail en raison d'une erreur technique.",
-            correction="N/A",
-            explication="Veuillez consulter un enseignant pour une analyse précise.",
-            suggestion="Continuez à pratiquer et demandez de l'aide à un enseignant."
-        )
+        return _analyse_en_erreur(e)
+    _mettre_en_cache(cle, analyse)
+    return analyse
 
-def compiler_evaluation(resultats_questions: List[ResultatQuestion], exercice: Dict, langue: str) -> Evaluation:
-    """Compile les résultats des questions individuelles en une évaluation globale"""
-    # Configuration du modèle
-    llm = ChatMistralAI(
-        model="mistral-large-latest", 
-        temperature=0.3,
-        api_key=MISTRAL_API_KEY
-    )
+async def analyser_erreur_async(question: Dict, reponse_utilisateur: str, langue: str, texte_original: str = None) -> AnalyseErreur:
+    """Version asynchrone de analyser_erreur"""
+    if not reponse_utilisateur or reponse_utilisateur.strip() == "":
+        return _analyse_absence_reponse()
+    
+    cle = _cle_verdict("analyse", question, reponse_utilisateur, langue, texte_original)
+    analyse = _verdict_en_cache(cle)
+    if analyse is not None:
+        return analyse
+    
+    llm = obtenir_llm(temperature=0.2, etape="analyse")
+    prompt, variables = _preparer_analyse(question, reponse_utilisateur, langue, texte_original)
+    chain = prompt | llm.with_structured_output(AnalyseErreur)
+    
+    try:
+        analyse = await appel_api_limite_async(chain.ainvoke, variables)
+    except Exception as e:
+        return _analyse_en_erreur(e)
+    _mettre_en_cache(cle, analyse)
+    return analyse
+
+# Correction groupée (CORRECTEUR_MODE="groupe") : toutes les questions d'un exercice en un seul appel,
+# le texte de l'exercice n'étant envoyé qu'une fois au lieu d'une fois par question
+
+def _preparer_correction_groupee(questions: List[Tuple[Dict, str]], langue: str, texte_original: str = None):
+    """Construit le prompt et les variables de la correction groupée de (question, réponse) non vides"""
+    est_comprehension_ecrite = any(_type_element(question) == "QUESTION" for question, _ in questions)
+    
+    system_prompt = """Tu es un professeur de {langue} expérimenté et un évaluateur objectif.
+    Pour CHAQUE question de la liste, détermine si la réponse de l'apprenant est CORRECTE ou INCORRECTE,
+    avec un niveau de confiance entre 0 et 1. Sois strict sur le fond, mais ne pénalise pas les fautes
+    d'orthographe mineures.
+    Pour chaque réponse INCORRECTE uniquement, fournis une analyse: type d'erreur, description précise,
+    correction, explication pédagogique et suggestion pour progresser.
+    Renvoie exactement un verdict par question, avec le numéro de la question.
+    """
+    
+    if est_comprehension_ecrite:
+        system_prompt += """
+        RÈGLES POUR LA COMPRÉHENSION ÉCRITE:
+        - Ignore les erreurs d'orthographe, de grammaire et de style : seule la compréhension du contenu compte
+        - Une réponse est correcte si elle contient l'information demandée, quelle que soit sa formulation
+        - Si l'apprenant répond que l'information n'est pas dans le texte, distingue une information générale
+          présente dans le texte (réponse incorrecte) de détails spécifiques réellement absents (réponse correcte)
+        - N'invente pas d'informations qui ne sont pas dans le texte
+        """
     
+    human_prompt = ""
+    if texte_original:
+        human_prompt += """TEXTE DE L'EXERCICE:
+    {texte}
+    
+    """
+    human_prompt += """QUESTIONS ET RÉPONSES DE L'APPRENANT:
+    {questions}
+    """
+    
+    lignes = []
+    for numero, (question, reponse_utilisateur) in enumerate(questions, start=1):
+        lignes.append(f"{numero}. ({_type_element(question) or 'QUESTION'}) {question.get('texte', '')}")
+        lignes.append(f"   Réponse de l'apprenant: {reponse_utilisateur}")
+    
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", system_prompt),
+        ("human", human_prompt)
+    ])
+    variables = {"langue": langue, "texte": texte_original or "", "questions": "\n".join(lignes)}
+    return prompt, variables
+
+def _verdicts_par_position(correction: CorrectionGroupee, nb_questions: int) -> Dict[int, VerdictQuestion]:
+    """Verdicts indexés par position (0..n-1) ; les numéros hors liste ou en double sont ignorés"""
+    verdicts = {}
+    for verdict in correction.verdicts:
+        position = verdict.numero - 1
+        if 0 <= position < nb_questions and position not in verdicts:
+            verdicts[position] = verdict
+    return verdicts
+
+def corriger_groupe(questions: List[Tuple[Dict, str]], langue: str, texte_original: str = None) -> Dict[int, VerdictQuestion]:
+    """Corrige une liste de (question, réponse) en un seul appel et retourne les verdicts par position
+    
+    Les questions sans verdict exploitable sont absentes du résultat (vide en cas d'erreur).
+    """
+    llm = obtenir_llm(temperature=0.1, etape="validation")
+    prompt, variables = _preparer_correction_groupee(questions, langue, texte_original)
+    chain = prompt | llm.with_structured_output(CorrectionGroupee)
+    
+    try:
+        return _verdicts_par_position(appel_api_limite(chain.invoke, variables), len(questions))
+    except Exception as e:
+        journal.error("Erreur lors de la correction groupée: %s", e, extra={"nb_questions": len(questions)})
+        return {}
+
+async def corriger_groupe_async(questions: List[Tuple[Dict, str]], langue: str, texte_original: str = None) -> Dict[int, VerdictQuestion]:
+    """Version asynchrone de corriger_groupe"""
+    llm = obtenir_llm(temperature=0.1, etape="validation")
+    prompt, variables = _preparer_correction_groupee(questions, langue, texte_original)
+    chain = prompt | llm.with_structured_output(CorrectionGroupee)
+    
+    try:
+        return _verdicts_par_position(await appel_api_limite_async(chain.ainvoke, variables), len(questions))
+    except Exception as e:
+        journal.error("Erreur lors de la correction groupée: %s", e, extra={"nb_questions": len(questions)})
+        return {}
+
+def _preparer_compilation(resultats_questions: List[ResultatQuestion], exercice: Dict, langue: str):
+    """Construit le prompt et les variables de l'évaluation globale d'un exercice"""
     # Extraction des informations de l'exercice
     consigne = exercice.get("consigne", "")
     niveau_cible = exercice.get("niveau_cible", "")
@@ -331,13 +633,13 @@ def compiler_evaluation(resultats_questions: List[ResultatQuestion], exercice: D
         resultats_texte += "\n"
     
     # Construire le prompt pour l'évaluation globale
-    system_prompt = f"""Tu es un professeur de {langue} expert dans l'évaluation des compétences linguistiques.
+    system_prompt = """Tu es un professeur de {langue} expert dans l'évaluation des compétences linguistiques.
     Ta mission est de compiler les résultats d'un exercice et de produire une évaluation globale et formative.
     """
     
     # Ajouter des instructions spécifiques pour la compréhension écrite
     if est_comprehension_ecrite:
-        system_prompt += f"""
+        system_prompt += """
         INSTRUCTIONS STRICTES POUR LA COMPRÉHENSION ÉCRITE:
         1. Tu DOIS IGNORER COMPLÈTEMENT les erreurs d'orthographe, de grammaire et de style
         2. Si les réponses montrent une bonne compréhension du CONTENU, la note doit être de 10/10
@@ -358,12 +660,12 @@ def compiler_evaluation(resultats_questions: List[ResultatQuestion], exercice: D
           spécifique n'est pas explicitement mentionnée dans le texte.
         """
     
-    human_prompt = f"""Consigne de l'exercice: {consigne}
+    human_prompt = """Consigne de l'exercice: {consigne}
     Niveau cible: {niveau_cible}
     Compétence évaluée: {competence}
     
     Résultats détaillés des questions:
-    {resultats_texte}
+    {resultats}
     
     Génère une évaluation globale incluant:
     1. Une note sur 10
@@ -377,7 +679,7 @@ def compiler_evaluation(resultats_questions: List[ResultatQuestion], exercice: D
     
     # Pour la compréhension écrite, ajouter un rappel explicite
     if est_comprehension_ecrite:
-        human_prompt += f"""
+        human_prompt += """
         RAPPEL CRUCIAL: Pour cet exercice de compréhension écrite, tu DOIS:
         - Ignorer COMPLÈTEMENT les erreurs d'orthographe
         - Attribuer une note de 10/10 si toutes les informations essentielles sont comprises
@@ -402,31 +704,200 @@ def compiler_evaluation(resultats_questions: List[ResultatQuestion], exercice: D
               être considéré comme CORRECT.
             """
     
-    # Création et exécution de la chaîne
     prompt = ChatPromptTemplate.from_messages([
         ("system", system_prompt),
         ("human", human_prompt)
     ])
+    variables = {
+        "langue": langue,
+        "consigne": consigne,
+        "niveau_cible": niveau_cible,
+        "competence": competence,
+        "resultats": resultats_texte,
+    }
+    return prompt, variables
+
+def _evaluation_en_erreur(e: Exception) -> Evaluation:
+    journal.error("Erreur lors de la compilation de l'évaluation: %s", e)
+    # Évaluation par défaut en cas d'erreur
+    return Evaluation(
+        note=5.0,
+        niveau_estime="Non déterminé",
+        commentaire_general="Une erreur est survenue lors de l'évaluation automatique.",
+        points_forts=["Non déterminé en raison d'une erreur technique"],
+        points_faibles=["Non déterminé en raison d'une erreur technique"],
+        erreurs=[],
+        suggestions=["Consulter un enseignant pour une évaluation détaillée"]
+    )
+
+def compiler_evaluation(resultats_questions: List[ResultatQuestion], exercice: Dict, langue: str) -> Evaluation:
+    """Compile les résultats des questions individuelles en une évaluation globale"""
+    llm = obtenir_llm(temperature=0.3, etape="evaluation")
+    prompt, variables = _preparer_compilation(resultats_questions, exercice, langue)
+    chain = prompt | llm.with_structured_output(Evaluation)
     
+    try:
+        return appel_api_limite(chain.invoke, variables)
+    except Exception as e:
+        return _evaluation_en_erreur(e)
+
+async def compiler_evaluation_async(resultats_questions: List[ResultatQuestion], exercice: Dict, langue: str) -> Evaluation:
+    """Version asynchrone de compiler_evaluation (ainvoke, sans thread)"""
+    llm = obtenir_llm(temperature=0.3, etape="evaluation")
+    prompt, variables = _preparer_compilation(resultats_questions, exercice, langue)
     chain = prompt | llm.with_structured_output(Evaluation)
     
     try:
-        return chain.invoke({})
+        return await appel_api_limite_async(chain.ainvoke, variables)
     except Exception as e:
-        print(f"Erreur lors de la compilation de l'évaluation: {e}")
-        # Évaluation par défaut en cas d'erreur
-        return Evaluation(
-            note=5.0,
-            niveau_estime="Non déterminé",
-            commentaire_general="Une erreur est survenue lors de l'évaluation automatique.",
-            points_forts=["Non déterminé en raison d'une erreur technique"],
-            points_faibles=["Non déterminé en raison d'une erreur technique"],
-            erreurs=[],
-            suggestions=["Consulter un enseignant pour une évaluation détaillée"]
-        )
+        return _evaluation_en_erreur(e)
+
+def _parser_reponses(reponses_utilisateur: str) -> Dict[int, str]:
+    """Réponses indexées par identifiant de question"""
+    # Format attendu: "Question 1: réponse1\nQuestion 2: réponse2"
+    reponses_dict = {}
+    
+    # Parser les réponses ligne par ligne
+    for ligne in reponses_utilisateur.split('\n'):
+        # Chercher les patterns "Question X:" ou "Phrase X:" ou "Item X:"
+        for prefix in ["Question", "Phrase", "Item"]:
+            if f"{prefix} " in ligne:
+                parts = ligne.split(':', 1)
+                if len(parts) == 2:
+                    # Extraire l'ID de la question (ex: "Question 1" -> 1)
+                    id_str = parts[0].replace(f"{prefix} ", "").strip()
+                    try:
+                        id_question = int(id_str)
+                        reponse = parts[1].strip()
+                        reponses_dict[id_question] = reponse
+                    except ValueError:
+                        pass
+    return reponses_dict
+
+def _resultat_question(element: Dict, reponse_utilisateur: str, analyse: Optional[AnalyseErreur]) -> ResultatQuestion:
+    """Résultat d'une question : correcte si aucune analyse d'erreur n'a été produite"""
+    return ResultatQuestion(
+        id_question=element.get("id", 0),
+        texte_question=element.get("texte", ""),
+        reponse_utilisateur=reponse_utilisateur or "[Pas de réponse]",
+        est_correct=analyse is None,
+        analyse=analyse
+    )
+
+def _evaluer_question(element: Dict, reponse_utilisateur: str, langue: str, texte_principal: str) -> ResultatQuestion:
+    """Valide une réponse (localement si elle est connue) puis analyse l'erreur si elle est incorrecte"""
+    if not reponse_utilisateur:
+        return _resultat_question(element, reponse_utilisateur, _analyse_absence_reponse())
+    
+    # Première étape: validation simple (correct/incorrect), locale si la réponse est connue
+    validation = corriger_localement(element, reponse_utilisateur)
+    corrige_localement = validation is not None
+    if corrige_localement:
+        questions_corrigees.inc(mode="locale")
+    else:
+        questions_corrigees.inc(mode="llm")
+        validation = valider_reponse_avec_retry(element, reponse_utilisateur, langue, texte_principal)
+    if validation.est_correct:
+        return _resultat_question(element, reponse_utilisateur, None)
+    
+    # Si incorrect, faire une analyse détaillée avec le texte original
+    # (un mauvais choix de QCM n'est expliqué par le modèle que sur demande)
+    if corrige_localement and not settings.CORRECTEUR_EXPLIQUER_QCM:
+        analyse = analyser_choix_incorrect(element, reponse_utilisateur)
+    else:
+        analyse = analyser_erreur_avec_retry(element, reponse_utilisateur, langue, texte_principal)
+    return _resultat_question(element, reponse_utilisateur, analyse)
+
+async def _evaluer_question_async(element: Dict, reponse_utilisateur: str, langue: str, texte_principal: str) -> ResultatQuestion:
+    """Version asynchrone de _evaluer_question"""
+    if not reponse_utilisateur:
+        return _resultat_question(element, reponse_utilisateur, _analyse_absence_reponse())
+    
+    validation = corriger_localement(element, reponse_utilisateur)
+    corrige_localement = validation is not None
+    if corrige_localement:
+        questions_corrigees.inc(mode="locale")
+    else:
+        questions_corrigees.inc(mode="llm")
+        validation = await valider_reponse_async(element, reponse_utilisateur, langue, texte_principal)
+    if validation.est_correct:
+        return _resultat_question(element, reponse_utilisateur, None)
+    
+    if corrige_localement and not settings.CORRECTEUR_EXPLIQUER_QCM:
+        analyse = analyser_choix_incorrect(element, reponse_utilisateur)
+    else:
+        analyse = await analyser_erreur_async(element, reponse_utilisateur, langue, texte_principal)
+    return _resultat_question(element, reponse_utilisateur, analyse)
+
+def _questions_pour_lot(elements: List[Dict], reponses: List[str], langue: str, texte_principal: str) -> List[int]:
+    """Positions des questions répondues dont le verdict demande le modèle (ni clé connue, ni verdict en cache)"""
+    return [
+        index for index, (element, reponse) in enumerate(zip(elements, reponses))
+        if reponse and corriger_localement(element, reponse) is None
+        and not (settings.CORRECTEUR_CACHE_ACTIF
+                 and cache_verdicts.contient(_cle_verdict("validation", element, reponse, langue, texte_principal)))
+    ]
+
+def _mettre_verdict_en_cache(element: Dict, reponse_utilisateur: str, langue: str, texte_principal: str, verdict: VerdictQuestion) -> None:
+    """Conserve un verdict de correction groupée comme s'il venait de valider_reponse et analyser_erreur"""
+    _mettre_en_cache(
+        _cle_verdict("validation", element, reponse_utilisateur, langue, texte_principal),
+        ValidationReponse(est_correct=verdict.est_correct, confiance=verdict.confiance)
+    )
+    if not verdict.est_correct and verdict.analyse is not None:
+        _mettre_en_cache(_cle_verdict("analyse", element, reponse_utilisateur, langue, texte_principal), verdict.analyse)
+
+def _evaluer_questions_groupees(elements: List[Dict], reponses_dict: Dict[int, str], langue: str, texte_principal: str) -> List[ResultatQuestion]:
+    """Corrige en un seul appel toutes les questions qui le nécessitent ; les autres, et celles
+    restées sans verdict, suivent le chemin question par question"""
+    reponses = [reponses_dict.get(element.get("id", 0), "") for element in elements]
+    lot = _questions_pour_lot(elements, reponses, langue, texte_principal)
+    verdicts = corriger_groupe([(elements[i], reponses[i]) for i in lot], langue, texte_principal) if lot else {}
+    verdicts = {lot[position]: verdict for position, verdict in verdicts.items()}
+    
+    resultats_questions = []
+    for index, (element, reponse) in enumerate(zip(elements, reponses)):
+        verdict = verdicts.get(index)
+        if verdict is None:
+            resultats_questions.append(_evaluer_question(element, reponse, langue, texte_principal))
+            continue
+        questions_corrigees.inc(mode="groupe")
+        _mettre_verdict_en_cache(element, reponse, langue, texte_principal, verdict)
+        analyse = None
+        if not verdict.est_correct:
+            analyse = verdict.analyse or analyser_erreur_avec_retry(element, reponse, langue, texte_principal)
+        resultats_questions.append(_resultat_question(element, reponse, analyse))
+    return resultats_questions
+
+async def _evaluer_questions_groupees_async(elements: List[Dict], reponses_dict: Dict[int, str], langue: str, texte_principal: str) -> List[ResultatQuestion]:
+    """Version asynchrone de _evaluer_questions_groupees"""
+    reponses = [reponses_dict.get(element.get("id", 0), "") for element in elements]
+    lot = _questions_pour_lot(elements, reponses, langue, texte_principal)
+    verdicts = await corriger_groupe_async([(elements[i], reponses[i]) for i in lot], langue, texte_principal) if lot else {}
+    verdicts = {lot[position]: verdict for position, verdict in verdicts.items()}
+    
+    async def evaluer(index, element, reponse):
+        verdict = verdicts.get(index)
+        if verdict is None:
+            return await _evaluer_question_async(element, reponse, langue, texte_principal)
+        questions_corrigees.inc(mode="groupe")
+        _mettre_verdict_en_cache(element, reponse, langue, texte_principal, verdict)
+        analyse = None
+        if not verdict.est_correct:
+            analyse = verdict.analyse or await analyser_erreur_async(element, reponse, langue, texte_principal)
+        return _resultat_question(element, reponse, analyse)
+    
+    return list(await asyncio.gather(*(
+        evaluer(index, element, reponse) for index, (element, reponse) in enumerate(zip(elements, reponses))
+    )))
 
 def evaluer_reponse(exercice, reponses_utilisateur, langue="français"):
-    """Évalue les réponses de l'utilisateur avec l'architecture à deux IA"""
+    """Évalue les réponses de l'utilisateur avec l'architecture à deux IA
+    
+    Les questions sont évaluées simultanément dans le pool partagé de CORRECTEUR_QUESTIONS_SIMULTANEES
+    threads (les appels au modèle restent soumis au limiteur global), ou en un seul appel groupé
+    si CORRECTEUR_MODE vaut "groupe" ; les résultats gardent l'ordre des éléments de l'exercice.
+    """
     try:
         # Préparation des données
         contenu_obj = exercice.get("contenu", {})
@@ -437,78 +908,28 @@ def evaluer_reponse(exercice, reponses_utilisateur, langue="français"):
             texte_principal = contenu_obj.get("texte_principal", "")
         else:
             # Si ancien format, créer une structure factice compatible
-            print("Format d'exercice non compatible avec l'évaluation à deux niveaux.")
+            journal.info("Format d'exercice non compatible avec l'évaluation à deux niveaux, évaluation legacy")
             # Utiliser l'ancienne méthode d'évaluation
             return evaluer_reponse_legacy(exercice, reponses_utilisateur, langue)
         
         # Analyser les réponses de l'utilisateur
-        # Format attendu: "Question 1: réponse1\nQuestion 2: réponse2"
-        reponses_dict = {}
-        
-        # Parser les réponses ligne par ligne
-        for ligne in reponses_utilisateur.split('\n'):
-            # Chercher les patterns "Question X:" ou "Phrase X:" ou "Item X:"
-            for prefix in ["Question", "Phrase", "Item"]:
-                if f"{prefix} " in ligne:
-                    parts = ligne.split(':', 1)
-                    if len(parts) == 2:
-                        # Extraire l'ID de la question (ex: "Question 1" -> 1)
-                        id_str = parts[0].replace(f"{prefix} ", "").strip()
-                        try:
-                            id_question = int(id_str)
-                            reponse = parts[1].strip()
-                            reponses_dict[id_question] = reponse
-                        except ValueError:
-                            pass
+        reponses_dict = _parser_reponses(reponses_utilisateur)
         
         # Évaluer chaque question
-        resultats_questions = []
+        def evaluer(element):
+            return _evaluer_question(element, reponses_dict.get(element.get("id", 0), ""), langue, texte_principal)
         
-        for element in elements:
-            id_question = element.get("id", 0)
-            texte_question = element.get("texte", "")
-            
-            # Récupérer la réponse de l'utilisateur pour cette question
-            reponse_utilisateur = reponses_dict.get(id_question, "")
-            
-            if reponse_utilisateur:
-                # Première étape: validation simple (correct/incorrect)
-                validation = valider_reponse_avec_retry(element, reponse_utilisateur, langue, texte_principal)
-                
-                if validation.est_correct:
-                    # Si correct, pas besoin d'analyse détaillée
-                    resultats_questions.append(ResultatQuestion(
-                        id_question=id_question,
-                        texte_question=texte_question,
-                        reponse_utilisateur=reponse_utilisateur,
-                        est_correct=True,
-                        analyse=None
-                    ))
-                else:
-                    # Si incorrect, faire une analyse détaillée avec le texte original
-                    analyse = analyser_erreur_avec_retry(element, reponse_utilisateur, langue, texte_principal)
-                    resultats_questions.append(ResultatQuestion(
-                        id_question=id_question,
-                        texte_question=texte_question,
-                        reponse_utilisateur=reponse_utilisateur,
-                        est_correct=False,
-                        analyse=analyse
-                    ))
-            else:
-                # Pas de réponse pour cette question
-                resultats_questions.append(ResultatQuestion(
-                    id_question=id_question,
-                    texte_question=texte_question,
-                    reponse_utilisateur="[Pas de réponse]",
-                    est_correct=False,
-                    analyse=AnalyseErreur(
-                        type_erreur="Absence de réponse",
-                        description="Aucune réponse fournie pour cette question.",
-                        correction="N/A",
-                        explication="Il est important de répondre à toutes les questions.",
-                        suggestion="Essayez de répondre à chaque question, même si vous n'êtes pas sûr."
-                    )
-                ))
+        if settings.CORRECTEUR_MODE == "groupe":
+            resultats_questions = _evaluer_questions_groupees(elements, reponses_dict, langue, texte_principal)
+        elif settings.CORRECTEUR_QUESTIONS_SIMULTANEES > 1 and len(elements) > 1:
+            # Résultats lus dans l'ordre des éléments ; chaque tâche garde le contexte de journalisation
+            futures = [
+                _executeur_questions.submit(contextvars.copy_context().run, evaluer, element)
+                for element in elements
+            ]
+            resultats_questions = [future.result() for future in futures]
+        else:
+            resultats_questions = [evaluer(element) for element in elements]
         
         # Compiler les résultats en une évaluation globale avec le texte original
         evaluation = compiler_evaluation_avec_retry(resultats_questions, exercice, langue)
@@ -519,10 +940,47 @@ def evaluer_reponse(exercice, reponses_utilisateur, langue="français"):
         return evaluation
     
     except Exception as e:
-        print(f"Erreur générale lors de l'évaluation: {e}")
+        journal.error("Erreur générale lors de l'évaluation: %s", e)
         # En cas d'erreur, revenir à l'ancienne méthode
         return evaluer_reponse_legacy(exercice, reponses_utilisateur, langue)
 
+async def evaluer_reponse_async(exercice, reponses_utilisateur, langue="français"):
+    """Version asynchrone de evaluer_reponse : les questions sont évaluées en coroutines
+    
+    Au plus CORRECTEUR_QUESTIONS_SIMULTANEES questions sont en cours à la fois, puis l'évaluation
+    globale est compilée par ainvoke ; seuls les replis (format ancien, évaluation legacy)
+    s'exécutent dans un thread.
+    """
+    contenu_obj = exercice.get("contenu", {})
+    if not (isinstance(contenu_obj, dict) and "elements" in contenu_obj):
+        return await asyncio.to_thread(evaluer_reponse, exercice, reponses_utilisateur, langue)
+    
+    try:
+        elements = contenu_obj.get("elements", [])
+        texte_principal = contenu_obj.get("texte_principal", "")
+        reponses_dict = _parser_reponses(reponses_utilisateur)
+        semaphore = asyncio.Semaphore(max(1, settings.CORRECTEUR_QUESTIONS_SIMULTANEES))
+        
+        async def evaluer(element):
+            async with semaphore:
+                return await _evaluer_question_async(
+                    element, reponses_dict.get(element.get("id", 0), ""), langue, texte_principal
+                )
+        
+        # gather conserve l'ordre des éléments
+        if settings.CORRECTEUR_MODE == "groupe":
+            resultats_questions = await _evaluer_questions_groupees_async(elements, reponses_dict, langue, texte_principal)
+        else:
+            resultats_questions = list(await asyncio.gather(*(evaluer(element) for element in elements)))
+        
+        evaluation = await compiler_evaluation_async(resultats_questions, exercice, langue)
+        evaluation.resultats_questions = resultats_questions
+        return evaluation
+    
+    except Exception as e:
+        journal.error("Erreur générale lors de l'évaluation: %s", e)
+        return await asyncio.to_thread(evaluer_reponse_legacy, exercice, reponses_utilisateur, langue)
+
 # Fonctions avec système de réessai pour gérer les erreurs 429 (rate limit)
 def valider_reponse_avec_retry(question, reponse_utilisateur, langue, texte_original=None, max_retries=3, delay=2):
     """Version avec réessai de la fonction valider_reponse pour gérer les erreurs 429"""
@@ -534,7 +992,10 @@ def valider_reponse_avec_retry(question, reponse_utilisateur, langue, texte_orig
         except Exception as e:
             error_message = str(e).lower()
             if "429" in error_message or "rate limit" in error_message:
-                print(f"Rate limit atteint, nouvel essai {attempt+1}/{max_retries} dans {delay} secondes...")
+                journal.warning(
+                    "Rate limit atteint, nouvel essai %d/%d", attempt + 1, max_retries, extra={"attente_ms": delay * 1000}
+                )
+                llm_retries.inc(niveau="correcteur")
                 time.sleep(delay)
                 # Augmenter le délai exponentiellement à chaque tentative
                 delay *= 2
@@ -543,7 +1004,7 @@ def valider_reponse_avec_retry(question, reponse_utilisateur, langue, texte_orig
                 raise e
     
     # Si on arrive ici, tous les essais ont échoué
-    print("Tous les essais de validation ont échoué - retour valeur par défaut")
+    journal.error("Tous les essais de validation ont échoué - retour valeur par défaut")
     return ValidationReponse(
         est_correct=True,  # Par défaut, considérer comme correct en cas d'incertitude
         confiance=0.5,
@@ -560,7 +1021,10 @@ def analyser_erreur_avec_retry(question, reponse_utilisateur, langue, texte_orig
         except Exception as e:
             error_message = str(e).lower()
             if "429" in error_message or "rate limit" in error_message:
-                print(f"Rate limit atteint, nouvel essai {attempt+1}/{max_retries} dans {delay} secondes...")
+                journal.warning(
+                    "Rate limit atteint, nouvel essai %d/%d", attempt + 1, max_retries, extra={"attente_ms": delay * 1000}
+                )
+                llm_retries.inc(niveau="correcteur")
                 time.sleep(delay)
                 # Augmenter le délai exponentiellement à chaque tentative
                 delay *= 2
@@ -569,7 +1033,7 @@ def analyser_erreur_avec_retry(question, reponse_utilisateur, langue, texte_orig
                 raise e
     
     # Si on arrive ici, tous les essais ont échoué
-    print("Tous les essais d'analyse ont échoué - retour valeur par défaut")
+    journal.error("Tous les essais d'analyse ont échoué - retour valeur par défaut")
     return AnalyseErreur(
         type_erreur="Indéterminé",
         description="Impossible d'analyser la réponse en raison de limitations techniques.",
@@ -588,7 +1052,10 @@ def compiler_evaluation_avec_retry(resultats_questions, exercice, langue, max_re
         except Exception as e:
             error_message = str(e).lower()
             if "429" in error_message or "rate limit" in error_message:
-                print(f"Rate limit atteint, nouvel essai {attempt+1}/{max_retries} dans {delay} secondes...")
+                journal.warning(
+                    "Rate limit atteint, nouvel essai %d/%d", attempt + 1, max_retries, extra={"attente_ms": delay * 1000}
+                )
+                llm_retries.inc(niveau="correcteur")
                 time.sleep(delay)
                 # Augmenter le délai exponentiellement à chaque tentative
                 delay *= 2
@@ -597,7 +1064,7 @@ def compiler_evaluation_avec_retry(resultats_questions, exercice, langue, max_re
                 raise e
     
     # Si on arrive ici, tous les essais ont échoué
-    print("Tous les essais de compilation ont échoué - génération d'évaluation par défaut")
+    journal.error("Tous les essais de compilation ont échoué - génération d'évaluation par défaut")
     
     # Déterminer le nombre de réponses correctes pour une note approximative
     nb_questions = len(resultats_questions)
@@ -716,11 +1183,7 @@ def evaluer_reponse_legacy(exercice, reponse_utilisateur, langue="français"):
     for attempt in range(max_retries):
         try:
             # Configuration du modèle
-            llm = ChatMistralAI(
-                model="mistral-large-latest", 
-                temperature=0.1,
-                api_key=MISTRAL_API_KEY
-            )
+            llm = obtenir_llm(temperature=0.1, etape="evaluation")
             
             # Extraction des informations de l'exercice
             consigne = exercice.get("consigne", "")
@@ -934,16 +1397,19 @@ def evaluer_reponse_legacy(exercice, reponse_utilisateur, langue="français"):
         except Exception as e:
             error_message = str(e).lower()
             if "429" in error_message or "rate limit" in error_message:
-                print(f"Rate limit atteint, nouvel essai {attempt+1}/{max_retries} dans {delay} secondes...")
+                journal.warning(
+                    "Rate limit atteint, nouvel essai %d/%d", attempt + 1, max_retries, extra={"attente_ms": delay * 1000}
+                )
+                llm_retries.inc(niveau="correcteur")
                 time.sleep(delay)
                 # Augmenter le délai exponentiellement à chaque tentative
                 delay *= 2
             elif attempt < max_retries - 1:
-                print(f"Erreur lors de l'évaluation: {e}, tentative {attempt+1}/{max_retries}")
+                journal.warning("Erreur lors de l'évaluation: %s, tentative %d/%d", e, attempt + 1, max_retries)
                 time.sleep(delay)
             else:
                 # Dernière tentative échouée, créer une évaluation par défaut
-                print(f"Erreur lors de l'évaluation après {max_retries} tentatives: {e}")
+                journal.error("Erreur lors de l'évaluation après %d tentatives: %s", max_retries, e)
                 break
     
     # Si toutes les tentatives ont échoué, retourner une évaluation par défaut
@@ -963,11 +1429,7 @@ def generer_bilan_competences(resultats_test, langue="français"):
     """Génère un bilan global des compétences à partir des résultats du test complet"""
     
     # Configuration du modèle
-    llm = ChatMistralAI(
-        model="mistral-large-latest", 
-        temperature=0.1,
-        api_key=MISTRAL_API_KEY
-    )
+    llm = obtenir_llm(temperature=0.1, etape="bilan")
     
     # Préparation des résultats pour le prompt
     # Extraction des données importantes pour éviter la sérialisation d'objets complexes
@@ -1003,7 +1465,7 @@ def generer_bilan_competences(resultats_test, langue="français"):
         # Formater les données pour le prompt
         resultats_format = str(resultats_simplifies)
     except Exception as e:
-        print(f"Erreur lors de la préparation des données pour le bilan: {e}")
+        journal.error("Erreur lors de la préparation des données pour le bilan: %s", e)
         # Créer un minimum de données en cas d'erreur
         resultats_format = f"""{{
             "erreur": "Les données n'ont pas pu être correctement analysées",
@@ -1013,12 +1475,12 @@ def generer_bilan_competences(resultats_test, langue="français"):
     # Construction du prompt pour le bilan selon la langue
     if langue == "espagnol":
         prompt_content = [
-            ("system", f"""Tu es un expert en didactique des langues spécialisé dans l'évaluation 
+            ("system", """Tu es un expert en didactique des langues spécialisé dans l'évaluation 
             des compétences linguistiques en espagnol selon le Cadre Européen Commun de Référence pour les Langues (CECRL).
             Ta mission est d'analyser les résultats d'un test complet d'espagnol et de produire un bilan détaillé en français."""),
-            ("human", f"""Voici les résultats simplifiés d'un test de compétence en espagnol:
+            ("human", """Voici les résultats simplifiés d'un test de compétence en espagnol:
             
-            {resultats_format}
+            {resultats}
             
             Analyse ces résultats et génère un bilan complet des compétences en français incluant:
             1. Une estimation du niveau global selon le CECRL (A1-C2)
@@ -1028,12 +1490,12 @@ def generer_bilan_competences(resultats_test, langue="français"):
         ]
     else:
         prompt_content = [
-            ("system", f"""Tu es un expert en didactique des langues spécialisé dans l'évaluation 
+            ("system", """Tu es un expert en didactique des langues spécialisé dans l'évaluation 
             des compétences linguistiques selon le Cadre Européen Commun de Référence pour les Langues (CECRL).
             Ta mission est d'analyser les résultats d'un test complet et de produire un bilan détaillé."""),
-            ("human", f"""Voici les résultats simplifiés d'un test de compétence en {langue}:
+            ("human", """Voici les résultats simplifiés d'un test de compétence en {langue}:
             
-            {resultats_format}
+            {resultats}
             
             Analyse ces résultats et génère un bilan complet des compétences incluant:
             1. Une estimation du niveau global selon le CECRL (A1-C2)
@@ -1046,13 +1508,10 @@ def generer_bilan_competences(resultats_test, langue="français"):
     try:
         prompt = ChatPromptTemplate.from_messages(prompt_content)
         chain = prompt | llm.with_structured_output(BilanCompetences)
-        return chain.invoke({})
+        return appel_api_limite(chain.invoke, {"resultats": resultats_format, "langue": langue})
     except Exception as e:
         # En cas d'erreur, créer un bilan par défaut avec des informations sur l'erreur
-        print(f"Erreur lors de la génération du bilan: {e}")
-        import traceback
-        trace = traceback.format_exc()
-        print(trace)
+        journal.exception("Erreur lors de la génération du bilan: %s", e)
         
         return BilanCompetences(
             niveau_global="B1",
@@ -0,0 +1,329 @@
+"""
+Registre des clients LLM partagés
+
+Les instances de modèle sont mises en cache par (fournisseur, modèle, température, étape) et s'appuient
+sur un pool de connexions HTTP keep-alive par fournisseur : la poignée de main TLS n'est payée
+qu'une fois par connexion et non plus à chaque appel du générateur ou du correcteur.
+
+Le fournisseur est choisi par configuration (LLM_FOURNISSEUR), éventuellement étape par étape
+(LLM_FOURNISSEURS_PAR_ETAPE) : "mistral" pour l'API hébergée, "openai" pour tout serveur
+compatible OpenAI (serveur d'inférence auto-hébergé, modèle local peu coûteux...) et "simule"
+pour le LLM simulé des benchmarks.
+"""
+import time
+import asyncio
+import threading
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_mistralai import ChatMistralAI
+from app.core.config import settings
+from app.core.metrics import llm_appel_duree, llm_tokens, llm_erreurs
+from app.core.journal import obtenir_journal
+from app.services.ai_modules.rate_limiter import est_erreur_rate_limit, limiteur
+
+try:
+    from langchain_openai import ChatOpenAI
+except ImportError:
+    ChatOpenAI = None
+
+journal = obtenir_journal(__name__)
+
+# Étapes du pipeline pouvant être routées vers un fournisseur ou un modèle particulier
+ETAPES = ("themes", "traduction", "generation", "validation", "analyse", "evaluation", "bilan")
+
+
+def _tokens_utilises(reponse):
+    """Tokens (prompt, complétion) d'une réponse LangChain, selon ce que le fournisseur renseigne"""
+    usage = (reponse.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0
+    # Réponses en flux : l'usage n'est porté que par le message agrégé
+    for generations in reponse.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens") or 0, usage.get("output_tokens") or 0
+    return 0, 0
+
+
+class MesureAppelsLLM(BaseCallbackHandler):
+    """Callback LangChain alimentant les métriques de durée, de tokens et d'erreurs des appels au modèle,
+    et corrigeant la réservation de tokens du limiteur avec l'usage réel"""
+
+    # Exécuté directement dans l'appelant : quelques opérations sous verrou, pas d'E/S
+    run_inline = True
+
+    def __init__(self, etape, modele):
+        self.etiquettes = {"etape": etape or "defaut", "modele": modele}
+        self._debuts = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._debuts[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._debuts[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        debut = self._debuts.pop(run_id, None)
+        if debut is not None:
+            llm_appel_duree.observer(time.perf_counter() - debut, statut="ok", **self.etiquettes)
+        tokens_prompt, tokens_completion = _tokens_utilises(response)
+        if tokens_prompt:
+            llm_tokens.inc(tokens_prompt, type="prompt", **self.etiquettes)
+        if tokens_completion:
+            llm_tokens.inc(tokens_completion, type="completion", **self.etiquettes)
+        # Usage réel connu : il remplace l'estimation réservée auprès du limiteur
+        if tokens_prompt or tokens_completion:
+            limiteur.ajuster(tokens_prompt + tokens_completion)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        debut = self._debuts.pop(run_id, None)
+        if debut is not None:
+            llm_appel_duree.observer(time.perf_counter() - debut, statut="erreur", **self.etiquettes)
+        llm_erreurs.inc(type="rate_limit" if est_erreur_rate_limit(error) else "autre", **self.etiquettes)
+
+
+class FournisseurMistral:
+    """API Mistral hébergée"""
+
+    nom = "mistral"
+
+    @property
+    def base_url(self):
+        return settings.MISTRAL_BASE_URL
+
+    @property
+    def modele_defaut(self):
+        return settings.LLM_MODELE
+
+    @property
+    def cle_api(self):
+        """Clé de l'API (MISTRAL_API_KEY, environnement ou .env), sans valeur par défaut"""
+        if not settings.MISTRAL_API_KEY:
+            raise RuntimeError(
+                f"Le fournisseur '{self.nom}' nécessite MISTRAL_API_KEY (environnement ou .env) ; "
+                "LLM_FOURNISSEUR=simule permet de travailler sans clé"
+            )
+        return settings.MISTRAL_API_KEY
+
+    def entetes(self):
+        return {
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Authorization": f"Bearer {self.cle_api}",
+        }
+
+    def transport(self, asynchrone):
+        """Transport HTTP particulier (None pour le réseau)"""
+        return None
+
+    def creer_modele(self, modele, temperature, client, client_async, callbacks):
+        return ChatMistralAI(
+            model=modele,
+            temperature=temperature,
+            api_key=self.cle_api,
+            base_url=self.base_url,
+            timeout=settings.LLM_TIMEOUT,
+            client=client,
+            async_client=client_async,
+            callbacks=callbacks,
+        )
+
+
+class FournisseurOpenAICompatible:
+    """Serveur exposant l'API chat completions d'OpenAI (vLLM, llama.cpp, Ollama, TGI...)"""
+
+    nom = "openai"
+
+    @property
+    def base_url(self):
+        return settings.OPENAI_BASE_URL
+
+    @property
+    def modele_defaut(self):
+        return settings.OPENAI_MODELE or settings.LLM_MODELE
+
+    def entetes(self):
+        return {"Authorization": f"Bearer {settings.OPENAI_API_KEY}"}
+
+    def transport(self, asynchrone):
+        """Transport HTTP particulier (None pour le réseau)"""
+        return None
+
+    def creer_modele(self, modele, temperature, client, client_async, callbacks):
+        if ChatOpenAI is None:
+            raise RuntimeError(f"Le fournisseur '{self.nom}' nécessite le paquet langchain-openai")
+        # Les retries sont gérés par le limiteur de débit global, pas par le SDK
+        return ChatOpenAI(
+            model=modele,
+            temperature=temperature,
+            api_key=settings.OPENAI_API_KEY,
+            base_url=self.base_url,
+            timeout=settings.LLM_TIMEOUT,
+            max_retries=0,
+            http_client=client,
+            http_async_client=client_async,
+            callbacks=callbacks,
+        )
+
+
+class FournisseurSimule(FournisseurOpenAICompatible):
+    """LLM simulé servi dans le processus (benchmarks, tests de charge), sans réseau ni quota"""
+
+    nom = "simule"
+
+    @property
+    def base_url(self):
+        return "http://llm-simule/v1"
+
+    def transport(self, asynchrone):
+        from app.services.ai_modules.llm_simule import simulateur_llm
+        return simulateur_llm.transport(asynchrone)
+
+
+FOURNISSEURS = {
+    fournisseur.nom: fournisseur
+    for fournisseur in (FournisseurMistral(), FournisseurOpenAICompatible(), FournisseurSimule())
+}
+
+
+def fournisseur_pour(etape=None):
+    """Retourne le fournisseur configuré pour une étape du pipeline"""
+    if etape is not None and etape not in ETAPES:
+        raise ValueError(f"Étape LLM inconnue: {etape} (étapes: {', '.join(ETAPES)})")
+    nom = settings.LLM_FOURNISSEURS_PAR_ETAPE.get(etape, settings.LLM_FOURNISSEUR) if etape else settings.LLM_FOURNISSEUR
+    if nom not in FOURNISSEURS:
+        raise ValueError(f"Fournisseur LLM inconnu: {nom} (disponibles: {', '.join(FOURNISSEURS)})")
+    return FOURNISSEURS[nom]
+
+
+class RegistreClientsLLM:
+    """Cache des modèles de chat et des clients HTTP sous-jacents, par fournisseur"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._modeles = {}
+        self._clients_http = {}
+        self._clients_http_async = {}
+
+    def _limites(self):
+        return httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNEXIONS,
+            max_keepalive_connections=settings.LLM_MAX_CONNEXIONS_KEEPALIVE,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRATION,
+        )
+
+    def client_http(self, fournisseur=None):
+        """Retourne le client HTTP synchrone partagé du fournisseur (créé à la première utilisation)"""
+        fournisseur = fournisseur or fournisseur_pour()
+        with self._verrou:
+            if fournisseur.nom not in self._clients_http:
+                self._clients_http[fournisseur.nom] = httpx.Client(
+                    base_url=fournisseur.base_url,
+                    headers=fournisseur.entetes(),
+                    timeout=settings.LLM_TIMEOUT,
+                    limits=self._limites(),
+                    transport=fournisseur.transport(asynchrone=False),
+                )
+            return self._clients_http[fournisseur.nom]
+
+    def client_http_async(self, fournisseur=None):
+        """Retourne le client HTTP asynchrone partagé du fournisseur (créé à la première utilisation)"""
+        fournisseur = fournisseur or fournisseur_pour()
+        with self._verrou:
+            if fournisseur.nom not in self._clients_http_async:
+                self._clients_http_async[fournisseur.nom] = httpx.AsyncClient(
+                    base_url=fournisseur.base_url,
+                    headers=fournisseur.entetes(),
+                    timeout=settings.LLM_TIMEOUT,
+                    limits=self._limites(),
+                    transport=fournisseur.transport(asynchrone=True),
+                )
+            return self._clients_http_async[fournisseur.nom]
+
+    def obtenir(self, temperature=0.7, modele=None, etape=None):
+        """Retourne le modèle de chat partagé pour ce quadruplet (fournisseur, modèle, température, étape)
+
+        L'étape fait partie de la clé pour étiqueter les métriques ; les instances d'une même
+        combinaison fournisseur/modèle partagent de toute façon les clients HTTP du fournisseur.
+        """
+        fournisseur = fournisseur_pour(etape)
+        modele = modele or (settings.LLM_MODELES_PAR_ETAPE.get(etape) if etape else None) or fournisseur.modele_defaut
+        cle = (fournisseur.nom, modele, round(float(temperature), 2), etape)
+        llm = self._modeles.get(cle)
+        if llm is not None:
+            return llm
+
+        client = self.client_http(fournisseur)
+        client_async = self.client_http_async(fournisseur)
+        with self._verrou:
+            if cle not in self._modeles:
+                self._modeles[cle] = fournisseur.creer_modele(
+                    modele, temperature, client, client_async, [MesureAppelsLLM(etape, modele)]
+                )
+            return self._modeles[cle]
+
+    @staticmethod
+    def _fournisseurs_utilises():
+        return sorted({settings.LLM_FOURNISSEUR, *settings.LLM_FOURNISSEURS_PAR_ETAPE.values()})
+
+    def prechauffer(self):
+        """Instancie les modèles usuels et ouvre une première connexion synchrone vers chaque fournisseur utilisé
+
+        Les modèles sont créés pour les couples (étape, température) de LLM_MODELES_PRECHAUFFES,
+        ceux que demandent les appels réels : l'étape fait partie de la clé du registre.
+        """
+        for couple in settings.LLM_MODELES_PRECHAUFFES:
+            etape, _, temperature = couple.partition(":")
+            try:
+                self.obtenir(float(temperature), etape=etape.strip() or None)
+            except ValueError:
+                journal.warning("Modèle à préchauffer invalide ignoré: %s", couple)
+
+        if settings.LLM_PRECHAUFFER_CONNEXION:
+            for nom in self._fournisseurs_utilises():
+                try:
+                    self.client_http(FOURNISSEURS[nom]).get("/models")
+                except Exception as e:
+                    journal.warning("Préchauffage de la connexion LLM impossible: %s", e, extra={"fournisseur": nom})
+
+    async def prechauffer_async(self):
+        """Ouvre une première connexion du client asynchrone de chaque fournisseur utilisé (modes async et fanout)"""
+        if not settings.LLM_PRECHAUFFER_CONNEXION:
+            return
+
+        async def _prechauffer(nom):
+            try:
+                await self.client_http_async(FOURNISSEURS[nom]).get("/models")
+            except Exception as e:
+                journal.warning("Préchauffage de la connexion LLM asynchrone impossible: %s", e, extra={"fournisseur": nom})
+
+        await asyncio.gather(*(_prechauffer(nom) for nom in self._fournisseurs_utilises()))
+
+    def fermer(self):
+        """Ferme les clients HTTP synchrones et oublie les modèles en cache
+
+        Les clients asynchrones doivent être fermés depuis la boucle d'événements via fermer_async().
+        """
+        with self._verrou:
+            for client in self._clients_http.values():
+                client.close()
+            self._clients_http.clear()
+            self._modeles.clear()
+
+    async def fermer_async(self):
+        """Ferme tous les clients HTTP partagés"""
+        clients_async = list(self._clients_http_async.values())
+        self._clients_http_async.clear()
+        for client_async in clients_async:
+            await client_async.aclose()
+        self.fermer()
+
+
+# Registre unique partagé par le générateur de contenu et le correcteur
+registre_llm = RegistreClientsLLM()
+
+
+def obtenir_llm(temperature=0.7, modele=None, etape=None):
+    """Retourne une instance partagée du modèle LLM configuré pour cette étape du pipeline"""
+    return registre_llm.obtenir(temperature, modele, etape)
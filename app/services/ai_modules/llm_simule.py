@@ -0,0 +1,401 @@
+"""
+LLM simulé compatible OpenAI pour les benchmarks et les tests de charge
+
+Le simulateur répond à /v1/chat/completions (avec ou sans stream) et /v1/models sans consommer
+de quota : exercices JSON conformes au schéma Exercice, thèmes, traductions, et sorties
+structurées (ValidationReponse, AnalyseErreur, Evaluation...) construites à partir du schéma JSON
+transmis par with_structured_output. Latence, débit de tokens, injection de 429 et de sorties
+malformées sont configurables (LLM_SIMULE_*). Les réponses sont déterministes : le tirage aléatoire
+est initialisé à partir de LLM_SIMULE_GRAINE et du corps de la requête.
+
+Deux façons de l'utiliser :
+- dans le processus, sans réseau : LLM_FOURNISSEUR=simule (transport httpx branché sur le simulateur) ;
+- comme serveur HTTP local, derrière le fournisseur "openai" :
+
+    python -m app.services.ai_modules.llm_simule 8081
+"""
+import re
+import sys
+import math
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import threading
+import httpx
+from app.core.config import settings
+
+_NIVEAUX = ("A1", "A2", "B1", "B2", "C1", "C2")
+
+_PHRASE_TEXTE = (
+    "Les transformations contemporaines de la société soulèvent des questions nouvelles "
+    "auxquelles les chercheurs tentent de répondre par des approches pluridisciplinaires. "
+)
+
+
+class _ReponseSimulee:
+    """Réponse préparée : statut, corps JSON ou morceaux SSE, et délais à respecter"""
+
+    def __init__(self, statut, charge=None, flux=None, attente_initiale=0.0, attente_par_morceau=0.0):
+        self.statut = statut
+        self.charge = charge
+        self.flux = flux
+        self.attente_initiale = attente_initiale
+        self.attente_par_morceau = attente_par_morceau
+
+
+class SimulateurLLM:
+    """Backend chat completions simulé et déterministe"""
+
+    def __init__(self, latence_ms, ecart_ms, distribution, tokens_par_seconde, taux_429, taux_malforme, graine):
+        self.latence_ms = latence_ms
+        self.ecart_ms = ecart_ms
+        self.distribution = distribution
+        self.tokens_par_seconde = tokens_par_seconde
+        self.taux_429 = taux_429
+        self.taux_malforme = taux_malforme
+        self.graine = graine
+        self._verrou = threading.Lock()
+        self._nb_requetes = 0
+        self._nb_429 = 0
+        self._nb_malformes = 0
+        self._nb_tokens = 0
+
+    @classmethod
+    def depuis_settings(cls):
+        return cls(
+            latence_ms=settings.LLM_SIMULE_LATENCE_MS,
+            ecart_ms=settings.LLM_SIMULE_ECART_MS,
+            distribution=settings.LLM_SIMULE_DISTRIBUTION,
+            tokens_par_seconde=settings.LLM_SIMULE_TOKENS_PAR_SECONDE,
+            taux_429=settings.LLM_SIMULE_TAUX_429,
+            taux_malforme=settings.LLM_SIMULE_TAUX_MALFORME,
+            graine=settings.LLM_SIMULE_GRAINE,
+        )
+
+    # Tirages
+
+    def _aleatoire(self, corps_brut):
+        empreinte = hashlib.sha256(f"{self.graine}\n".encode("utf-8") + corps_brut).digest()
+        return random.Random(int.from_bytes(empreinte[:8], "big"))
+
+    def _latence(self, rng):
+        """Latence avant le premier token, en secondes, selon la distribution configurée"""
+        moyenne = self.latence_ms / 1000.0
+        ecart = self.ecart_ms / 1000.0
+        if self.distribution == "constante" or moyenne <= 0:
+            return max(0.0, moyenne)
+        if self.distribution == "exponentielle":
+            return rng.expovariate(1.0 / moyenne)
+        if self.distribution == "normale":
+            return max(0.0, rng.gauss(moyenne, ecart))
+        # Lognormale de moyenne et d'écart-type donnés (queue de distribution réaliste)
+        sigma2 = math.log(1.0 + (ecart / moyenne) ** 2)
+        return rng.lognormvariate(math.log(moyenne) - sigma2 / 2, math.sqrt(sigma2))
+
+    def _duree_tokens(self, nb_tokens):
+        return nb_tokens / self.tokens_par_seconde if self.tokens_par_seconde > 0 else 0.0
+
+    # Contenus
+
+    def _instance(self, schema, definitions, rng, nom=""):
+        """Construit une instance valide d'un schéma JSON (sous-ensemble utilisé par pydantic)"""
+        if "$ref" in schema:
+            return self._instance(definitions[schema["$ref"].split("/")[-1]], definitions, rng, nom)
+        for cle in ("anyOf", "oneOf"):
+            if cle in schema:
+                options = [option for option in schema[cle] if option.get("type") != "null"] or schema[cle]
+                return self._instance(options[0], definitions, rng, nom)
+        if "allOf" in schema:
+            return self._instance(schema["allOf"][0], definitions, rng, nom)
+        if "const" in schema:
+            return schema["const"]
+        if "enum" in schema:
+            return rng.choice(schema["enum"])
+
+        type_schema = schema.get("type", "object" if "properties" in schema else "string")
+        if isinstance(type_schema, list):
+            type_schema = next((t for t in type_schema if t != "null"), "null")
+
+        if type_schema == "object":
+            return {
+                champ: self._instance(sous_schema, definitions, rng, champ)
+                for champ, sous_schema in schema.get("properties", {}).items()
+            }
+        if type_schema == "array":
+            nombre = max(schema.get("minItems", 1), min(schema.get("maxItems", 3), rng.randint(1, 3)))
+            return [self._instance(schema.get("items", {}), definitions, rng, nom) for _ in range(nombre)]
+        if type_schema == "boolean":
+            return rng.random() < 0.5
+        if type_schema == "integer":
+            return rng.randint(int(schema.get("minimum", 0)), int(schema.get("maximum", 10)))
+        if type_schema == "number":
+            return round(rng.uniform(float(schema.get("minimum", 0.0)), float(schema.get("maximum", 1.0))), 2)
+        if type_schema == "null":
+            return None
+        return f"{nom or 'valeur'} simulée {rng.randint(1, 999)}"
+
+    def _exercices(self, section, nombre, niveau, rng):
+        """Exercices conformes au schéma Exercice pour une section"""
+        exercices = []
+        for numero in range(1, nombre + 1):
+            elements = []
+            for id_element in range(1, 4):
+                correcte = rng.choice("ABCD")
+                elements.append({
+                    "id": id_element,
+                    "texte": f"Question simulée {id_element} de l'exercice {numero} ({section}) ?",
+                    "type": "QCM",
+                    "options": [
+                        {"id": lettre, "texte": f"Option {lettre}", "est_correcte": lettre == correcte}
+                        for lettre in "ABCD"
+                    ],
+                    "reponse_correcte": correcte,
+                })
+            texte = _PHRASE_TEXTE * rng.randint(10, 16) if section == "comprehension_ecrite" else ""
+            exercices.append({
+                "consigne": f"Consigne simulée de l'exercice {numero}.",
+                "niveau_cible": niveau,
+                "competence": f"Compétence simulée ({section})",
+                "contenu": {"texte_principal": texte.strip(), "elements": elements},
+            })
+        return exercices
+
+    def _texte(self, prompt, rng):
+        """Réponse libre : exercices JSON, liste de thèmes ou traduction selon le prompt reçu"""
+        sections = (
+            ("compréhension écrite", "comprehension_ecrite"),
+            ("exercices de grammaire", "grammaire"),
+            ("exercices de vocabulaire", "vocabulaire"),
+        )
+        for marqueur, section in sections:
+            if marqueur in prompt and "EXACTEMENT" in prompt:
+                nombre = int(re.search(r"EXACTEMENT (\d+)", prompt).group(1))
+                if "GÉNÉRATION PARTIELLE" in prompt:
+                    nombre = 1
+                niveau = re.search(r"de niveau (A1|A2|B1|B2|C1|C2)", prompt)
+                exercices = self._exercices(section, nombre, niveau.group(1) if niveau else rng.choice(_NIVEAUX), rng)
+                return "```json\n" + json.dumps(exercices, ensure_ascii=False, indent=2) + "\n```"
+
+        if "un par ligne" in prompt:
+            nombre = re.search(r"Génère (\d+)", prompt)
+            nombre = int(nombre.group(1)) if nombre else 3
+            return "\n".join(f"Thème simulé {rng.randint(1, 10 ** 6)}" for _ in range(nombre))
+
+        return f"[traduction simulée] {prompt[-200:].strip()}"
+
+    def _corrompre(self, texte, rng):
+        """Tronque la sortie pour simuler une réponse coupée ou malformée"""
+        return texte[:max(1, int(len(texte) * rng.uniform(0.5, 0.9)))]
+
+    # Requêtes
+
+    def _prompt(self, corps):
+        morceaux = []
+        for message in corps.get("messages", []):
+            contenu = message.get("content") or ""
+            if isinstance(contenu, list):
+                contenu = "\n".join(partie.get("text", "") for partie in contenu if isinstance(partie, dict))
+            morceaux.append(contenu)
+        return "\n".join(morceaux)
+
+    def _schema_structure(self, corps):
+        """Retourne (mode, nom, schéma) si la requête attend une sortie structurée, sinon None"""
+        outils = corps.get("tools")
+        if outils:
+            fonction = outils[0].get("function", {})
+            return "outil", fonction.get("name", "sortie"), fonction.get("parameters", {})
+        format_reponse = corps.get("response_format") or {}
+        if format_reponse.get("type") == "json_schema":
+            schema_json = format_reponse.get("json_schema", {})
+            return "json", schema_json.get("name", "sortie"), schema_json.get("schema", {})
+        if format_reponse.get("type") == "json_object":
+            return "json", "sortie", {"type": "object", "properties": {}}
+        return None
+
+    def preparer(self, corps_brut):
+        """Prépare la réponse à un appel /chat/completions"""
+        rng = self._aleatoire(corps_brut)
+        with self._verrou:
+            self._nb_requetes += 1
+
+        if rng.random() < self.taux_429:
+            with self._verrou:
+                self._nb_429 += 1
+            return _ReponseSimulee(429, {
+                "error": {"message": "Rate limit exceeded (simulé)", "type": "rate_limit_error", "code": "429"}
+            }, attente_initiale=min(self._latence(rng), 0.05))
+
+        corps = json.loads(corps_brut or b"{}")
+        modele = corps.get("model", "simule")
+        prompt = self._prompt(corps)
+        malforme = rng.random() < self.taux_malforme
+
+        structure = self._schema_structure(corps)
+        appel_outil = None
+        if structure is not None:
+            mode, nom, schema = structure
+            contenu = json.dumps(self._instance(schema, schema.get("$defs", {}), rng, nom), ensure_ascii=False)
+            if malforme:
+                contenu = self._corrompre(contenu, rng)
+            if mode == "outil":
+                appel_outil = {
+                    "id": f"call_{uuid.UUID(int=rng.getrandbits(128)).hex[:24]}",
+                    "type": "function",
+                    "function": {"name": nom, "arguments": contenu},
+                }
+                contenu = None
+        else:
+            contenu = self._texte(prompt, rng)
+            if malforme:
+                contenu = self._corrompre(contenu, rng)
+
+        if malforme:
+            with self._verrou:
+                self._nb_malformes += 1
+
+        tokens_prompt = len(prompt) // 4
+        tokens_sortie = max(1, len(contenu or appel_outil["function"]["arguments"]) // 4)
+        with self._verrou:
+            self._nb_tokens += tokens_prompt + tokens_sortie
+        usage = {
+            "prompt_tokens": tokens_prompt,
+            "completion_tokens": tokens_sortie,
+            "total_tokens": tokens_prompt + tokens_sortie,
+        }
+        identifiant = f"chatcmpl-sim-{uuid.UUID(int=rng.getrandbits(128)).hex}"
+        latence = self._latence(rng)
+
+        if corps.get("stream"):
+            return self._reponse_flux(identifiant, modele, contenu, appel_outil, usage, latence)
+
+        message = {"role": "assistant", "content": contenu}
+        if appel_outil is not None:
+            message["tool_calls"] = [appel_outil]
+        return _ReponseSimulee(200, {
+            "id": identifiant,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": modele,
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if appel_outil is not None else "stop",
+            }],
+            "usage": usage,
+        }, attente_initiale=latence + self._duree_tokens(tokens_sortie))
+
+    def _reponse_flux(self, identifiant, modele, contenu, appel_outil, usage, latence):
+        """Découpe la réponse en événements SSE chat.completion.chunk (environ 4 tokens par morceau)"""
+        def evenement(delta, fin=None, avec_usage=False):
+            charge = {
+                "id": identifiant,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": modele,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": fin}],
+            }
+            if avec_usage:
+                charge["usage"] = usage
+            return f"data: {json.dumps(charge, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        morceaux = [evenement({"role": "assistant", "content": ""})]
+        if appel_outil is not None:
+            morceaux.append(evenement({"tool_calls": [{"index": 0, **appel_outil}]}))
+        else:
+            morceaux.extend(evenement({"content": contenu[i:i + 16]}) for i in range(0, len(contenu), 16))
+        morceaux.append(evenement({}, "tool_calls" if appel_outil is not None else "stop", avec_usage=True))
+        morceaux.append(b"data: [DONE]\n\n")
+        return _ReponseSimulee(200, flux=morceaux, attente_initiale=latence, attente_par_morceau=self._duree_tokens(4))
+
+    def modeles(self):
+        return {"object": "list", "data": [{"id": settings.OPENAI_MODELE or settings.LLM_MODELE, "object": "model", "owned_by": "simule"}]}
+
+    def statistiques(self):
+        with self._verrou:
+            return {
+                "nb_requetes": self._nb_requetes,
+                "nb_429": self._nb_429,
+                "nb_malformes": self._nb_malformes,
+                "nb_tokens": self._nb_tokens,
+            }
+
+    # Transports httpx (utilisés par le fournisseur "simule")
+
+    def _aiguiller(self, requete, corps_brut):
+        if requete.method == "GET" and requete.url.path.endswith("/models"):
+            return _ReponseSimulee(200, self.modeles())
+        if requete.method == "POST" and requete.url.path.endswith("/chat/completions"):
+            return self.preparer(corps_brut)
+        return _ReponseSimulee(404, {"error": {"message": f"Route simulée inconnue: {requete.url.path}"}})
+
+    def _gerer(self, requete):
+        reponse = self._aiguiller(requete, requete.read())
+        time.sleep(reponse.attente_initiale)
+        if reponse.flux is None:
+            return httpx.Response(reponse.statut, json=reponse.charge)
+
+        def flux():
+            for morceau in reponse.flux:
+                time.sleep(reponse.attente_par_morceau)
+                yield morceau
+        return httpx.Response(reponse.statut, headers={"content-type": "text/event-stream"}, content=flux())
+
+    async def _gerer_async(self, requete):
+        reponse = self._aiguiller(requete, await requete.aread())
+        await asyncio.sleep(reponse.attente_initiale)
+        if reponse.flux is None:
+            return httpx.Response(reponse.statut, json=reponse.charge)
+
+        async def flux():
+            for morceau in reponse.flux:
+                await asyncio.sleep(reponse.attente_par_morceau)
+                yield morceau
+        return httpx.Response(reponse.statut, headers={"content-type": "text/event-stream"}, content=flux())
+
+    def transport(self, asynchrone=False):
+        """Transport httpx qui sert les requêtes directement depuis le simulateur, sans réseau"""
+        return httpx.MockTransport(self._gerer_async if asynchrone else self._gerer)
+
+
+# Simulateur unique du processus
+simulateur_llm = SimulateurLLM.depuis_settings()
+
+
+def creer_application(simulateur=None):
+    """Application FastAPI exposant le simulateur comme un serveur compatible OpenAI"""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    simulateur = simulateur or simulateur_llm
+    application = FastAPI(title="LLM simulé")
+
+    @application.get("/v1/models")
+    async def lister_modeles():
+        return simulateur.modeles()
+
+    @application.post("/v1/chat/completions")
+    async def completer(request: Request):
+        reponse = simulateur.preparer(await request.body())
+        await asyncio.sleep(reponse.attente_initiale)
+        if reponse.flux is None:
+            return JSONResponse(reponse.charge, status_code=reponse.statut)
+
+        async def flux():
+            for morceau in reponse.flux:
+                await asyncio.sleep(reponse.attente_par_morceau)
+                yield morceau
+        return StreamingResponse(flux(), media_type="text/event-stream")
+
+    @application.get("/statistiques")
+    async def lire_statistiques():
+        return simulateur.statistiques()
+
+    return application
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(creer_application(), host="127.0.0.1", port=int(sys.argv[1]) if len(sys.argv) > 1 else 8081)
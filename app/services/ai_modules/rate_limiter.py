@@ -0,0 +1,168 @@
+"""
+Limiteur de débit global pour les appels LLM
+
+Un seul limiteur par processus, partagé par le générateur de contenu et le correcteur.
+Il repose sur deux seaux à jetons (requêtes/minute et tokens/minute) et ne fait attendre
+un appel que lorsque le budget est réellement épuisé. Chaque appel réserve une estimation
+(LLM_TOKENS_ESTIMES_PAR_APPEL), remplacée par la consommation réelle dès que le fournisseur
+la renvoie (ajuster, appelé par le callback de mesure des appels).
+"""
+import time
+import asyncio
+import threading
+import contextvars
+from app.core.config import settings
+from app.core.metrics import limiteur_attente
+
+
+# Tokens réservés par le dernier acquerir du contexte courant (thread ou tâche), en attente de l'usage réel
+_reservation: contextvars.ContextVar = contextvars.ContextVar("reservation_tokens", default=0)
+
+
+def est_erreur_rate_limit(erreur):
+    """Indique si une exception correspond à un dépassement de quota (HTTP 429)"""
+    message = str(erreur).lower()
+    return "429" in message or "rate limit" in message
+
+
+class LimiteurDebit:
+    """Double seau à jetons (requêtes et tokens) utilisable depuis du code synchrone ou asynchrone
+
+    Chaque appel réserve immédiatement sa part du budget, quitte à rendre un seau négatif :
+    l'attente renvoyée correspond au temps nécessaire pour que la dette soit rechargée.
+    Les appelants sont ainsi servis dans leur ordre d'arrivée sans verrou tenu pendant l'attente.
+    """
+
+    def __init__(self, requetes_par_minute, tokens_par_minute, rafale_requetes, pause_rate_limit):
+        self.requetes_par_minute = requetes_par_minute
+        self.tokens_par_minute = tokens_par_minute
+        self.rafale_requetes = rafale_requetes
+        self.pause_rate_limit = pause_rate_limit
+
+        self._verrou = threading.Lock()
+        self._requetes = float(rafale_requetes)
+        self._tokens = float(tokens_par_minute)
+        self._derniere_recharge = time.monotonic()
+        self._pause_jusqu_a = 0.0
+
+        # Statistiques exposées par etat()
+        self._nb_appels = 0
+        self._nb_attentes = 0
+        self._attente_totale = 0.0
+        self._nb_rate_limits = 0
+        self._nb_ajustements = 0
+        self._ecart_tokens = 0
+
+    def _recharger(self, maintenant):
+        """Recharge les deux seaux en fonction du temps écoulé (appelé sous verrou)"""
+        ecoule = maintenant - self._derniere_recharge
+        self._derniere_recharge = maintenant
+        self._requetes = min(float(self.rafale_requetes), self._requetes + ecoule * self.requetes_par_minute / 60.0)
+        self._tokens = min(float(self.tokens_par_minute), self._tokens + ecoule * self.tokens_par_minute / 60.0)
+
+    def _reserver(self, tokens):
+        """Réserve une requête et `tokens` tokens, et retourne le temps d'attente nécessaire en secondes"""
+        with self._verrou:
+            maintenant = time.monotonic()
+            self._recharger(maintenant)
+            self._requetes -= 1
+            self._tokens -= tokens
+
+            attente = 0.0
+            if self._requetes < 0:
+                attente = max(attente, -self._requetes * 60.0 / self.requetes_par_minute)
+            if self._tokens < 0:
+                attente = max(attente, -self._tokens * 60.0 / self.tokens_par_minute)
+            attente = max(attente, self._pause_jusqu_a - maintenant)
+
+            self._nb_appels += 1
+            if attente > 0:
+                self._nb_attentes += 1
+                self._attente_totale += attente
+            return attente
+
+    def acquerir(self, tokens=None):
+        """Bloque le thread courant jusqu'à ce que le budget permette un appel"""
+        tokens = tokens if tokens is not None else settings.LLM_TOKENS_ESTIMES_PAR_APPEL
+        _reservation.set(tokens)
+        attente = self._reserver(tokens)
+        limiteur_attente.observer(attente)
+        if attente > 0:
+            time.sleep(attente)
+        return attente
+
+    async def acquerir_async(self, tokens=None):
+        """Version asynchrone de acquerir : l'attente ne bloque pas la boucle d'événements"""
+        tokens = tokens if tokens is not None else settings.LLM_TOKENS_ESTIMES_PAR_APPEL
+        _reservation.set(tokens)
+        attente = self._reserver(tokens)
+        limiteur_attente.observer(attente)
+        if attente > 0:
+            await asyncio.sleep(attente)
+        return attente
+
+    def ajuster(self, tokens_reels):
+        """Remplace l'estimation réservée par le dernier acquerir du contexte courant par la consommation réelle
+
+        L'écart est rendu au seau de tokens (estimation trop haute) ou prélevé en plus (trop basse) ;
+        un appel passé hors du limiteur est ainsi tout de même décompté.
+        """
+        reserves = _reservation.get()
+        _reservation.set(0)
+        ecart = reserves - tokens_reels
+        if ecart == 0:
+            return
+        with self._verrou:
+            self._recharger(time.monotonic())
+            self._tokens = min(float(self.tokens_par_minute), self._tokens + ecart)
+            self._nb_ajustements += 1
+            self._ecart_tokens += ecart
+
+    def a_de_la_marge(self, fraction):
+        """Indique si au moins `fraction` de chaque seau est disponible et qu'aucune pause n'est en cours"""
+        with self._verrou:
+            maintenant = time.monotonic()
+            self._recharger(maintenant)
+            return (
+                self._pause_jusqu_a <= maintenant
+                and self._requetes >= fraction * self.rafale_requetes
+                and self._tokens >= fraction * self.tokens_par_minute
+            )
+
+    def signaler_rate_limit(self):
+        """Prend acte d'un 429 du fournisseur : vide le seau de requêtes et suspend les appels"""
+        with self._verrou:
+            maintenant = time.monotonic()
+            self._recharger(maintenant)
+            self._requetes = min(self._requetes, 0.0)
+            self._pause_jusqu_a = max(self._pause_jusqu_a, maintenant + self.pause_rate_limit)
+            self._nb_rate_limits += 1
+
+    def etat(self):
+        """Retourne un instantané de l'état du limiteur"""
+        with self._verrou:
+            maintenant = time.monotonic()
+            self._recharger(maintenant)
+            return {
+                "requetes_par_minute": self.requetes_par_minute,
+                "tokens_par_minute": self.tokens_par_minute,
+                "rafale_requetes": self.rafale_requetes,
+                "requetes_disponibles": round(self._requetes, 2),
+                "tokens_disponibles": round(self._tokens, 2),
+                "pause_restante_s": round(max(0.0, self._pause_jusqu_a - maintenant), 3),
+                "nb_appels": self._nb_appels,
+                "nb_attentes": self._nb_attentes,
+                "attente_totale_s": round(self._attente_totale, 3),
+                "nb_rate_limits": self._nb_rate_limits,
+                "nb_ajustements": self._nb_ajustements,
+                "ecart_tokens_total": self._ecart_tokens,
+            }
+
+
+# Instance unique partagée par tout le processus
+limiteur = LimiteurDebit(
+    requetes_par_minute=settings.LLM_REQUETES_PAR_MINUTE,
+    tokens_par_minute=settings.LLM_TOKENS_PAR_MINUTE,
+    rafale_requetes=settings.LLM_RAFALE_REQUETES,
+    pause_rate_limit=settings.LLM_PAUSE_RATE_LIMIT,
+)
@@ -0,0 +1,81 @@
+"""
+Cache des verdicts du correcteur
+
+Les ValidationReponse et AnalyseErreur produites par le modèle sont conservées sous une
+empreinte de (élément, texte de l'exercice, réponse normalisée, langue) : une réponse déjà
+jugée pour la même question n'est plus renvoyée au modèle. LRU en mémoire borné en nombre
+d'entrées, partagé par les deux espaces (validation et analyse).
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from app.core.config import settings
+
+ESPACES_VERDICTS = ("validation", "analyse")
+
+
+class CacheVerdicts:
+    """LRU thread-safe des verdicts, avec compteurs de hits/misses par espace"""
+
+    def __init__(self, taille_max):
+        self.taille_max = taille_max
+        self._verrou = threading.Lock()
+        self._memoire = OrderedDict()
+        self._hits = dict.fromkeys(ESPACES_VERDICTS, 0)
+        self._misses = dict.fromkeys(ESPACES_VERDICTS, 0)
+
+    @staticmethod
+    def cle(espace, *parties):
+        """Construit la clé d'un verdict : espace suivi de l'empreinte SHA-256 des parties déjà normalisées"""
+        empreinte = hashlib.sha256("\x1f".join(str(partie) for partie in parties).encode("utf-8")).hexdigest()
+        return f"{espace}:{empreinte}"
+
+    @staticmethod
+    def _espace(cle):
+        return cle.split(":", 1)[0]
+
+    def obtenir(self, cle):
+        """Retourne le verdict en cache, ou None s'il est absent"""
+        with self._verrou:
+            verdict = self._memoire.get(cle)
+            if verdict is None:
+                self._misses[self._espace(cle)] += 1
+                return None
+            self._memoire.move_to_end(cle)
+            self._hits[self._espace(cle)] += 1
+            return verdict
+
+    def contient(self, cle):
+        """Indique si un verdict est en cache, sans compter de hit ni de miss"""
+        with self._verrou:
+            return cle in self._memoire
+
+    def enregistrer(self, cle, verdict):
+        """Met un verdict en cache et évince les plus anciens au-delà de taille_max"""
+        with self._verrou:
+            self._memoire[cle] = verdict
+            self._memoire.move_to_end(cle)
+            while len(self._memoire) > self.taille_max:
+                self._memoire.popitem(last=False)
+
+    def vider(self):
+        """Vide entièrement le cache"""
+        with self._verrou:
+            self._memoire.clear()
+
+    def statistiques(self):
+        """Retourne l'occupation du cache et les compteurs de hits/misses par espace"""
+        with self._verrou:
+            statistiques = {"entrees_memoire": len(self._memoire), "taille_max": self.taille_max}
+            for espace in ESPACES_VERDICTS:
+                total = self._hits[espace] + self._misses[espace]
+                statistiques[espace] = {
+                    "hits": self._hits[espace],
+                    "misses": self._misses[espace],
+                    "taux_hit": round(self._hits[espace] / total, 4) if total else 0.0,
+                }
+            return statistiques
+
+
+# Cache unique du processus
+cache_verdicts = CacheVerdicts(taille_max=settings.CORRECTEUR_CACHE_TAILLE_MAX)
@@ -0,0 +1,91 @@
+"""
+Service de correction des tests de langue complets
+
+Tous les exercices du test sont évalués simultanément (evaluer_reponse_async), puis le bilan
+des compétences est produit une seule fois à partir des évaluations. Le nombre d'exercices
+en cours d'évaluation est borné pour tout le processus ; les appels au modèle restent soumis
+au limiteur de débit global.
+"""
+import asyncio
+import time
+from typing import Any, Dict, List
+from app.core.config import settings
+from app.core.journal import obtenir_journal, contexte_journal
+from app.services.job_service import file_jobs
+from app.services.language_test_service import SECTIONS_TEST
+from app.services.ai_modules.corrector_ai import evaluer_reponse_async, generer_bilan_competences
+from app.schemas.correction import CorrectionTestRequest, CorrectionTestResponse, CorrectionExerciceResponse
+
+journal = obtenir_journal(__name__)
+
+# Type des jobs de correction traités par la file de jobs
+TYPE_JOB_CORRECTION = "correction_test"
+
+# Exercices évalués simultanément, toutes corrections confondues
+_exercices_simultanes = asyncio.Semaphore(settings.CORRECTEUR_EXERCICES_SIMULTANES)
+
+def _texte_reponses(reponses: Dict[int, str]) -> str:
+    """Met les réponses d'un exercice au format attendu par le correcteur ("Question N: réponse")"""
+    return "\n".join(
+        f"Question {id_element}: {' '.join(str(reponse).split())}"
+        for id_element, reponse in sorted(reponses.items())
+    )
+
+async def _corriger_exercice(section: str, index: int, exercice: Dict[str, Any], reponses: Dict[int, str], langue: str):
+    async with _exercices_simultanes:
+        evaluation = await evaluer_reponse_async(exercice, _texte_reponses(reponses), langue)
+    return CorrectionExerciceResponse(section=section, index=index, evaluation=evaluation)
+
+async def corriger_test(request: CorrectionTestRequest, signaler_progression=None) -> CorrectionTestResponse:
+    """
+    Évalue tous les exercices de toutes les sections en parallèle puis génère le bilan des compétences
+    
+    Args:
+        request: Test soumis et réponses de l'apprenant
+        signaler_progression: Coroutine optionnelle recevant l'avancement (exercices corrigés / total)
+        
+    Returns:
+        Les évaluations par exercice, dans l'ordre du test, et le bilan
+    """
+    with contexte_journal(test_id=request.test_id):
+        debut = time.perf_counter()
+        taches = []
+        for section in SECTIONS_TEST:
+            reponses_section = request.reponses.get(section, [])
+            for index, exercice in enumerate(getattr(request.test, section) or []):
+                reponses = reponses_section[index] if index < len(reponses_section) else {}
+                taches.append(asyncio.ensure_future(_corriger_exercice(
+                    section, index, exercice.model_dump(mode="json"), reponses, request.langue
+                )))
+        
+        journal.info("Correction d'un test", extra={"langue": request.langue, "nb_exercices": len(taches)})
+        try:
+            # Une erreur (exercice ou suivi d'avancement) annule les évaluations encore en cours
+            if signaler_progression is not None:
+                await signaler_progression({"exercices_corriges": 0, "exercices_total": len(taches)})
+                for nb_corriges, tache in enumerate(asyncio.as_completed(taches), start=1):
+                    await tache
+                    await signaler_progression({"exercices_corriges": nb_corriges})
+            exercices: List[CorrectionExerciceResponse] = list(await asyncio.gather(*taches))
+        finally:
+            for tache in taches:
+                tache.cancel()
+        
+        # Bilan unique, à partir des évaluations regroupées par section
+        resultats_test = {section: [] for section in SECTIONS_TEST}
+        for exercice in exercices:
+            resultats_test[exercice.section].append({"evaluation": exercice.evaluation.model_dump(mode="json")})
+        bilan = await asyncio.to_thread(generer_bilan_competences, resultats_test, request.langue)
+        
+        journal.info(
+            "Test corrigé", extra={"nb_exercices": len(exercices), "duree_ms": round((time.perf_counter() - debut) * 1000)}
+        )
+        return CorrectionTestResponse(test_id=request.test_id, langue=request.langue, exercices=exercices, bilan=bilan)
+
+async def executer_job_correction(parametres: Dict[str, Any], signaler_progression) -> Dict[str, Any]:
+    """Traitement d'un job de correction : corrige le test en publiant le nombre d'exercices corrigés"""
+    request = CorrectionTestRequest(**parametres)
+    response = await corriger_test(request, signaler_progression)
+    return response.model_dump(mode="json")
+
+file_jobs.enregistrer_traitement(TYPE_JOB_CORRECTION, executer_job_correction)
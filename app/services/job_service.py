@@ -0,0 +1,239 @@
+"""
+File de jobs exécutés en arrière-plan
+
+Un job est persisté dans la table jobs dès sa soumission, puis traité par un nombre borné
+de workers asyncio : les pics de soumissions sont absorbés par la file au lieu d'ouvrir autant
+de générations simultanées. Chaque type de job est associé à une coroutine de traitement
+(enregistrer_traitement) ; les échecs sont retentés avec un délai croissant sans que le client
+ait à resoumettre. Les jobs non terminés au démarrage sont remis en file.
+"""
+import json
+import uuid
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.core.config import settings
+from app.core.journal import obtenir_journal, contexte_journal
+from app.db.session import SessionLocal
+from app.models.job import Job
+from app.schemas.job import StatutJob
+
+journal = obtenir_journal(__name__)
+
+# Coroutine de traitement : (paramètres, signaler_progression) -> résultat sérialisable en JSON
+SignalerProgression = Callable[[Dict[str, Any]], Awaitable[None]]
+Traitement = Callable[[Dict[str, Any], SignalerProgression], Awaitable[Any]]
+
+
+class FileJobsPleine(Exception):
+    """La file de jobs a atteint sa capacité maximale"""
+
+
+def _job_vers_dict(job: Job) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "type": job.type,
+        "statut": job.statut,
+        "parametres": json.loads(job.parametres),
+        "progression": json.loads(job.progression or "{}"),
+        "tentatives": job.tentatives,
+        "erreur": job.erreur,
+        "resultat": json.loads(job.resultat) if job.resultat else None,
+        "cree_le": job.cree_le,
+        "mis_a_jour_le": job.mis_a_jour_le,
+    }
+
+
+class FileJobs:
+    """File de jobs persistés traitée par un pool borné de workers asyncio"""
+
+    def __init__(self, nb_workers: int, taille_max: int, max_tentatives: int, delai_retry: float):
+        self.nb_workers = nb_workers
+        self.taille_max = taille_max
+        self.max_tentatives = max_tentatives
+        self.delai_retry = delai_retry
+        self._traitements: Dict[str, Traitement] = {}
+        self._file: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._nb_en_cours = 0
+        self._nb_termines = 0
+        self._nb_echecs = 0
+
+    def enregistrer_traitement(self, type_job: str, traitement: Traitement) -> None:
+        """Associe une coroutine de traitement à un type de job"""
+        self._traitements[type_job] = traitement
+
+    # Accès à la base, exécutés hors de la boucle d'événements via asyncio.to_thread
+
+    def _creer(self, type_job: str, parametres: Dict[str, Any]) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            job = Job(
+                id=str(uuid.uuid4()),
+                type=type_job,
+                statut=StatutJob.EN_ATTENTE.value,
+                parametres=json.dumps(parametres, ensure_ascii=False),
+                progression="{}",
+                tentatives=0,
+            )
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            return _job_vers_dict(job)
+        finally:
+            db.close()
+
+    def _lire(self, job_id: str) -> Optional[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            return _job_vers_dict(job) if job is not None else None
+        finally:
+            db.close()
+
+    def _mettre_a_jour(self, job_id: str, **champs: Any) -> None:
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            if job is None:
+                return
+            for champ, valeur in champs.items():
+                if champ in ("progression", "resultat") and valeur is not None:
+                    valeur = json.dumps(valeur, ensure_ascii=False)
+                setattr(job, champ, valeur)
+            db.commit()
+        finally:
+            db.close()
+
+    def _non_termines(self) -> List[str]:
+        db = SessionLocal()
+        try:
+            jobs = (
+                db.query(Job)
+                .filter(Job.statut.in_([StatutJob.EN_ATTENTE.value, StatutJob.EN_COURS.value]))
+                .order_by(Job.cree_le)
+                .all()
+            )
+            return [job.id for job in jobs]
+        finally:
+            db.close()
+
+    async def soumettre(self, type_job: str, parametres: Dict[str, Any]) -> Dict[str, Any]:
+        """Persiste un job et le place en file ; retourne son état initial"""
+        if type_job not in self._traitements:
+            raise ValueError(f"Type de job inconnu: {type_job}")
+        if self._file is None:
+            raise RuntimeError("La file de jobs n'est pas démarrée")
+        if self._file.qsize() >= self.taille_max:
+            raise FileJobsPleine(f"File de jobs pleine ({self.taille_max} jobs en attente)")
+
+        job = await asyncio.to_thread(self._creer, type_job, parametres)
+        self._file.put_nowait(job["id"])
+        return job
+
+    async def obtenir(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Retourne l'état persisté d'un job, ou None s'il n'existe pas"""
+        return await asyncio.to_thread(self._lire, job_id)
+
+    async def _executer(self, job_id: str) -> None:
+        job = await asyncio.to_thread(self._lire, job_id)
+        if job is None or job["statut"] in (StatutJob.TERMINE.value, StatutJob.ECHEC.value):
+            return
+
+        traitement = self._traitements.get(job["type"])
+        if traitement is None:
+            await asyncio.to_thread(
+                self._mettre_a_jour, job_id, statut=StatutJob.ECHEC.value, erreur=f"Type de job inconnu: {job['type']}"
+            )
+            return
+
+        progression = dict(job["progression"])
+
+        async def signaler_progression(avancement: Dict[str, Any]) -> None:
+            progression.update(avancement)
+            await asyncio.to_thread(self._mettre_a_jour, job_id, progression=progression)
+
+        tentative = job["tentatives"]
+        erreur = job["erreur"]
+        while tentative < self.max_tentatives:
+            tentative += 1
+            await asyncio.to_thread(
+                self._mettre_a_jour, job_id, statut=StatutJob.EN_COURS.value, tentatives=tentative
+            )
+            try:
+                resultat = await traitement(job["parametres"], signaler_progression)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                erreur = str(e)
+                journal.warning(
+                    "Échec de la tentative %d/%d du job: %s", tentative, self.max_tentatives, erreur,
+                    extra={"type_job": job["type"]}
+                )
+                if tentative < self.max_tentatives:
+                    await asyncio.to_thread(
+                        self._mettre_a_jour, job_id, statut=StatutJob.EN_ATTENTE.value, erreur=erreur
+                    )
+                    await asyncio.sleep(self.delai_retry * 2 ** (tentative - 1))
+                continue
+
+            await asyncio.to_thread(
+                self._mettre_a_jour, job_id, statut=StatutJob.TERMINE.value, resultat=resultat, erreur=None
+            )
+            self._nb_termines += 1
+            return
+
+        await asyncio.to_thread(self._mettre_a_jour, job_id, statut=StatutJob.ECHEC.value, erreur=erreur)
+        self._nb_echecs += 1
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._file.get()
+            self._nb_en_cours += 1
+            try:
+                with contexte_journal(job_id=job_id):
+                    await self._executer(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                journal.exception("Erreur inattendue du worker pour le job %s: %s", job_id, e)
+            finally:
+                self._nb_en_cours -= 1
+                self._file.task_done()
+
+    def etat(self) -> Dict[str, Any]:
+        """Retourne un instantané de la file et des compteurs"""
+        return {
+            "nb_workers": len(self._workers),
+            "en_file": self._file.qsize() if self._file is not None else 0,
+            "taille_max": self.taille_max,
+            "en_cours": self._nb_en_cours,
+            "nb_termines": self._nb_termines,
+            "nb_echecs": self._nb_echecs,
+            "types": sorted(self._traitements),
+        }
+
+    async def demarrer(self) -> None:
+        """Lance les workers et remet en file les jobs non terminés lors du précédent arrêt"""
+        if self._file is not None:
+            return
+        self._file = asyncio.Queue()
+        for job_id in await asyncio.to_thread(self._non_termines):
+            self._file.put_nowait(job_id)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.nb_workers)]
+
+    async def arreter(self) -> None:
+        """Arrête les workers ; les jobs interrompus seront repris au prochain démarrage"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._file = None
+
+
+# File unique du processus
+file_jobs = FileJobs(
+    nb_workers=settings.JOB_WORKERS,
+    taille_max=settings.JOB_FILE_MAX,
+    max_tentatives=settings.JOB_MAX_TENTATIVES,
+    delai_retry=settings.JOB_DELAI_RETRY,
+)
@@ -3,12 +3,77 @@ Service pour la génération de tests de langue via l'IA
 """
 import uuid
 import sys
+import time
+import asyncio
+import contextvars
+from typing import AsyncIterator, Dict, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from app.core.config import settings
+from app.core.journal import obtenir_journal, contexte_journal
+from app.services.test_inventory_service import inventaire_tests, normaliser_cle
+from app.services.job_service import file_jobs
 from app.schemas.language_test import (
     LanguageTestRequest, 
     LanguageTestResponse, 
     TestComplet
 )
 
+journal = obtenir_journal(__name__)
+
+SECTIONS_TEST = ("comprehension_ecrite", "grammaire", "vocabulaire")
+
+# Type des jobs de génération traités par la file de jobs
+TYPE_JOB_GENERATION = "generation_test"
+
+# Pool dédié à la génération en mode "thread" : les appels LLM bloquants (invoke, time.sleep)
+# y sont exécutés pour ne pas figer la boucle d'événements d'uvicorn pendant la génération d'un test
+_executeur_generation = ThreadPoolExecutor(
+    max_workers=settings.GENERATION_MAX_WORKERS,
+    thread_name_prefix="generation-test"
+)
+
+# Générations en cours par (langue, niveau) normalisé, partagées entre les requêtes identiques
+_generations_en_cours: Dict[Tuple[str, str], "asyncio.Task[TestComplet]"] = {}
+
+async def _generer_test(langue: str, niveau_cible: str) -> TestComplet:
+    """Lance le pipeline de génération configuré (GENERATION_MODE)"""
+    from app.services.ai_modules.content_creator_ai import generer_test_parallele, generer_test_parallele_async
+    
+    if settings.GENERATION_MODE == "thread":
+        # Appeler l'IA de génération de test en mode parallèle (haute performance)
+        # dans le pool dédié afin que le worker continue de servir les autres requêtes
+        # (le contexte de journalisation est recopié dans le thread)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _executeur_generation,
+            contextvars.copy_context().run,
+            partial(generer_test_parallele, langue=langue, niveau_cible=niveau_cible)
+        )
+    # Pipeline natif asyncio : les sections sont générées en coroutines concurrentes
+    return await generer_test_parallele_async(langue=langue, niveau_cible=niveau_cible)
+
+async def _generation_partagee(langue: str, niveau_cible: str) -> TestComplet:
+    """
+    Single-flight : rejoint la génération en cours pour ce couple (langue, niveau) ou en lance une
+    
+    La tâche est protégée par asyncio.shield : la déconnexion d'un client n'annule pas
+    la génération attendue par les autres.
+    """
+    cle = normaliser_cle(langue, niveau_cible)
+    tache = _generations_en_cours.get(cle)
+    if tache is None:
+        tache = asyncio.ensure_future(_generer_test(langue, niveau_cible))
+        _generations_en_cours[cle] = tache
+        
+        def _liberer(tache_terminee):
+            if _generations_en_cours.get(cle) is tache_terminee:
+                del _generations_en_cours[cle]
+        tache.add_done_callback(_liberer)
+    else:
+        journal.info("Génération identique déjà en cours, résultat partagé", extra={"langue": cle[0], "niveau": cle[1]})
+    return await asyncio.shield(tache)
+
 async def generate_language_test(request: LanguageTestRequest) -> LanguageTestResponse:
     """
     Génère un test de langue à partir des paramètres fournis
@@ -19,32 +84,40 @@ async def generate_language_test(request: LanguageTestRequest) -> LanguageTestRe
     Returns:
         Un test de langue complet
     """
-    # Générer un identifiant unique pour ce test
+    # Générer un identifiant unique pour ce test, ajouté à tous les messages émis pendant sa génération
     test_id = str(uuid.uuid4())
-    
+    with contexte_journal(test_id=test_id):
+        return await _generer_reponse_test(request, test_id)
+
+async def _generer_reponse_test(request: LanguageTestRequest, test_id: str) -> LanguageTestResponse:
+    """Sert le test depuis l'inventaire ou le génère (pipeline partagé, fallback de développement)"""
     # Gérer le cas où niveau_cible est None
     niveau_cible_str = request.niveau_cible if request.niveau_cible is not None else ""
     
-    print(f"Génération d'un test pour la langue: {request.langue}, niveau: {niveau_cible_str}")
+    journal.info("Génération d'un test", extra={"langue": request.langue, "niveau": niveau_cible_str})
     
-    # Import local pour éviter les imports circulaires
-    try:
-        from app.services.ai_modules.content_creator_ai import generer_test_parallele
-        print("Module content_creator_ai importé avec succès")
-        
-        # Appeler l'IA de génération de test en mode parallèle (haute performance)
-        test_result = generer_test_parallele(
+    # Servir un test pré-généré si l'inventaire en contient un pour ce couple (langue, niveau)
+    test_stock = inventaire_tests.prendre(request.langue, niveau_cible_str)
+    if test_stock is not None:
+        journal.info("Test servi depuis l'inventaire pré-généré")
+        return LanguageTestResponse(
+            id=test_id,
             langue=request.langue,
-            niveau_cible=niveau_cible_str
+            niveau_cible=niveau_cible_str,
+            test=test_stock
         )
+    
+    try:
+        # Les requêtes identiques arrivées pendant la génération partagent le même pipeline
+        # (_generer_test importe content_creator_ai : son absence lève l'ImportError traitée ci-dessous)
+        debut = time.perf_counter()
+        test_result = await _generation_partagee(request.langue, niveau_cible_str)
         
-        print("Test généré par l'IA avec succès")
-        print(f"Type de résultat: {type(test_result)}")
+        journal.info("Test généré par l'IA", extra={"duree_ms": round((time.perf_counter() - debut) * 1000)})
         
     except ImportError as e:
-        print(f"Erreur d'import: {str(e)}")
-        print(f"Chemins de recherche Python: {sys.path}")
-        print("Utilisation du mode fallback")
+        journal.warning("Module de génération indisponible, utilisation du mode fallback: %s", e)
+        journal.debug("Chemins de recherche Python: %s", sys.path)
         
         # Fallback pour les environnements de test ou de développement
         from app.schemas.language_test import Exercice, Contenu, Element, TypeElement, OptionQCM
@@ -125,7 +198,7 @@ async def generate_language_test(request: LanguageTestRequest) -> LanguageTestRe
             ]
         )
     except Exception as e:
-        print(f"Erreur lors de la génération du test: {e}")
+        journal.error("Erreur lors de la génération du test: %s", e)
         raise
     
     # Créer la réponse avec le test généré
@@ -136,4 +209,118 @@ async def generate_language_test(request: LanguageTestRequest) -> LanguageTestRe
         test=test_result
     )
     
-    return response 
\ No newline at end of file
+    return response
+
+async def stream_language_test(request: LanguageTestRequest, granularite: str = "section") -> AsyncIterator[Dict[str, Any]]:
+    """
+    Génère un test de langue en produisant chaque section dès qu'elle est prête
+    
+    Args:
+        request: Requête contenant la langue et éventuellement le niveau cible
+        granularite: "section" pour un événement par section, "exercice" pour un événement
+            par exercice dès que le modèle a fini de l'écrire
+        
+    Yields:
+        Des événements "section" (ou "exercice" puis "section_complete"), puis un
+        événement "complete" portant l'identifiant du test
+    """
+    # Comme generate_language_test : test_id est ajouté à tous les messages émis pendant la génération,
+    # y compris par les tâches de génération des sections créées dans le bloc
+    test_id = str(uuid.uuid4())
+    with contexte_journal(test_id=test_id):
+        async for evenement in _flux_test(request, granularite, test_id):
+            yield evenement
+
+async def _flux_test(request: LanguageTestRequest, granularite: str, test_id: str) -> AsyncIterator[Dict[str, Any]]:
+    """Événements du test en flux : depuis l'inventaire, par exercice ou par section"""
+    niveau_cible_str = request.niveau_cible if request.niveau_cible is not None else ""
+    
+    journal.info("Génération en flux d'un test", extra={"langue": request.langue, "niveau": niveau_cible_str})
+    
+    test_stock = inventaire_tests.prendre(request.langue, niveau_cible_str)
+    if test_stock is not None:
+        for section in SECTIONS_TEST:
+            exercices = getattr(test_stock, section)
+            if granularite == "exercice":
+                for index, exercice in enumerate(exercices):
+                    yield _evenement_exercice(test_id, section, index, exercice)
+                yield {"event": "section_complete", "id": test_id, "section": section, "nb_exercices": len(exercices)}
+            else:
+                yield _evenement_section(test_id, section, exercices)
+    elif granularite == "exercice":
+        from app.services.ai_modules.content_creator_ai import generer_exercices_flux_async
+        compteurs = {}
+        async for section, exercice in generer_exercices_flux_async(langue=request.langue, niveau_cible=niveau_cible_str):
+            if exercice is None:
+                yield {"event": "section_complete", "id": test_id, "section": section, "nb_exercices": compteurs.get(section, 0)}
+                continue
+            index = compteurs.get(section, 0)
+            compteurs[section] = index + 1
+            yield _evenement_exercice(test_id, section, index, exercice)
+    else:
+        from app.services.ai_modules.content_creator_ai import generer_sections_async
+        async for section, exercices in generer_sections_async(langue=request.langue, niveau_cible=niveau_cible_str):
+            yield _evenement_section(test_id, section, exercices)
+    
+    yield {
+        "event": "complete",
+        "id": test_id,
+        "langue": request.langue,
+        "niveau_cible": niveau_cible_str
+    }
+
+def _evenement_section(test_id, section, exercices):
+    return {
+        "event": "section",
+        "id": test_id,
+        "section": section,
+        "exercices": [exercice.model_dump(mode="json") for exercice in exercices]
+    }
+
+def _evenement_exercice(test_id, section, index, exercice):
+    return {
+        "event": "exercice",
+        "id": test_id,
+        "section": section,
+        "index": index,
+        "exercice": exercice.model_dump(mode="json")
+    }
+
+async def executer_job_generation(parametres: Dict[str, Any], signaler_progression) -> Dict[str, Any]:
+    """
+    Traitement d'un job de génération : produit le test section par section en publiant l'avancement
+    
+    Une section vide fait échouer la tentative ; la tentative suivante régénère le test en
+    reprenant du cache les variantes de section déjà disponibles.
+    """
+    request = LanguageTestRequest(**parametres)
+    niveau_cible_str = request.niveau_cible if request.niveau_cible is not None else ""
+    test_id = str(uuid.uuid4())
+    
+    with contexte_journal(test_id=test_id):
+        test_result = inventaire_tests.prendre(request.langue, niveau_cible_str)
+        if test_result is not None:
+            await signaler_progression({section: "termine" for section in SECTIONS_TEST})
+        else:
+            from app.services.ai_modules.content_creator_ai import generer_sections_async, assembler_test
+            
+            await signaler_progression({section: "en_cours" for section in SECTIONS_TEST})
+            sections = {}
+            async for section, exercices in generer_sections_async(langue=request.langue, niveau_cible=niveau_cible_str):
+                sections[section] = exercices
+                await signaler_progression({section: "termine" if exercices else "echec"})
+            
+            manquantes = [section for section in SECTIONS_TEST if not sections.get(section)]
+            if manquantes:
+                raise RuntimeError(f"Sections non générées: {', '.join(manquantes)}")
+            test_result = assembler_test(**sections)
+        
+        response = LanguageTestResponse(
+            id=test_id,
+            langue=request.langue,
+            niveau_cible=niveau_cible_str,
+            test=test_result
+        )
+        return response.model_dump(mode="json")
+
+file_jobs.enregistrer_traitement(TYPE_JOB_GENERATION, executer_job_generation)
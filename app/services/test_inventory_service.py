@@ -0,0 +1,143 @@
+"""
+Inventaire de tests pré-générés
+
+Maintient un stock de TestComplet prêts à l'emploi par couple (langue, niveau_cible).
+Un worker d'arrière-plan recharge le stock quand le limiteur de débit a de la marge,
+ce qui permet de servir un POST /api/tests/ en quelques millisecondes.
+
+Les couples suivis sont ceux de TEST_INVENTORY_CLES et ceux demandés par les clients, à
+condition que la langue fasse partie de LANGUES_SUPPORTEES et que le niveau soit un niveau
+CECRL (ou vide) : une langue inconnue ou mal saisie ne consomme ni emplacement ni budget LLM.
+"""
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.journal import obtenir_journal
+from app.schemas.language_test import TestComplet
+from app.services.ai_modules.rate_limiter import limiteur
+
+journal = obtenir_journal(__name__)
+
+NIVEAUX_CECRL = ("A1", "A2", "B1", "B2", "C1", "C2")
+
+
+def normaliser_cle(langue: str, niveau_cible: Optional[str]) -> Tuple[str, str]:
+    """Normalise le couple (langue, niveau) utilisé comme clé d'inventaire"""
+    return langue.strip().lower(), (niveau_cible or "").strip().upper()
+
+
+class InventaireTests:
+    """Stock de tests complets par (langue, niveau_cible) avec rechargement en arrière-plan"""
+
+    def __init__(self, profondeur: int, max_cles: int):
+        self.profondeur = profondeur
+        self.max_cles = max_cles
+        self._stocks: Dict[Tuple[str, str], Deque[TestComplet]] = {}
+        self._tache: Optional[asyncio.Task] = None
+        self._nb_servis = 0
+        self._nb_manques = 0
+        self._nb_generes = 0
+
+        for cle in settings.TEST_INVENTORY_CLES:
+            langue, _, niveau = cle.partition(":")
+            self.suivre(langue, niveau)
+
+    def suivre(self, langue: str, niveau_cible: Optional[str]) -> None:
+        """Ajoute un couple (langue, niveau) à la liste des stocks à maintenir"""
+        cle = normaliser_cle(langue, niveau_cible)
+        if cle not in self._stocks and len(self._stocks) < self.max_cles:
+            self._stocks[cle] = deque()
+
+    def est_suivable(self, langue: str, niveau_cible: Optional[str]) -> bool:
+        """Indique si une demande peut ajouter son couple aux stocks maintenus (langue supportée, niveau CECRL)"""
+        langue, niveau = normaliser_cle(langue, niveau_cible)
+        langues = {langue_supportee.strip().lower() for langue_supportee in settings.LANGUES_SUPPORTEES}
+        return langue in langues and (not niveau or niveau in NIVEAUX_CECRL)
+
+    def prendre(self, langue: str, niveau_cible: Optional[str]) -> Optional[TestComplet]:
+        """Retire un test du stock, ou retourne None si le stock est vide"""
+        cle = normaliser_cle(langue, niveau_cible)
+        stock = self._stocks.get(cle)
+        if stock:
+            self._nb_servis += 1
+            return stock.popleft()
+
+        # Mémoriser la demande pour que le worker constitue un stock pour les prochaines requêtes
+        self._nb_manques += 1
+        if self.est_suivable(langue, niveau_cible):
+            self.suivre(langue, niveau_cible)
+        return None
+
+    def ajouter(self, langue: str, niveau_cible: Optional[str], test: TestComplet) -> None:
+        """Ajoute un test au stock du couple (langue, niveau)"""
+        self.suivre(langue, niveau_cible)
+        stock = self._stocks.get(normaliser_cle(langue, niveau_cible))
+        if stock is not None:
+            stock.append(test)
+
+    def etat(self) -> dict:
+        """Retourne un instantané des stocks et des compteurs"""
+        return {
+            "profondeur_cible": self.profondeur,
+            "stocks": {f"{langue}:{niveau}": len(stock) for (langue, niveau), stock in self._stocks.items()},
+            "nb_servis": self._nb_servis,
+            "nb_manques": self._nb_manques,
+            "nb_generes": self._nb_generes,
+        }
+
+    async def _remplir_une_fois(self) -> bool:
+        """Génère au plus un test pour le stock le plus bas ; retourne True si un test a été ajouté"""
+        en_manque = [(len(stock), cle) for cle, stock in self._stocks.items() if len(stock) < self.profondeur]
+        if not en_manque:
+            return False
+
+        # Ne recharger que sur la marge du budget LLM pour laisser la priorité au trafic en direct
+        if not limiteur.a_de_la_marge(settings.TEST_INVENTORY_MARGE_BUDGET):
+            return False
+
+        from app.services.ai_modules.content_creator_ai import generer_test_parallele_async
+
+        _, (langue, niveau) = min(en_manque)
+        test = await generer_test_parallele_async(langue=langue, niveau_cible=niveau)
+        if not (test.comprehension_ecrite and test.grammaire and test.vocabulaire):
+            journal.warning("Inventaire: test incomplet, non conservé", extra={"langue": langue, "niveau": niveau})
+            return False
+
+        self._stocks[(langue, niveau)].append(test)
+        self._nb_generes += 1
+        return True
+
+    async def _boucle_remplissage(self) -> None:
+        while True:
+            try:
+                ajoute = await self._remplir_une_fois()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                journal.error("Inventaire: erreur lors du rechargement: %s", e)
+                ajoute = False
+            if not ajoute:
+                await asyncio.sleep(settings.TEST_INVENTORY_INTERVALLE)
+
+    def demarrer(self) -> None:
+        """Lance le worker de rechargement dans la boucle d'événements courante"""
+        if self.profondeur > 0 and self._tache is None:
+            self._tache = asyncio.create_task(self._boucle_remplissage())
+
+    async def arreter(self) -> None:
+        """Arrête le worker de rechargement"""
+        if self._tache is not None:
+            self._tache.cancel()
+            try:
+                await self._tache
+            except asyncio.CancelledError:
+                pass
+            self._tache = None
+
+
+# Inventaire unique du processus
+inventaire_tests = InventaireTests(
+    profondeur=settings.TEST_INVENTORY_PROFONDEUR,
+    max_cles=settings.TEST_INVENTORY_MAX_CLES,
+)
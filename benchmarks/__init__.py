@@ -0,0 +1,3 @@
+"""
+Benchmarks de bout en bout (génération de tests et correction) contre le LLM simulé
+"""
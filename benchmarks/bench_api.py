@@ -0,0 +1,400 @@
+"""
+Benchmark de latence et de débit de POST /api/tests/ et du correcteur
+
+L'application est pilotée dans le processus (httpx.ASGITransport) ou via un uvicorn local, par
+N clients concurrents en boucle fermée, contre le LLM simulé (LLM_FOURNISSEUR=simule). Chaque
+scénario produit les latences p50/p95/p99, le nombre de tests par minute et, dans le processus,
+le temps passé par étape du pipeline (themes, generation_section, parse, validation).
+Les résultats sont écrits en JSON pour comparer les modes de génération et détecter les régressions :
+
+    python -m benchmarks.bench_api --clients 8 --requetes 40
+    python -m benchmarks.bench_api --transport uvicorn --scenarios async fanout
+    python -m benchmarks.bench_api --reference benchmarks/resultats/v1.json --tolerance 0.2
+
+Scénarios : thread, async, fanout (GENERATION_MODE appliqué à POST /api/tests/), stream
+(POST /api/tests/stream, jusqu'au dernier événement) et correction (evaluer_reponse).
+"""
+import os
+
+# Configuration du banc, à poser avant tout import de l'application (settings lus à l'import).
+# Les valeurs déjà présentes dans l'environnement sont conservées.
+ENVIRONNEMENT_BANC = {
+    "LLM_FOURNISSEUR": "simule",
+    "LLM_FOURNISSEURS_PAR_ETAPE": "{}",
+    "SECTION_CACHE_ACTIVE": "false",
+    "TEST_INVENTORY_PROFONDEUR": "0",
+    "THEME_BANK_SQLITE": "",
+    "TRANSLATION_MEMO_SQLITE": "",
+    "LLM_REQUETES_PAR_MINUTE": "1000000",
+    "LLM_TOKENS_PAR_MINUTE": "10000000000",
+    "LLM_RAFALE_REQUETES": "10000",
+    "LOG_NIVEAU": "WARNING",
+}
+for _variable, _valeur in ENVIRONNEMENT_BANC.items():
+    os.environ.setdefault(_variable, _valeur)
+
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import threading
+import subprocess
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from app.core.config import settings
+from app.core.chronometrage import ajouter_observateur, retirer_observateur
+
+SCENARIOS_GENERATION = ("thread", "async", "fanout")
+SCENARIOS = SCENARIOS_GENERATION + ("stream", "correction")
+NIVEAUX = ("A1", "A2", "B1", "B2", "C1", "C2")
+DOSSIER_RESULTATS = os.path.join(os.path.dirname(__file__), "resultats")
+
+
+def _percentile(valeurs, centile):
+    """Percentile par interpolation linéaire entre les rangs encadrants"""
+    ordonnees = sorted(valeurs)
+    rang = (len(ordonnees) - 1) * centile / 100
+    bas = int(rang)
+    haut = min(bas + 1, len(ordonnees) - 1)
+    return ordonnees[bas] + (ordonnees[haut] - ordonnees[bas]) * (rang - bas)
+
+
+def resumer(durees):
+    """Résumé en millisecondes d'une liste de durées en secondes"""
+    if not durees:
+        return {"nb": 0}
+    return {
+        "nb": len(durees),
+        "p50_ms": round(_percentile(durees, 50) * 1000, 2),
+        "p95_ms": round(_percentile(durees, 95) * 1000, 2),
+        "p99_ms": round(_percentile(durees, 99) * 1000, 2),
+        "moyenne_ms": round(sum(durees) / len(durees) * 1000, 2),
+        "max_ms": round(max(durees) * 1000, 2),
+        "total_ms": round(sum(durees) * 1000, 2),
+    }
+
+
+class CollecteurEtapes:
+    """Observateur de chronométrage accumulant les durées par étape"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._durees = {}
+
+    def __call__(self, etape, duree):
+        with self._verrou:
+            self._durees.setdefault(etape, []).append(duree)
+
+    def vider(self):
+        with self._verrou:
+            durees, self._durees = self._durees, {}
+        return {etape: resumer(valeurs) for etape, valeurs in sorted(durees.items())}
+
+
+def _requete_test(index, identiques):
+    """Corps de requête du client `index` ; les couples varient pour ne pas être fusionnés par le single-flight"""
+    if identiques:
+        return {"langue": settings.LANGUES_SUPPORTEES[0], "niveau_cible": "B1"}
+    langue = settings.LANGUES_SUPPORTEES[index % len(settings.LANGUES_SUPPORTEES)]
+    niveau = NIVEAUX[(index // len(settings.LANGUES_SUPPORTEES)) % len(NIVEAUX)]
+    return {"langue": langue, "niveau_cible": niveau}
+
+
+async def charger(executer, nb_clients, nb_requetes):
+    """Exécute nb_requetes appels de `executer(index)` avec nb_clients clients en boucle fermée"""
+    latences = []
+    erreurs = []
+    prochain = iter(range(nb_requetes))
+
+    async def client():
+        for index in prochain:
+            debut = time.perf_counter()
+            try:
+                await executer(index)
+            except Exception as e:
+                erreurs.append(f"{type(e).__name__}: {e}")
+                continue
+            latences.append(time.perf_counter() - debut)
+
+    debut = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(nb_clients)))
+    duree = time.perf_counter() - debut
+
+    return {
+        "nb_requetes": nb_requetes,
+        "nb_succes": len(latences),
+        "nb_erreurs": len(erreurs),
+        "exemples_erreurs": erreurs[:5],
+        "duree_s": round(duree, 3),
+        "par_minute": round(len(latences) / duree * 60, 2) if duree > 0 else None,
+        "latence": resumer(latences),
+    }
+
+
+def _executeur_generation(client, scenario, identiques):
+    """Fonction d'appel HTTP d'un scénario de génération"""
+    async def generer(index):
+        reponse = await client.post("/api/tests/", json=_requete_test(index, identiques))
+        reponse.raise_for_status()
+
+    async def diffuser(index):
+        async with client.stream(
+            "POST", "/api/tests/stream", params={"format": "ndjson"}, json=_requete_test(index, identiques)
+        ) as reponse:
+            reponse.raise_for_status()
+            async for ligne in reponse.aiter_lines():
+                if ligne and json.loads(ligne).get("event") == "error":
+                    raise RuntimeError(ligne)
+
+    return diffuser if scenario == "stream" else generer
+
+
+def _reponses_utilisateur(exercice, index):
+    """Réponses au format attendu par evaluer_reponse, une sur deux fausse pour exercer l'analyse d'erreur"""
+    lignes = []
+    for position, element in enumerate(exercice["contenu"]["elements"]):
+        reponse = element.get("reponse_correcte") or "A"
+        if (index + position) % 2:
+            autres = [option["id"] for option in element.get("options") or [] if option["id"] != reponse]
+            reponse = autres[0] if autres else "réponse incorrecte"
+        lignes.append(f"Question {element['id']}: {reponse}")
+    return "\n".join(lignes)
+
+
+async def _preparer_correction(nb_clients):
+    """Génère les exercices à corriger et retourne la fonction d'appel du scénario correction"""
+    from app.services.ai_modules.content_creator_ai import generer_test_parallele_async
+    from app.services.ai_modules.corrector_ai import evaluer_reponse
+
+    langue = settings.LANGUES_SUPPORTEES[0]
+    test = await generer_test_parallele_async(langue=langue, niveau_cible="B1")
+    exercices = [
+        exercice.model_dump(mode="json")
+        for section in (test.comprehension_ecrite, test.grammaire, test.vocabulaire)
+        for exercice in section or []
+        if exercice.contenu.elements
+    ]
+    if not exercices:
+        raise RuntimeError("Aucun exercice généré pour le scénario correction")
+
+    # evaluer_reponse est bloquant : un thread par client
+    pool = ThreadPoolExecutor(max_workers=nb_clients, thread_name_prefix="bench-correction")
+    boucle = asyncio.get_running_loop()
+
+    async def corriger(index):
+        exercice = exercices[index % len(exercices)]
+        await boucle.run_in_executor(
+            pool, evaluer_reponse, exercice, _reponses_utilisateur(exercice, index), langue
+        )
+
+    return corriger, pool
+
+
+def _port_libre():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServeurUvicorn:
+    """Serveur uvicorn lancé dans un sous-processus avec l'environnement du banc"""
+
+    def __init__(self, mode):
+        self.port = _port_libre()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._environnement = {**os.environ, "GENERATION_MODE": mode}
+        self._processus = None
+
+    async def __aenter__(self):
+        self._processus = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(self.port), "--log-level", "warning"],
+            env=self._environnement,
+        )
+        async with httpx.AsyncClient(base_url=self.url) as client:
+            for _ in range(300):
+                if self._processus.poll() is not None:
+                    raise RuntimeError(f"uvicorn s'est arrêté au démarrage (code {self._processus.returncode})")
+                try:
+                    await client.get("/")
+                    return self
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+        raise RuntimeError("uvicorn n'a pas répondu dans les 30 secondes")
+
+    async def __aexit__(self, *exc):
+        self._processus.terminate()
+        try:
+            self._processus.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self._processus.kill()
+
+
+def _delta(avant, apres):
+    return {cle: apres[cle] - avant.get(cle, 0) for cle in apres}
+
+
+async def executer_scenario(scenario, options, collecteur):
+    """Exécute un scénario (échauffement puis mesure) et retourne ses résultats"""
+    from app.services.ai_modules.llm_simule import simulateur_llm
+
+    mode = scenario if scenario in SCENARIOS_GENERATION else "async"
+    settings.GENERATION_MODE = mode
+    nb_echauffement = options.echauffement if options.echauffement is not None else options.clients
+
+    pool = None
+    serveur = None
+    client = None
+    try:
+        if scenario == "correction":
+            executer, pool = await _preparer_correction(options.clients)
+        else:
+            transport = None
+            if options.url:
+                base_url = options.url
+            elif options.transport == "uvicorn":
+                serveur = await ServeurUvicorn(mode).__aenter__()
+                base_url = serveur.url
+            else:
+                from app.main import app
+                base_url = "http://banc"
+                transport = httpx.ASGITransport(app=app)
+            client = httpx.AsyncClient(
+                base_url=base_url,
+                transport=transport,
+                timeout=settings.LLM_TIMEOUT * 2,
+                limits=httpx.Limits(max_connections=options.clients),
+            )
+            executer = _executeur_generation(client, scenario, options.identiques)
+
+        if nb_echauffement:
+            await charger(lambda index: executer(options.requetes + index), options.clients, nb_echauffement)
+
+        collecteur.vider()
+        stats_llm = simulateur_llm.statistiques()
+        resultat = await charger(executer, options.clients, options.requetes)
+        resultat["etapes"] = collecteur.vider()
+        resultat["llm_simule"] = _delta(stats_llm, simulateur_llm.statistiques())
+        resultat["mode_generation"] = mode if not options.url else "configuré sur le serveur"
+        return resultat
+    finally:
+        if client is not None:
+            await client.aclose()
+        if serveur is not None:
+            await serveur.__aexit__(None, None, None)
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+
+def _revision_git():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def comparer(resultats, reference, tolerance):
+    """Liste les scénarios dont le p95 ou le débit se dégrade de plus de `tolerance` par rapport à la référence"""
+    regressions = []
+    for scenario, actuel in resultats["scenarios"].items():
+        ancien = reference.get("scenarios", {}).get(scenario)
+        if not ancien or "latence" not in ancien or not actuel["latence"].get("nb"):
+            continue
+        p95_ancien, p95_actuel = ancien["latence"].get("p95_ms"), actuel["latence"]["p95_ms"]
+        if p95_ancien and p95_actuel > p95_ancien * (1 + tolerance):
+            regressions.append(f"{scenario}: p95 {p95_ancien} ms -> {p95_actuel} ms")
+        debit_ancien, debit_actuel = ancien.get("par_minute"), actuel["par_minute"]
+        if debit_ancien and debit_actuel < debit_ancien * (1 - tolerance):
+            regressions.append(f"{scenario}: {debit_ancien} -> {debit_actuel} par minute")
+    return regressions
+
+
+async def lancer(options):
+    """Exécute les scénarios demandés et retourne le document de résultats"""
+    collecteur = CollecteurEtapes()
+    ajouter_observateur(collecteur)
+    demarrage = None
+    if options.transport == "asgi" and not options.url:
+        from app.main import app
+        await app.router.startup()
+        demarrage = app
+
+    resultats = {
+        "horodatage": datetime.now(timezone.utc).isoformat(),
+        "revision": _revision_git(),
+        "python": platform.python_version(),
+        "configuration": {
+            "clients": options.clients,
+            "requetes": options.requetes,
+            "transport": "http" if options.url else options.transport,
+            "identiques": options.identiques,
+            "llm_simule": {
+                "latence_ms": settings.LLM_SIMULE_LATENCE_MS,
+                "ecart_ms": settings.LLM_SIMULE_ECART_MS,
+                "distribution": settings.LLM_SIMULE_DISTRIBUTION,
+                "tokens_par_seconde": settings.LLM_SIMULE_TOKENS_PAR_SECONDE,
+                "taux_429": settings.LLM_SIMULE_TAUX_429,
+                "taux_malforme": settings.LLM_SIMULE_TAUX_MALFORME,
+                "graine": settings.LLM_SIMULE_GRAINE,
+            },
+        },
+        "scenarios": {},
+    }
+    try:
+        for scenario in options.scenarios:
+            print(f"Scénario {scenario}: {options.clients} clients, {options.requetes} requêtes")
+            resultat = await executer_scenario(scenario, options, collecteur)
+            resultats["scenarios"][scenario] = resultat
+            latence = resultat["latence"]
+            print(
+                f"  p50 {latence.get('p50_ms')} ms, p95 {latence.get('p95_ms')} ms, p99 {latence.get('p99_ms')} ms, "
+                f"{resultat['par_minute']} par minute, {resultat['nb_erreurs']} erreur(s)"
+            )
+    finally:
+        retirer_observateur(collecteur)
+        if demarrage is not None:
+            await demarrage.router.shutdown()
+    return resultats
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la génération de tests et de la correction")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--clients", type=int, default=8, help="Nombre de clients concurrents")
+    parser.add_argument("--requetes", type=int, default=40, help="Requêtes mesurées par scénario")
+    parser.add_argument("--echauffement", type=int, default=None, help="Requêtes non mesurées (défaut: une par client)")
+    parser.add_argument("--transport", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--url", help="Serveur déjà démarré (le mode de génération est alors celui du serveur)")
+    parser.add_argument("--identiques", action="store_true", help="Tous les clients demandent le même couple (langue, niveau)")
+    parser.add_argument("--sortie", help="Fichier JSON de résultats (défaut: benchmarks/resultats/<horodatage>.json)")
+    parser.add_argument("--reference", help="Résultats d'une version précédente à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Dégradation relative tolérée avant de signaler une régression")
+    options = parser.parse_args(arguments)
+
+    resultats = asyncio.run(lancer(options))
+
+    sortie = options.sortie or os.path.join(DOSSIER_RESULTATS, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(sortie)), exist_ok=True)
+    with open(sortie, "w", encoding="utf-8") as fichier:
+        json.dump(resultats, fichier, ensure_ascii=False, indent=2)
+    print(f"Résultats écrits dans {sortie}")
+
+    if options.reference:
+        with open(options.reference, encoding="utf-8") as fichier:
+            regressions = comparer(resultats, json.load(fichier), options.tolerance)
+        for regression in regressions:
+            print(f"Régression: {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
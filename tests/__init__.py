@@ -0,0 +1,3 @@
+"""
+Tests unitaires (pytest) : python -m pytest tests
+"""
@@ -0,0 +1,24 @@
+"""
+Configuration commune des tests
+
+Les bases SQLite de l'application sont redirigées vers un dossier temporaire avant tout import
+de l'application (settings et moteur lus à l'import) : une exécution des tests ne modifie
+pas les fichiers du dépôt.
+"""
+import os
+import shutil
+import tempfile
+
+import pytest
+
+_DOSSIER_BASES = tempfile.mkdtemp(prefix="tests-app-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DOSSIER_BASES, 'app.db')}"
+os.environ["THEME_BANK_SQLITE"] = ""
+os.environ["TRANSLATION_MEMO_SQLITE"] = ""
+os.environ["SECTION_CACHE_SQLITE"] = ""
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _supprimer_bases_temporaires():
+    yield
+    shutil.rmtree(_DOSSIER_BASES, ignore_errors=True)
@@ -0,0 +1,40 @@
+"""
+Tests du tirage des variantes du cache des sections
+"""
+import random
+
+from app.services.ai_modules.content_creator import cache as module_cache
+from app.services.ai_modules.content_creator.cache import CacheSections
+
+
+def test_tirage_borne_aux_variantes_configurees(monkeypatch):
+    monkeypatch.setattr(module_cache, "random", random.Random(7))
+    cache = CacheSections(taille_max=10, ttl=0, variantes=3)
+    cles = [cache.cle_aleatoire("anglais", "B1", "grammaire") for _ in range(60)]
+    assert set(cles) == {f"anglais|B1|grammaire|variante:{variante}" for variante in range(3)}
+
+
+def test_tirage_uniforme_sans_preference_pour_la_premiere_variante(monkeypatch):
+    monkeypatch.setattr(module_cache, "random", random.Random(7))
+    cache = CacheSections(taille_max=10, ttl=0, variantes=4)
+    tirages = [cache.cle_aleatoire("anglais", "B1", "grammaire").rsplit(":", 1)[1] for _ in range(4000)]
+    for variante in "0123":
+        assert 900 < tirages.count(variante) < 1100
+
+
+def test_cle_normalisee_par_langue_niveau_et_section(monkeypatch):
+    monkeypatch.setattr(module_cache, "random", random.Random(7))
+    cache = CacheSections(taille_max=10, ttl=0, variantes=1)
+    assert cache.cle_aleatoire("Anglais ", "b1", "grammaire") == "anglais|B1|grammaire|variante:0"
+    assert cache.cle_aleatoire("anglais", "B2", "vocabulaire") == "anglais|B2|vocabulaire|variante:0"
+
+
+def test_une_seule_variante_sans_configuration_valide():
+    cache = CacheSections(taille_max=10, ttl=0, variantes=0)
+    cles = {cache.cle_aleatoire("espagnol", "", "grammaire") for _ in range(3)}
+    assert cles == {"espagnol|B1|grammaire|variante:0"}
+
+
+def test_themes_imposes_hors_tirage():
+    cle = CacheSections.cle("anglais", "B1", "grammaire", themes=["Voyage", " cuisine"])
+    assert cle == "anglais|B1|grammaire|cuisine,voyage"
@@ -0,0 +1,102 @@
+"""
+Tests de la correction locale et du cache des verdicts du correcteur
+"""
+from app.services.ai_modules.corrector_ai import (
+    ResultatQuestion,
+    _cle_verdict,
+    _preparer_analyse,
+    _preparer_compilation,
+    _preparer_validation,
+    corriger_localement,
+)
+
+
+QUESTION_OUVERTE = {"id": 1, "texte": "Où est-elle allée hier ?", "type": "QUESTION"}
+
+QCM = {
+    "id": 2,
+    "texte": "Hier, nous ___ au cinéma.",
+    "type": "QCM",
+    "options": [
+        {"id": "A", "texte": "sommes allés", "est_correcte": False},
+        {"id": "B", "texte": "avons allé", "est_correcte": False},
+        {"id": "C", "texte": "Sommes allés.", "est_correcte": True},
+        {"id": "D", "texte": "allons", "est_correcte": False},
+    ],
+    "reponse_correcte": "C",
+}
+
+
+def test_qcm_lettre_seule():
+    assert corriger_localement(QCM, "c").est_correct is True
+    verdict = corriger_localement(QCM, " A ")
+    assert verdict.est_correct is False
+    assert verdict.confiance == 1.0
+
+
+def test_qcm_lettre_et_parenthese():
+    assert corriger_localement(QCM, "b)").est_correct is False
+    assert corriger_localement(QCM, "C)").est_correct is True
+
+
+def test_qcm_lettre_entre_parentheses_suivie_du_texte():
+    assert corriger_localement(QCM, "(C) sommes  allés.").est_correct is True
+    # Le texte doit être celui de l'option désignée par la lettre
+    assert corriger_localement(QCM, "(C) allons") is None
+
+
+def test_qcm_texte_exact_d_une_option():
+    assert corriger_localement(QCM, "SOMMES ALLÉS.").est_correct is True
+    # Accents et ponctuation conservés : sans point, c'est le texte de l'option A
+    assert corriger_localement(QCM, "sommes allés").est_correct is False
+
+
+def test_qcm_reponse_sans_option_correspondante():
+    assert corriger_localement(QCM, "sommes alles") is None
+    assert corriger_localement(QCM, "nous sommes allés au cinéma") is None
+    assert corriger_localement(QCM, "E") is None
+
+
+def test_element_avec_reponse_correcte_connue():
+    element = {"id": 3, "texte": "Conjuguez « aller » au passé composé (je).", "type": "PHRASE",
+               "reponse_correcte": "Je suis allé"}
+    assert corriger_localement(element, "  je SUIS allé ").est_correct is True
+    # Une autre formulation reste à juger par le modèle
+    assert corriger_localement(element, "je suis alle") is None
+    assert corriger_localement(QUESTION_OUVERTE, "Au marché.") is None
+
+
+def test_cle_verdict_ignore_casse_accents_ponctuation_et_espaces():
+    cle = _cle_verdict("validation", QUESTION_OUVERTE, "Elle est allée au marché.", "français")
+    assert _cle_verdict("validation", QUESTION_OUVERTE, "  elle est   allee au marche ", "Français") == cle
+
+
+def test_cle_verdict_distingue_les_reponses_et_les_espaces_de_cache():
+    cle = _cle_verdict("validation", QUESTION_OUVERTE, "Elle est allée au marché.", "français")
+    assert _cle_verdict("validation", QUESTION_OUVERTE, "Elle est allée à la plage.", "français") != cle
+    assert _cle_verdict("analyse", QUESTION_OUVERTE, "Elle est allée au marché.", "français") != cle
+
+
+def _contenu(prompt, variables):
+    return "\n".join(message.content for message in prompt.format_messages(**variables))
+
+
+def test_accolades_de_l_apprenant_conservees_dans_les_prompts():
+    question = {"id": 1, "texte": "Où est-elle allée {hier} ?", "type": "QUESTION"}
+    reponse = "au {marché} {0}"
+    texte = "Hier, elle est allée au marché {centre}."
+
+    for preparer in (_preparer_validation, _preparer_analyse):
+        contenu = _contenu(*preparer(question, reponse, "fran{çais}", texte))
+        assert reponse in contenu
+        assert question["texte"] in contenu
+        assert texte in contenu
+        assert "fran{çais}" in contenu
+
+    resultat = ResultatQuestion(
+        id_question=1, texte_question=question["texte"], reponse_utilisateur=reponse, est_correct=False
+    )
+    exercice = {"consigne": "Répondez {brièvement}.", "niveau_cible": "A2", "competence": "Compréhension écrite"}
+    contenu = _contenu(*_preparer_compilation([resultat], exercice, "français"))
+    assert reponse in contenu
+    assert "Répondez {brièvement}." in contenu
@@ -0,0 +1,83 @@
+"""
+Tests de bout en bout de POST /api/corrections/ contre le LLM simulé
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.main import app
+from app.services.ai_modules.llm_simule import simulateur_llm
+
+
+@pytest.fixture
+def simule(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_FOURNISSEUR", "simule")
+    monkeypatch.setattr(settings, "LLM_FOURNISSEURS_PAR_ETAPE", {})
+    monkeypatch.setattr(settings, "CORRECTEUR_CACHE_ACTIF", False)
+    monkeypatch.setattr(simulateur_llm, "latence_ms", 0.0)
+    monkeypatch.setattr(simulateur_llm, "tokens_par_seconde", 0.0)
+    monkeypatch.setattr(simulateur_llm, "taux_429", 0.0)
+    monkeypatch.setattr(simulateur_llm, "taux_malforme", 0.0)
+
+
+def _exercice_qcm():
+    return {
+        "consigne": "Choisissez la bonne réponse.",
+        "niveau_cible": "A2",
+        "competence": "Passé composé",
+        "contenu": {
+            "texte_principal": "",
+            "elements": [
+                {
+                    "id": 1,
+                    "texte": "Hier, je ___ au cinéma.",
+                    "type": "QCM",
+                    "options": [
+                        {"id": "A", "texte": "suis allé", "est_correcte": True},
+                        {"id": "B", "texte": "ai allé", "est_correcte": False},
+                    ],
+                    "reponse_correcte": "A",
+                },
+                {
+                    "id": 2,
+                    "texte": "Nous ___ au restaurant.",
+                    "type": "QCM",
+                    "options": [
+                        {"id": "A", "texte": "sommes mangé", "est_correcte": False},
+                        {"id": "B", "texte": "avons mangé", "est_correcte": True},
+                    ],
+                    "reponse_correcte": "B",
+                },
+            ],
+        },
+    }
+
+
+async def _poster(chemin, corps):
+    # Application pilotée sans son cycle de vie : ni inventaire ni file de jobs démarrés
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post(chemin, json=corps)
+
+
+def test_correction_produit_un_bilan_genere(simule):
+    reponse = asyncio.run(_poster("/api/corrections/", {
+        "test_id": "test-bilan",
+        "langue": "français",
+        "test": {"grammaire": [_exercice_qcm()]},
+        "reponses": {"grammaire": [{"1": "A", "2": "A"}]},
+    }))
+
+    assert reponse.status_code == 200
+    correction = reponse.json()
+    assert correction["test_id"] == "test-bilan"
+    assert [(exercice["section"], exercice["index"]) for exercice in correction["exercices"]] == [("grammaire", 0)]
+    resultats = correction["exercices"][0]["evaluation"]["resultats_questions"]
+    assert [resultat["est_correct"] for resultat in resultats] == [True, False]
+
+    # Le bilan vient du modèle et non du bilan de repli (niveaux B1 et erreur technique dans les lacunes)
+    bilan = correction["bilan"]
+    assert not any("erreur technique" in lacune for lacune in bilan["lacunes_identifiees"])
+    assert bilan["niveau_global"] != "B1"
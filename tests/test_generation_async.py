@@ -0,0 +1,73 @@
+"""
+Tests des replis du pipeline de génération asynchrone (generer_test_parallele_async)
+"""
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.core.metrics import generation_replis
+from app.schemas.language_test import Contenu, Exercice
+from app.services.ai_modules.content_creator import test_generator
+
+
+def _exercices(section):
+    return [Exercice(consigne=f"Consigne {section}", contenu=Contenu(elements=[]), niveau_cible="B1", competence=section)]
+
+
+def _nb_replis(de, vers):
+    ligne = f'generation_replis_total{{de="{de}",vers="{vers}"}} '
+    return sum(float(l.split()[-1]) for l in generation_replis.exposer() if l.startswith(ligne))
+
+
+@pytest.fixture
+def generateurs(monkeypatch):
+    """Générateurs de section simulés (la grammaire échoue en asynchrone) ; retourne la liste des appels"""
+    monkeypatch.setattr(settings, "GENERATION_MODE", "async")
+    appels = []
+
+    def asynchrone(section):
+        async def generer(*args):
+            appels.append((section, "async"))
+            return _exercices(section)
+        return generer
+
+    async def grammaire_en_erreur(*args):
+        appels.append(("grammaire", "async"))
+        raise RuntimeError("sortie du modèle invalide")
+
+    monkeypatch.setattr(test_generator, "generer_comprehension_ecrite_async", asynchrone("comprehension_ecrite"))
+    monkeypatch.setattr(test_generator, "generer_vocabulaire_async", asynchrone("vocabulaire"))
+    monkeypatch.setattr(test_generator, "generer_grammaire_async", grammaire_en_erreur)
+    return appels
+
+
+def test_section_toujours_en_erreur_donne_un_test_degrade(generateurs, monkeypatch):
+    def grammaire_synchrone_en_erreur(*args):
+        generateurs.append(("grammaire", "sync"))
+        raise RuntimeError("toujours invalide")
+
+    monkeypatch.setattr(test_generator, "generer_grammaire", grammaire_synchrone_en_erreur)
+    replis_avant = _nb_replis("synchrone", "secours")
+
+    test = asyncio.run(test_generator.generer_test_parallele_async("anglais", "B1"))
+
+    assert [e.competence for e in test.comprehension_ecrite] == ["comprehension_ecrite"]
+    assert [e.competence for e in test.vocabulaire] == ["vocabulaire"]
+    assert test.grammaire == []
+    assert generateurs.count(("grammaire", "async")) == 2
+    assert generateurs.count(("grammaire", "sync")) == 1
+    assert _nb_replis("synchrone", "secours") == replis_avant + 1
+
+
+def test_section_reprise_par_le_generateur_synchrone(generateurs, monkeypatch):
+    monkeypatch.setattr(test_generator, "generer_grammaire", lambda *args: _exercices("grammaire synchrone"))
+    replis_avant = _nb_replis("section", "synchrone")
+
+    test = asyncio.run(test_generator.generer_test_parallele_async("anglais", "B1"))
+
+    assert [e.competence for e in test.grammaire] == ["grammaire synchrone"]
+    assert len(test.comprehension_ecrite) == len(test.vocabulaire) == 1
+    # Les sections réussies ne sont pas régénérées
+    assert generateurs.count(("comprehension_ecrite", "async")) == 1
+    assert _nb_replis("section", "synchrone") == replis_avant + 1
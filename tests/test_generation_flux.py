@@ -0,0 +1,42 @@
+"""
+Tests des générateurs de section en flux face au cache des sections
+"""
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.schemas.language_test import Contenu, Exercice
+from app.services.ai_modules.content_creator import exercise_generators
+from app.services.ai_modules.content_creator.cache import CacheSections
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = CacheSections(taille_max=10, ttl=0, variantes=1)
+    monkeypatch.setattr(settings, "SECTION_CACHE_ACTIVE", True)
+    monkeypatch.setattr(exercise_generators, "cache_sections", cache)
+    monkeypatch.setattr(
+        exercise_generators, "cle_section",
+        lambda langue, niveau_cible, section, themes=None: CacheSections.cle(langue, niveau_cible, section, themes)
+    )
+    return cache
+
+
+async def _lister(flux):
+    return [exercice async for exercice in flux]
+
+
+@pytest.mark.parametrize("generer, section", [
+    (exercise_generators.generer_comprehension_ecrite_flux, "comprehension_ecrite"),
+    (exercise_generators.generer_vocabulaire_flux, "vocabulaire"),
+])
+def test_section_en_cache_servie_sans_tirer_de_themes(cache, monkeypatch, generer, section):
+    async def tirage_interdit(*args, **kwargs):
+        raise AssertionError("aucun thème ne doit être tiré pour une section en cache")
+
+    monkeypatch.setattr(exercise_generators, "choisir_themes_async", tirage_interdit)
+    exercices = [Exercice(consigne="Consigne", contenu=Contenu(elements=[]), niveau_cible="B1", competence=section)]
+    cache.enregistrer(CacheSections.cle("anglais", "B1", section), exercices)
+
+    assert asyncio.run(_lister(generer("anglais", "B1"))) == exercices
@@ -0,0 +1,75 @@
+"""
+Tests du regroupement des générations identiques en cours (single-flight)
+"""
+import asyncio
+
+import pytest
+
+from app.schemas.language_test import TestComplet
+from app.services import language_test_service
+from app.services.language_test_service import _generation_partagee, _generations_en_cours
+
+
+@pytest.fixture
+def generations(monkeypatch):
+    """Remplace le pipeline par une génération qui attend un signal, et note ses appels"""
+    appels = []
+    liberer = asyncio.Event()
+
+    async def generer(langue, niveau_cible):
+        appels.append((langue, niveau_cible))
+        await liberer.wait()
+        return TestComplet()
+
+    monkeypatch.setattr(language_test_service, "_generer_test", generer)
+    return appels, liberer
+
+
+def test_requetes_identiques_partagent_une_generation(generations):
+    appels, liberer = generations
+
+    async def scenario():
+        premiere = asyncio.ensure_future(_generation_partagee("Anglais", "b1"))
+        seconde = asyncio.ensure_future(_generation_partagee(" anglais ", "B1"))
+        await asyncio.sleep(0)
+        assert list(_generations_en_cours) == [("anglais", "B1")]
+        liberer.set()
+        return await asyncio.gather(premiere, seconde)
+
+    premier, second = asyncio.run(scenario())
+    assert len(appels) == 1
+    assert premier is second
+    assert _generations_en_cours == {}
+
+
+def test_requetes_differentes_ne_sont_pas_regroupees(generations):
+    appels, liberer = generations
+
+    async def scenario():
+        taches = [
+            asyncio.ensure_future(_generation_partagee("anglais", "B1")),
+            asyncio.ensure_future(_generation_partagee("anglais", "B2")),
+        ]
+        await asyncio.sleep(0)
+        liberer.set()
+        return await asyncio.gather(*taches)
+
+    asyncio.run(scenario())
+    assert sorted(appels) == [("anglais", "B1"), ("anglais", "B2")]
+    assert _generations_en_cours == {}
+
+
+def test_annulation_d_un_client_n_interrompt_pas_la_generation(generations):
+    appels, liberer = generations
+
+    async def scenario():
+        abandonnee = asyncio.ensure_future(_generation_partagee("espagnol", "A2"))
+        attendue = asyncio.ensure_future(_generation_partagee("espagnol", "A2"))
+        await asyncio.sleep(0)
+        abandonnee.cancel()
+        await asyncio.sleep(0)
+        liberer.set()
+        return await attendue
+
+    assert isinstance(asyncio.run(scenario()), TestComplet)
+    assert len(appels) == 1
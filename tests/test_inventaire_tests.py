@@ -0,0 +1,94 @@
+"""
+Tests de l'inventaire de tests pré-générés (stock, suivi des demandes, rechargement)
+"""
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.schemas.language_test import Contenu, Exercice, TestComplet
+from app.services import test_inventory_service
+from app.services.ai_modules import content_creator_ai
+from app.services.ai_modules.rate_limiter import LimiteurDebit
+from app.services.test_inventory_service import InventaireTests
+
+
+def _test_complet():
+    exercice = Exercice(consigne="Consigne", contenu=Contenu(elements=[]), niveau_cible="B1", competence="Test")
+    return TestComplet(comprehension_ecrite=[exercice], grammaire=[exercice], vocabulaire=[exercice])
+
+
+@pytest.fixture
+def inventaire(monkeypatch):
+    monkeypatch.setattr(settings, "TEST_INVENTORY_CLES", [])
+    monkeypatch.setattr(settings, "LANGUES_SUPPORTEES", ["anglais", "espagnol"])
+    return InventaireTests(profondeur=2, max_cles=3)
+
+
+def test_prendre_sert_le_stock_dans_l_ordre(inventaire):
+    premier, second = _test_complet(), _test_complet()
+    inventaire.ajouter("Anglais", "b1", premier)
+    inventaire.ajouter("anglais", "B1", second)
+
+    assert inventaire.prendre(" anglais ", "B1") is premier
+    assert inventaire.prendre("anglais", "B1") is second
+    assert inventaire.prendre("anglais", "B1") is None
+    etat = inventaire.etat()
+    assert etat["stocks"] == {"anglais:B1": 0}
+    assert (etat["nb_servis"], etat["nb_manques"]) == (2, 1)
+
+
+def test_un_manque_suit_seulement_les_langues_et_niveaux_supportes(inventaire):
+    assert inventaire.prendre("Espagnol", "a2") is None
+    assert inventaire.prendre("espagnol", "") is None
+    assert inventaire.prendre("klingon", "B1") is None
+    assert inventaire.prendre("anglais", "Z9") is None
+    assert inventaire.prendre("anglias", "B1") is None
+
+    assert inventaire.etat()["stocks"] == {"espagnol:A2": 0, "espagnol:": 0}
+    assert inventaire.etat()["nb_manques"] == 5
+
+
+def test_nombre_de_couples_suivis_borne(inventaire):
+    for niveau in ("A1", "A2", "B1", "B2"):
+        inventaire.prendre("anglais", niveau)
+    assert len(inventaire.etat()["stocks"]) == 3
+
+
+def test_rechargement_du_stock_le_plus_bas(inventaire, monkeypatch):
+    appels = []
+
+    async def generer(langue, niveau_cible):
+        appels.append((langue, niveau_cible))
+        return _test_complet()
+
+    monkeypatch.setattr(content_creator_ai, "generer_test_parallele_async", generer)
+    monkeypatch.setattr(test_inventory_service, "limiteur", LimiteurDebit(60, 100000, 10, 5.0))
+
+    inventaire.ajouter("anglais", "B1", _test_complet())
+    inventaire.prendre("espagnol", "A2")
+
+    async def remplir():
+        resultats = []
+        for _ in range(4):
+            resultats.append(await inventaire._remplir_une_fois())
+        return resultats
+
+    # Stock vide servi en premier, puis à tour de rôle jusqu'à la profondeur cible
+    assert asyncio.run(remplir()) == [True, True, True, False]
+    assert appels == [("espagnol", "A2"), ("anglais", "B1"), ("espagnol", "A2")]
+    assert inventaire.etat()["stocks"] == {"anglais:B1": 2, "espagnol:A2": 2}
+    assert inventaire.etat()["nb_generes"] == 3
+
+
+def test_pas_de_rechargement_sans_marge_de_budget(inventaire, monkeypatch):
+    async def generer(langue, niveau_cible):
+        raise AssertionError("aucune génération attendue")
+
+    limiteur = LimiteurDebit(60, 100000, 10, 5.0)
+    limiteur.signaler_rate_limit()
+    monkeypatch.setattr(content_creator_ai, "generer_test_parallele_async", generer)
+    monkeypatch.setattr(test_inventory_service, "limiteur", limiteur)
+
+    inventaire.prendre("anglais", "B1")
+    assert asyncio.run(inventaire._remplir_une_fois()) is False
@@ -0,0 +1,101 @@
+"""
+Tests de l'extraction et des réparations du JSON produit par le LLM
+"""
+from app.services.ai_modules.content_creator.json_extraction import (
+    AnalyseurJSONIncremental,
+    charger_avec_reparations,
+    extraire_json,
+)
+
+
+def test_json_valide_sans_reparation():
+    donnees, reparations = extraire_json('Voici le résultat :\n```json\n[{"a": 1}, {"b": 2}]\n```')
+    assert donnees == [{"a": 1}, {"b": 2}]
+    assert reparations == []
+
+
+def test_virgules_finales():
+    donnees, reparations = extraire_json('[{"a": 1, "b": [1, 2,],}, ]')
+    assert donnees == [{"a": 1, "b": [1, 2]}]
+    assert reparations == ["virgules_finales"]
+
+
+def test_virgule_dans_une_chaine_conservee():
+    donnees, _ = extraire_json('[{"t": "a, ]", "b": 1,}]')
+    assert donnees == [{"t": "a, ]", "b": 1}]
+
+
+def test_troncature():
+    donnees, reparations = extraire_json('[{"a": 1}, {"b": 2}, {"c": "coup')
+    assert donnees == [{"a": 1}, {"b": 2}]
+    assert reparations == ["troncature"]
+
+
+def test_litteraux_python():
+    donnees, reparations = extraire_json('[{"ok": True, "ko": False, "rien": None, "t": "True"}]')
+    assert donnees == [{"ok": True, "ko": False, "rien": None, "t": "True"}]
+    assert reparations == ["litteraux_python"]
+
+
+def test_guillemets_typographiques_delimiteurs():
+    donnees, reparations = extraire_json('[{“texte”: “Bonjour”, "n": 1}]')
+    assert donnees == [{"texte": "Bonjour", "n": 1}]
+    assert reparations == ["guillemets_typographiques"]
+
+
+def test_guillemets_francais_dans_une_chaine_intacts():
+    donnees, reparations = extraire_json('[{"t": "Il dit : « non »", "b": True}]')
+    assert donnees == [{"t": "Il dit : « non »", "b": True}]
+    assert reparations == ["litteraux_python"]
+
+
+def test_texte_francais_intact():
+    texte = '[{"question": "Où est l\'élève ?", "options": ["à", "a"], "citation": "“Déjà” vu"}]'
+    donnees, reparations = extraire_json(texte)
+    assert donnees[0]["question"] == "Où est l'élève ?"
+    assert donnees[0]["options"] == ["à", "a"]
+    assert donnees[0]["citation"] == "“Déjà” vu"
+    assert reparations == []
+
+
+def test_caracteres_de_controle():
+    valeur, reparations = charger_avec_reparations('{"t": "ligne 1\nligne 2"}')
+    assert valeur == {"t": "ligne 1\nligne 2"}
+    assert reparations == ["caracteres_de_controle"]
+
+
+def test_texte_irreparable():
+    donnees, _ = extraire_json('[{"a": }]')
+    assert donnees is None
+    assert extraire_json("Aucun tableau ici") == (None, [])
+
+
+def test_analyseur_incremental_par_fragments():
+    analyseur = AnalyseurJSONIncremental()
+    objets = []
+    for fragment in ['Voici {les} exercices :\n[{"a": ', '"}"}, {"b"', ': [1, 2]}', ']']:
+        objets.extend(analyseur.alimenter(fragment))
+    assert objets == [{"a": "}"}, {"b": [1, 2]}]
+    assert analyseur.termine
+
+
+def test_analyseur_incremental_crochets_du_preambule_ignores():
+    analyseur = AnalyseurJSONIncremental()
+    objets = analyseur.alimenter('Voici [le JSON] :\n[{"a":1},{"b":2}]')
+    assert objets == [{"a": 1}, {"b": 2}]
+    assert analyseur.termine
+
+
+def test_analyseur_incremental_crochet_coupe_entre_fragments():
+    analyseur = AnalyseurJSONIncremental()
+    objets = []
+    for fragment in ["```json\n[", "\n  ", '{"a": 1}', "]\n```"]:
+        objets.extend(analyseur.alimenter(fragment))
+    assert objets == [{"a": 1}]
+    assert analyseur.termine
+
+
+def test_analyseur_incremental_tableau_vide():
+    analyseur = AnalyseurJSONIncremental()
+    assert analyseur.alimenter("[ ]") == []
+    assert analyseur.termine
@@ -0,0 +1,23 @@
+"""
+Tests de la configuration des fournisseurs LLM
+"""
+import pytest
+
+from app.core.config import settings
+from app.services.ai_modules.llm_client import FOURNISSEURS
+
+
+def test_mistral_sans_cle_echoue_clairement(monkeypatch):
+    monkeypatch.setattr(settings, "MISTRAL_API_KEY", "")
+    with pytest.raises(RuntimeError, match="MISTRAL_API_KEY"):
+        FOURNISSEURS["mistral"].entetes()
+
+
+def test_mistral_utilise_la_cle_configuree(monkeypatch):
+    monkeypatch.setattr(settings, "MISTRAL_API_KEY", "cle-de-test")
+    assert FOURNISSEURS["mistral"].entetes()["Authorization"] == "Bearer cle-de-test"
+
+
+def test_fournisseur_simule_sans_cle(monkeypatch):
+    monkeypatch.setattr(settings, "MISTRAL_API_KEY", "")
+    assert "Authorization" in FOURNISSEURS["simule"].entetes()
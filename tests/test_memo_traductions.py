@@ -0,0 +1,52 @@
+"""
+Tests de la mémoire des traductions (lecture asynchrone hors de la boucle d'événements)
+"""
+import asyncio
+import threading
+
+from app.services.ai_modules.content_creator.translation_memo import MemoTraductions
+
+
+def _espionner_lectures(memo):
+    """Enregistre le thread de chaque lecture SQLite"""
+    threads = []
+    lire = memo._disque.lire
+
+    def lire_espionne(cle):
+        threads.append(threading.get_ident())
+        return lire(cle)
+
+    memo._disque.lire = lire_espionne
+    return threads
+
+
+def test_lecture_disque_asynchrone_hors_de_la_boucle(tmp_path):
+    chemin = str(tmp_path / "memo.db")
+    MemoTraductions(chemin).enregistrer("prompt", "Bonjour", "anglais", "modele", "Hello")
+    memo = MemoTraductions(chemin)
+    threads = _espionner_lectures(memo)
+
+    async def lire():
+        return await memo.obtenir_async("prompt", "Bonjour", "anglais", "modele"), threading.get_ident()
+
+    valeur, thread_boucle = asyncio.run(lire())
+    assert valeur == "Hello"
+    assert len(threads) == 1 and threads[0] != thread_boucle
+
+    # L'entrée est remontée en mémoire : plus de lecture disque
+    assert asyncio.run(memo.obtenir_async("prompt", "Bonjour", "Anglais ", "modele")) == "Hello"
+    assert len(threads) == 1
+    assert (memo.statistiques()["hits"], memo.statistiques()["misses"]) == (2, 0)
+
+
+def test_absence_comptee_comme_miss(tmp_path):
+    memo = MemoTraductions(str(tmp_path / "memo.db"))
+    assert asyncio.run(memo.obtenir_async("termes", "texte", "espagnol", "modele")) is None
+    assert memo.statistiques()["misses"] == 1
+
+
+def test_enregistrement_asynchrone_persiste_sur_disque(tmp_path):
+    chemin = str(tmp_path / "memo.db")
+    memo = MemoTraductions(chemin)
+    asyncio.run(memo.enregistrer_async("termes", "texte", "allemand", "modele", {"grammaire": "Grammatik"}))
+    assert MemoTraductions(chemin).obtenir("termes", "texte", "allemand", "modele") == {"grammaire": "Grammatik"}
@@ -0,0 +1,86 @@
+"""
+Tests du limiteur de débit global (seaux à jetons, ajustement, pause après un 429)
+"""
+import pytest
+
+from app.services.ai_modules import rate_limiter
+from app.services.ai_modules.rate_limiter import LimiteurDebit
+
+
+class HorlogeFactice:
+    """Remplace le module time du limiteur : sleep avance l'horloge au lieu d'attendre"""
+
+    def __init__(self):
+        self.maintenant = 1000.0
+
+    def monotonic(self):
+        return self.maintenant
+
+    def sleep(self, duree):
+        self.maintenant += duree
+
+
+@pytest.fixture
+def horloge(monkeypatch):
+    horloge = HorlogeFactice()
+    monkeypatch.setattr(rate_limiter, "time", horloge)
+    return horloge
+
+
+@pytest.fixture
+def limiteur(horloge):
+    # 60 requêtes/min (une par seconde), rafale de 2, 6000 tokens/min (100 par seconde)
+    return LimiteurDebit(requetes_par_minute=60, tokens_par_minute=6000, rafale_requetes=2, pause_rate_limit=5.0)
+
+
+def test_rafale_puis_attente_de_recharge(limiteur, horloge):
+    assert limiteur.acquerir(tokens=10) == 0
+    assert limiteur.acquerir(tokens=10) == 0
+    # Seau de requêtes vide : la troisième attend la recharge d'une requête
+    assert limiteur.acquerir(tokens=10) == pytest.approx(1.0)
+    assert horloge.maintenant == pytest.approx(1001.0)
+    assert limiteur.etat()["nb_attentes"] == 1
+
+
+def test_recharge_plafonnee_a_la_rafale(limiteur, horloge):
+    limiteur.acquerir(tokens=10)
+    limiteur.acquerir(tokens=10)
+    horloge.maintenant += 60
+    etat = limiteur.etat()
+    assert etat["requetes_disponibles"] == 2
+    assert etat["tokens_disponibles"] == 6000
+
+
+def test_attente_sur_le_seau_de_tokens(limiteur):
+    assert limiteur.acquerir(tokens=6000) == 0
+    # 300 tokens de dette à 100 tokens par seconde
+    assert limiteur.acquerir(tokens=300) == pytest.approx(3.0)
+
+
+def test_ajuster_rend_ou_preleve_l_ecart(limiteur):
+    limiteur.acquerir(tokens=1000)
+    limiteur.ajuster(400)
+    assert limiteur.etat()["tokens_disponibles"] == 5600
+
+    limiteur.acquerir(tokens=1000)
+    limiteur.ajuster(1500)
+    assert limiteur.etat()["tokens_disponibles"] == 4100
+
+    # Sans réservation en attente, la consommation est prélevée en entier
+    limiteur.ajuster(100)
+    etat = limiteur.etat()
+    assert etat["tokens_disponibles"] == 4000
+    assert etat["nb_ajustements"] == 3
+
+
+def test_signaler_rate_limit_suspend_les_appels(limiteur, horloge):
+    limiteur.signaler_rate_limit()
+    assert not limiteur.a_de_la_marge(0.0)
+    assert limiteur.etat()["pause_restante_s"] == 5.0
+
+    # L'appel suivant attend la fin de la pause, même si la dette de requêtes est plus courte
+    assert limiteur.acquerir(tokens=10) == pytest.approx(5.0)
+    horloge.maintenant += 1
+    etat = limiteur.etat()
+    assert etat["pause_restante_s"] == 0
+    assert etat["nb_rate_limits"] == 1
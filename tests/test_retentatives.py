@@ -0,0 +1,39 @@
+"""
+Tests des retentatives sur 429 : seul le limiteur retente, les générateurs de section n'ajoutent pas de backoff
+"""
+import asyncio
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from app.core.config import settings
+from app.services.ai_modules.content_creator import exercise_generators, utils
+from app.services.ai_modules.rate_limiter import LimiteurDebit
+
+
+@pytest.fixture
+def modele_en_429(monkeypatch):
+    """Modèle qui répond toujours 429 ; retourne la liste des appels"""
+    appels = []
+
+    def repondre(entree):
+        appels.append(entree)
+        raise RuntimeError("Error code: 429 - rate limit exceeded")
+
+    monkeypatch.setattr(settings, "SECTION_CACHE_ACTIVE", False)
+    monkeypatch.setattr(settings, "LLM_MAX_TENTATIVES_RATE_LIMIT", 3)
+    monkeypatch.setattr(utils, "limiteur", LimiteurDebit(6000, 10**7, 100, 0.0))
+    monkeypatch.setattr(exercise_generators, "get_llm", lambda **kwargs: RunnableLambda(repondre))
+    return appels
+
+
+def test_section_synchrone_retentee_par_le_limiteur_seulement(modele_en_429):
+    with pytest.raises(RuntimeError, match="429"):
+        exercise_generators.generer_grammaire("anglais", "B1")
+    assert len(modele_en_429) == settings.LLM_MAX_TENTATIVES_RATE_LIMIT
+
+
+def test_section_asynchrone_retentee_par_le_limiteur_seulement(modele_en_429):
+    with pytest.raises(RuntimeError, match="429"):
+        asyncio.run(exercise_generators.generer_grammaire_async("anglais", "B1"))
+    assert len(modele_en_429) == settings.LLM_MAX_TENTATIVES_RATE_LIMIT